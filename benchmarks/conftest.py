@@ -0,0 +1,178 @@
+import json
+import os
+import sys
+from collections.abc import Callable, Iterator
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import IO, Any, NamedTuple
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse, HTTPHeaders
+from botocore.model import OperationModel
+from moto import mock_aws
+from moto.core.models import DEFAULT_ACCOUNT_ID
+from moto.ec2.models import ec2_backends
+from moto.ec2.models.amis import AMIS
+
+from aec.util.config import Config
+
+REGION = "us-east-1"
+
+# rows as accepted by display.pretty_print
+Rows = list[dict[str, Any]]
+
+# moto limits how many instances can be launched in one call
+LAUNCH_BATCH = 500
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--bench-scale",
+        default="1000",
+        help="Comma separated numbers of instances to seed moto with, eg: 1000,10000",
+    )
+
+
+def pytest_generate_tests(metafunc: pytest.Metafunc) -> None:
+    if "scale" in metafunc.fixturenames:
+        scales = [int(s) for s in str(metafunc.config.getoption("--bench-scale")).split(",")]
+        # session scoped so each scale is only seeded once
+        metafunc.parametrize("scale", scales, scope="session")
+
+
+def default_session() -> boto3.Session:
+    if not boto3.DEFAULT_SESSION:
+        boto3.setup_default_session()
+    assert boto3.DEFAULT_SESSION
+    return boto3.DEFAULT_SESSION
+
+
+class Seeded(NamedTuple):
+    config: Config
+    instance_ids: list[str]
+
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    """Keep local caches out of the user's home directory, and start each benchmark with them empty."""
+    monkeypatch.setenv("AEC_CACHE_DIR", str(tmp_path / "cache"))
+
+
+@pytest.fixture(scope="session")
+def _mock_aws() -> Iterator[None]:
+    with mock_aws():
+        yield
+
+
+@pytest.fixture(scope="session")
+def seeded(_mock_aws: None, scale: int) -> Iterator[Seeded]:
+    """
+    Seed moto with scale named instances, each with a root volume, and an image for every 10 instances.
+
+    moto doesn't support patch states, so they are answered by a handler instead.
+    """
+    backend = ec2_backends[DEFAULT_ACCOUNT_ID][REGION]
+    backend.reset()
+
+    ec2_client = boto3.client("ec2", region_name=REGION)
+    instance_ids: list[str] = []
+    for n in range(0, scale, LAUNCH_BATCH):
+        count = min(LAUNCH_BATCH, scale - n)
+        response = ec2_client.run_instances(ImageId=AMIS[0]["ami_id"], MinCount=count, MaxCount=count)
+        instance_ids.extend(i["InstanceId"] for i in response["Instances"])
+
+    # tagging via the backend is much faster than a call per instance
+    for n, iid in enumerate(instance_ids):
+        backend.create_tags([iid], {"Name": f"bench-{n:05}"})
+
+    for iid in instance_ids[::10]:
+        ec2_client.create_image(InstanceId=iid, Name=f"bench-image-{iid}")
+
+    session = default_session()
+    session.events.register("before-call.ssm.DescribeInstancePatchStates", patch_states)  # type: ignore
+
+    yield Seeded(config={"region": REGION}, instance_ids=instance_ids)
+
+    session.events.unregister("before-call.ssm.DescribeInstancePatchStates", patch_states)  # type: ignore
+
+
+def patch_states(params: dict[str, Any], **_: Any) -> tuple[AWSResponse, dict[str, Any]]:
+    instance_ids = json.loads(params["body"])["InstanceIds"]
+    now = datetime.now(timezone.utc)
+    states = [
+        {
+            "InstanceId": iid,
+            "PatchGroup": "",
+            "BaselineId": "pb-0123456789abcdef0",
+            "MissingCount": n % 7,
+            "InstalledPendingRebootCount": n % 2,
+            "FailedCount": 0,
+            "InstalledRejectedCount": 0,
+            "OperationStartTime": now,
+            "OperationEndTime": now,
+            "Operation": "Scan",
+        }
+        for n, iid in enumerate(instance_ids)
+    ]
+    return ok_response(params), {"InstancePatchStates": states, "ResponseMetadata": {"HTTPStatusCode": 200}}
+
+
+def ok_response(params: dict[str, Any]) -> AWSResponse:
+    return AWSResponse(params.get("url", ""), 200, HTTPHeaders(), None)
+
+
+class Replay:
+    """
+    Records the responses to AWS calls and then replays them, without calling moto.
+
+    Used to time just aec's own work, because moto's own latency dominates and varies between versions.
+    """
+
+    def __init__(self) -> None:
+        self.responses: dict[tuple[str, str], dict[str, Any]] = {}
+        self.replaying = False
+
+    def key(self, model: OperationModel, params: dict[str, Any]) -> tuple[str, str]:
+        body = params.get("body")
+        return (model.name, body.decode() if isinstance(body, bytes) else json.dumps(body, sort_keys=True, default=str))
+
+    def before_call(
+        self, model: OperationModel, params: dict[str, Any], context: dict[str, Any], **_: Any
+    ) -> tuple[AWSResponse, dict[str, Any]] | None:
+        key = self.key(model, params)
+        if self.replaying:
+            return ok_response(params), self.responses[key]
+        context["bench_replay_key"] = key
+        return None
+
+    def after_call(self, parsed: dict[str, Any], context: dict[str, Any], **_: Any) -> None:
+        # no key when answered by another handler, eg: patch_states
+        if not self.replaying and "bench_replay_key" in context:
+            self.responses[context["bench_replay_key"]] = parsed
+
+    def record(self, fn: Callable[[], object]) -> None:
+        """Call fn to record its responses, and then replay them for subsequent calls."""
+        fn()
+        self.replaying = True
+
+
+@pytest.fixture
+def replay(_mock_aws: None) -> Iterator[Replay]:
+    r = Replay()
+    session = default_session()
+    session.events.register("before-call", r.before_call)  # type: ignore
+    session.events.register("after-call", r.after_call)
+
+    yield r
+
+    session.events.unregister("before-call", r.before_call)  # type: ignore
+    session.events.unregister("after-call", r.after_call)
+
+
+@pytest.fixture
+def devnull_stdout(monkeypatch: pytest.MonkeyPatch) -> Iterator[IO[str]]:
+    """Discard output, so rendering is timed rather than the terminal or pytest's capturing."""
+    with open(os.devnull, "w") as devnull:
+        monkeypatch.setattr(sys, "stdout", devnull)
+        yield devnull
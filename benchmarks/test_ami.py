@@ -0,0 +1,29 @@
+from typing import cast
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+import aec.command.ami as ami
+import aec.util.display as display
+from benchmarks.conftest import Replay, Rows, Seeded
+from benchmarks.test_ec2 import MOTO_ROUNDS
+
+pytestmark = pytest.mark.benchmark(group="ami")
+
+
+@pytest.mark.usefixtures("devnull_stdout")
+def test_describe_end_to_end(benchmark: BenchmarkFixture, seeded: Seeded):
+    def describe() -> None:
+        display.pretty_print(cast(Rows, ami.describe(seeded.config)), display.OutputFormat.table)
+
+    benchmark.pedantic(describe, rounds=MOTO_ROUNDS)
+
+
+@pytest.mark.usefixtures("devnull_stdout")
+def test_describe(benchmark: BenchmarkFixture, seeded: Seeded, replay: Replay):
+    # describe prints the owners it is describing, which is discarded
+    replay.record(lambda: ami.describe(seeded.config))
+
+    images = benchmark(ami.describe, seeded.config)
+
+    assert len(images) == len(seeded.instance_ids[::10])
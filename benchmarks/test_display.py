@@ -0,0 +1,47 @@
+from datetime import datetime, timedelta, timezone
+from typing import Any
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+import aec.util.display as display
+
+pytestmark = pytest.mark.benchmark(group="display")
+
+
+@pytest.fixture
+def rows(scale: int) -> list[dict[str, Any]]:
+    """Rows shaped like ec2 describe's, without needing moto."""
+    launched = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "InstanceId": f"i-{n:017x}",
+            "State": "running" if n % 5 else "stopped",
+            "Name": f"bench-{n:05}",
+            "Type": "t3.small",
+            "DnsName": f"ip-10-0-{n // 256 % 256}-{n % 256}.ec2.internal",
+            "LaunchTime": launched + timedelta(minutes=n),
+            "ImageId": f"ami-{n // 10:017x}",
+        }
+        for n in range(scale)
+    ]
+
+
+@pytest.mark.parametrize(
+    ("output_format", "plain"),
+    [
+        (display.OutputFormat.table, False),
+        (display.OutputFormat.table, True),
+        (display.OutputFormat.csv, None),
+        (display.OutputFormat.jsonl, None),
+    ],
+    ids=["rich", "plain", "csv", "jsonl"],
+)
+@pytest.mark.usefixtures("devnull_stdout")
+def test_pretty_print(
+    benchmark: BenchmarkFixture,
+    rows: list[dict[str, Any]],
+    output_format: display.OutputFormat,
+    plain: bool | None,
+):
+    benchmark(display.pretty_print, rows, output_format, plain)
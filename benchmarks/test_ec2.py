@@ -0,0 +1,88 @@
+import shutil
+from typing import cast
+
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+from pytest_mock import MockFixture
+
+import aec.command.ec2 as ec2
+import aec.util.display as display
+import aec.util.image_cache as image_cache
+from aec.util.cache import cache_dir
+from benchmarks.conftest import Replay, Rows, Seeded
+
+pytestmark = pytest.mark.benchmark(group="ec2")
+
+# rounds for benchmarks that call moto, which is slow at scale
+MOTO_ROUNDS = 3
+
+# rounds for benchmarks that empty the cache before each round
+COLD_CACHE_ROUNDS = 20
+
+VOLUMES_AND_IMAGES = "InstanceId,State,Name,Volumes,Image.Name"
+
+
+@pytest.mark.usefixtures("devnull_stdout")
+def test_describe_end_to_end(benchmark: BenchmarkFixture, seeded: Seeded):
+    def describe() -> None:
+        display.pretty_print(cast(Rows, ec2.describe(seeded.config)), display.OutputFormat.table)
+
+    benchmark.pedantic(describe, rounds=MOTO_ROUNDS)
+
+
+def test_describe(benchmark: BenchmarkFixture, seeded: Seeded, replay: Replay):
+    replay.record(lambda: ec2.describe(seeded.config))
+
+    instances = benchmark(ec2.describe, seeded.config)
+
+    assert len(instances) == len(seeded.instance_ids)
+
+
+def test_describe_volumes_and_images_cold_image_cache(benchmark: BenchmarkFixture, seeded: Seeded, replay: Replay):
+    replay.record(lambda: ec2.describe(seeded.config, columns=VOLUMES_AND_IMAGES))
+
+    # emptied before every round, so every round describes the images, as on first use
+    instances = benchmark.pedantic(
+        ec2.describe,
+        args=(seeded.config,),
+        kwargs={"columns": VOLUMES_AND_IMAGES},
+        setup=lambda: shutil.rmtree(cache_dir()),
+        rounds=COLD_CACHE_ROUNDS,
+    )
+
+    assert len(instances) == len(seeded.instance_ids)
+
+
+def test_describe_volumes_and_images_warm_image_cache(
+    benchmark: BenchmarkFixture, seeded: Seeded, replay: Replay, mocker: MockFixture
+):
+    # caches the images
+    replay.record(lambda: ec2.describe(seeded.config, columns=VOLUMES_AND_IMAGES))
+    describe_images = mocker.spy(image_cache, "describe")
+
+    instances = benchmark(ec2.describe, seeded.config, columns=VOLUMES_AND_IMAGES)
+
+    assert len(instances) == len(seeded.instance_ids)
+    assert describe_images.call_count == 0
+
+
+def test_describe_name_match(benchmark: BenchmarkFixture, seeded: Seeded, replay: Replay):
+    replay.record(lambda: ec2.describe(seeded.config, name_match="bench-0000"))
+
+    benchmark(ec2.describe, seeded.config, name_match="bench-0000")
+
+
+@pytest.mark.usefixtures("devnull_stdout")
+def test_status_end_to_end(benchmark: BenchmarkFixture, seeded: Seeded):
+    def status() -> None:
+        display.pretty_print(ec2.status(seeded.config), display.OutputFormat.table)
+
+    benchmark.pedantic(status, rounds=MOTO_ROUNDS)
+
+
+def test_status(benchmark: BenchmarkFixture, seeded: Seeded, replay: Replay):
+    replay.record(lambda: ec2.status(seeded.config))
+
+    statuses = benchmark(ec2.status, seeded.config)
+
+    assert len(statuses) == len(seeded.instance_ids)
@@ -0,0 +1,25 @@
+import pytest
+from pytest_benchmark.fixture import BenchmarkFixture
+
+import aec.command.ssm as ssm
+import aec.util.display as display
+from benchmarks.conftest import Replay, Seeded
+from benchmarks.test_ec2 import MOTO_ROUNDS
+
+pytestmark = pytest.mark.benchmark(group="ssm")
+
+
+@pytest.mark.usefixtures("devnull_stdout")
+def test_patch_summary_end_to_end(benchmark: BenchmarkFixture, seeded: Seeded):
+    def patch_summary() -> None:
+        display.pretty_print(ssm.patch_summary(seeded.config), display.OutputFormat.table)
+
+    benchmark.pedantic(patch_summary, rounds=MOTO_ROUNDS)
+
+
+def test_patch_summary(benchmark: BenchmarkFixture, seeded: Seeded, replay: Replay):
+    replay.record(lambda: list(ssm.patch_summary(seeded.config)))
+
+    summary = benchmark(lambda: list(ssm.patch_summary(seeded.config)))
+
+    assert len(summary) == len(seeded.instance_ids)
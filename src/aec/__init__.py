@@ -0,0 +1,4 @@
+import time
+
+# when aec was first imported, so traces can include the time spent importing
+imported_at = time.perf_counter()
@@ -0,0 +1,24 @@
+"""
+Entry point for the aec script.
+
+When aec daemon is running commands are forwarded to it before importing aec.main, which imports boto3.
+"""
+
+import sys
+
+import aec.util.daemon as daemon
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    code = daemon.forward(args)
+    if code is not None:
+        sys.exit(code)
+
+    from aec.main import main as run
+
+    run(args)
+
+
+if __name__ == "__main__":
+    main()
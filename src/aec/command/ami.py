@@ -1,19 +1,27 @@
 from __future__ import annotations
 
+import re
 from collections.abc import Sequence
-from typing import TYPE_CHECKING, Any, NamedTuple
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, NamedTuple, cast
 
 import boto3
+from botocore.exceptions import ClientError
 
 if TYPE_CHECKING:
-    from mypy_boto3_ec2.type_defs import DescribeImagesResultTypeDef, FilterTypeDef
+    from mypy_boto3_ec2.type_defs import DescribeImagesResultTypeDef, FilterTypeDef, ImageTypeDef
 
 from typing import TypedDict
 
 from typing_extensions import NotRequired
 
+import aec.util.engine as engine
+import aec.util.inventory as inventory
 import aec.util.tags as util_tags
 from aec.util.config import Config
+from aec.util.engine import Call
+from aec.util.errors import HandledError
+from aec.util.threads import fanout, throttle_retries
 
 
 class Image(TypedDict):
@@ -33,6 +41,8 @@ class AmiMatcher(NamedTuple):
 amazon_base_account_id = "137112412989"
 canonical_account_id = "099720109477"
 
+account_id = re.compile(r"\d{12}")
+
 ami_keywords = {
     "amazon2": AmiMatcher(amazon_base_account_id, "amzn2-ami-hvm*x86_64-gp2"),
     "ubuntu1604": AmiMatcher(canonical_account_id, "ubuntu/images/hvm-ssd/ubuntu-xenial-16.04-amd64"),
@@ -61,13 +71,28 @@ def fetch(config: Config, ami: str) -> Image:
     return ami_details
 
 
+def image_owners(config: Config, owner: str | None = None) -> list[str]:
+    """Owners to describe images for, ie: owner if given, or else the configured owners."""
+    if owner:
+        return [owner]
+
+    describe_images_owners = config.get("describe_images_owners", None)
+    if not describe_images_owners:
+        return ["self"]
+    elif isinstance(describe_images_owners, str):
+        return [describe_images_owners]
+    else:
+        return describe_images_owners
+
+
 def _describe_images(
     config: Config,
     idents: str | Sequence[str] | None = None,
     owner: str | None = None,
     name_match: str | None = None,
+    offline: bool = False,
 ) -> DescribeImagesResultTypeDef:
-    ec2_client = boto3.client("ec2", region_name=config.get("region", None))
+    ec2_client = None if offline else boto3.client("ec2", region_name=config.get("region", None))
 
     # If idents are AMI IDs, lookup by ID
     ids: list[str] = []
@@ -82,19 +107,13 @@ def _describe_images(
             raise ValueError("Cannot mix AMI IDs and image names")
 
         if ids:
+            if not ec2_client:
+                # any synced image, including those only referenced by instances
+                images = inventory.images(inventory.region(config), filters=[{"Name": "image-id", "Values": ids}])
+                return cast("DescribeImagesResultTypeDef", {"Images": images})
             return ec2_client.describe_images(ImageIds=ids)
 
-    # Determine owners filter
-    if owner:
-        owners_filter = [owner]
-    else:
-        describe_images_owners = config.get("describe_images_owners", None)
-        if not describe_images_owners:
-            owners_filter = ["self"]
-        elif isinstance(describe_images_owners, str):
-            owners_filter = [describe_images_owners]
-        else:
-            owners_filter = describe_images_owners
+    owners_filter = image_owners(config, owner)
 
     # Build name filters and description message
     filters: list[FilterTypeDef] = []
@@ -112,7 +131,15 @@ def _describe_images(
             match_desc = f" with name containing {name_match}"
 
     print(f"Describing images owned by {owners_filter}{match_desc}")
-    return ec2_client.describe_images(Owners=owners_filter, Filters=filters)
+    if not ec2_client:
+        images = inventory.images(inventory.region(config), owners_filter, filters)
+    else:
+        # each owner is paged through concurrently
+        calls = [Call(ec2_client, "describe_images", {"Owners": [o], "Filters": filters}) for o in owners_filter]
+        pages = (page for owner_pages in engine.results(calls) for page in owner_pages)
+        # an image can match more than one owner, eg: self and the account's id
+        images = list({i["ImageId"]: i for page in pages for i in page["Images"]}.values())
+    return cast("DescribeImagesResultTypeDef", {"Images": images})
 
 
 def describe(
@@ -121,10 +148,11 @@ def describe(
     owner: str | None = None,
     name_match: str | None = None,
     show_snapshot_id: bool = False,
+    offline: bool = False,
 ) -> list[Image]:
     """List AMIs."""
 
-    response = _describe_images(config, idents=idents, owner=owner, name_match=name_match)
+    response = _describe_images(config, idents=idents, owner=owner, name_match=name_match, offline=offline)
 
     images = []
     for i in response["Images"]:
@@ -148,10 +176,11 @@ def describe_tags(
     owner: str | None = None,
     name_match: str | None = None,
     keys: Sequence[str] = [],
+    offline: bool = False,
 ) -> list[dict[str, Any]]:
     """List AMI images with their tags."""
 
-    response = _describe_images(config, idents=idents, owner=owner, name_match=name_match)
+    response = _describe_images(config, idents=idents, owner=owner, name_match=name_match, offline=offline)
 
     images = []
     for i in response["Images"]:
@@ -168,27 +197,143 @@ def describe_tags(
 
 
 def delete(config: Config, ami: str) -> None:
-    """Deregister an AMI and delete its snapshot."""
+    """Deregister an AMI and delete its snapshots."""
 
     ec2_client = boto3.client("ec2", region_name=config.get("region", None))
 
-    response = describe(config, idents=ami, show_snapshot_id=True)
+    response = _describe_images(config, idents=ami)
+    if not response["Images"]:
+        raise RuntimeError(f"Could not find {ami}")
 
     ec2_client.deregister_image(ImageId=ami)
 
-    ec2_client.delete_snapshot(SnapshotId=response[0]["SnapshotId"])
+    for snapshot_id in snapshot_ids(response["Images"][0]):
+        ec2_client.delete_snapshot(SnapshotId=snapshot_id)
 
 
-def share(config: Config, ami: str, account: str) -> None:
-    """Share an AMI with another account."""
+def snapshot_ids(image: ImageTypeDef) -> list[str]:
+    return [b["Ebs"]["SnapshotId"] for b in image.get("BlockDeviceMappings", []) if b.get("Ebs", {}).get("SnapshotId")]
 
-    ec2_client = boto3.client("ec2", region_name=config.get("region", None))
 
-    ec2_client.modify_image_attribute(
-        ImageId=ami,
-        LaunchPermission={"Add": [{"UserId": account}]},
-        OperationType="add",
-        UserIds=[account],
-        Value="string",
-        DryRun=False,
-    )
+_duration_units = {"m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+
+def parse_duration(duration: str) -> timedelta:
+    """Parse a duration like 30d, 12h, 2w or 90m."""
+    match = re.fullmatch(r"(\d+)([mhdw])", duration)
+    if not match:
+        raise ValueError(f"Invalid duration '{duration}'. Must be a number followed by one of m, h, d, w eg: 30d")
+
+    return timedelta(**{_duration_units[match.group(2)]: int(match.group(1))})
+
+
+def prune(
+    config: Config,
+    older_than: str,
+    keep: int = 0,
+    name_match: str | None = None,
+    dry_run: bool = False,
+) -> list[dict[str, Any]]:
+    """Deregister AMIs older than a given age and delete their snapshots."""
+
+    ec2_client = boto3.client("ec2", region_name=config.get("region", None), config=throttle_retries)
+
+    cutoff = datetime.now(timezone.utc) - parse_duration(older_than)
+    # same format as CreationDate so they can be compared as strings
+    cutoff_date = f"{cutoff:%Y-%m-%dT%H:%M:%S}.{cutoff.microsecond // 1000:03d}Z"
+
+    filters: list[FilterTypeDef] = [{"Name": "name", "Values": [f"*{name_match}*"]}] if name_match else []
+
+    images = [
+        i
+        for page in ec2_client.get_paginator("describe_images").paginate(Owners=["self"], Filters=filters)
+        for i in page["Images"]
+    ]
+
+    # newest first, so the images kept are the most recent
+    images.sort(key=lambda i: i["CreationDate"], reverse=True)
+    candidates = [i for i in images[keep:] if i["CreationDate"] <= cutoff_date]
+
+    def prune_image(image: ImageTypeDef) -> dict[str, Any]:
+        snapshots = snapshot_ids(image)
+        if dry_run:
+            status = "would delete"
+        else:
+            try:
+                ec2_client.deregister_image(ImageId=image["ImageId"])
+                for snapshot_id in snapshots:
+                    ec2_client.delete_snapshot(SnapshotId=snapshot_id)
+                status = "deleted"
+            except ClientError as e:
+                status = f"{e.response['Error']['Code']}: {e.response['Error']['Message']}"
+
+        return {
+            "ImageId": image["ImageId"],
+            "Name": image.get("Name", None),
+            "CreationDate": image["CreationDate"],
+            "Snapshots": ", ".join(snapshots),
+            "Status": status,
+        }
+
+    return fanout(prune_image, candidates)
+
+
+def share(
+    config: Config,
+    amis: str | Sequence[str],
+    accounts: str | Sequence[str] | None = None,
+    snapshots: bool = False,
+) -> list[dict[str, Any]]:
+    """Share AMIs with other accounts."""
+
+    ec2_client = boto3.client("ec2", region_name=config.get("region", None), config=throttle_retries)
+
+    amis = [amis] if isinstance(amis, str) else list(amis)
+    accounts = [accounts] if isinstance(accounts, str) else list(accounts or [])
+
+    # account ids can also follow the AMI ids, eg: aec ami share ami-1234567890abcdef1 111122223333
+    accounts += [a for a in amis if account_id.fullmatch(a)]
+    amis = [a for a in amis if not account_id.fullmatch(a)]
+    if not accounts:
+        raise HandledError("Missing account id to share with, eg: -a 111122223333")
+
+    if snapshots:
+        # a filter rather than ImageIds, so a missing image is reported in its row rather than failing every image
+        images_snapshots = {
+            i["ImageId"]: snapshot_ids(i)
+            for page in ec2_client.get_paginator("describe_images").paginate(
+                Filters=[{"Name": "image-id", "Values": amis}]
+            )
+            for i in page["Images"]
+        }
+    else:
+        images_snapshots = {}
+
+    def share_image(ami: str) -> dict[str, Any]:
+        shared_snapshots = images_snapshots.get(ami, [])
+        if snapshots and ami not in images_snapshots:
+            return {"ImageId": ami, "Accounts": ", ".join(accounts), "Snapshots": "", "Status": "not found"}
+        try:
+            # all accounts are added in a single call per image
+            ec2_client.modify_image_attribute(
+                ImageId=ami, LaunchPermission={"Add": [{"UserId": account} for account in accounts]}
+            )
+            for snapshot_id in shared_snapshots:
+                ec2_client.modify_snapshot_attribute(
+                    SnapshotId=snapshot_id,
+                    Attribute="createVolumePermission",
+                    OperationType="add",
+                    UserIds=accounts,
+                )
+            status = "shared"
+        except ClientError as e:
+            status = f"{e.response['Error']['Code']}: {e.response['Error']['Message']}"
+
+        return {
+            "ImageId": ami,
+            "Accounts": ", ".join(accounts),
+            "Snapshots": ", ".join(shared_snapshots),
+            "Status": status,
+        }
+
+    return fanout(share_image, amis)
@@ -3,32 +3,48 @@ from __future__ import annotations
 import base64
 import os
 import os.path
+import threading
 from collections import defaultdict
-from collections.abc import Sequence
-from time import sleep
-from typing import TYPE_CHECKING, Any, TypedDict, cast
+from collections.abc import Callable, Iterable, Sequence
+from time import monotonic, sleep
+from typing import TYPE_CHECKING, Any, NamedTuple, TypedDict, cast
 
 import boto3
+from botocore.exceptions import ClientError
 
-from aec.util.ec2_util import describe_running_instances_names
-from aec.util.errors import NoInstancesError
-from aec.util.threads import executor
+from aec.util.ec2_util import describe_instances_names, describe_running_instances_names
+from aec.util.errors import HandledError, NoInstancesError
+from aec.util.threads import executor, fanout, throttle_retries
 
 if TYPE_CHECKING:
+    from mypy_boto3_ec2.client import EC2Client
     from mypy_boto3_ec2.literals import InstanceTypeType
     from mypy_boto3_ec2.type_defs import (
         BlockDeviceMappingTypeDef,
-        DescribeVolumesResultTypeDef,
         FilterTypeDef,
+        ImageTypeDef,
         InstanceStatusSummaryTypeDef,
+        InstanceStatusTypeDef,
+        InstanceTypeDef,
         TagSpecificationTypeDef,
         TagTypeDef,
+        VolumeTypeDef,
     )
 
 import aec.command.ami as ami_cmd
+import aec.util.engine as engine
+import aec.util.image_cache as image_cache
+import aec.util.inventory as inventory
+import aec.util.memo as memo
 import aec.util.tags as util_tags
+import aec.util.watch as util_watch
 from aec.util.config import Config
 from aec.util.ec2_types import RunArgs
+from aec.util.engine import Call
+from aec.util.sorting import parse_fields, sort_rows
+
+# the most resources create_tags accepts in a call
+MAX_CREATE_TAGS_RESOURCES = 1000
 
 
 def is_ebs_optimizable(instance_type: str) -> bool:
@@ -46,6 +62,7 @@ Instance = TypedDict(
         "SubnetId": "str",
         "Volumes": "list[str]",
         "Image.CreationDate": "str",
+        "EbsOptimized": "bool",
     },
     total=False,
 )
@@ -182,7 +199,8 @@ def launch(
     instance_id = response["Instances"][0]["InstanceId"]
 
     waiter = ec2_client.get_waiter("instance_running")
-    waiter.wait(InstanceIds=[instance_id])
+    with memo.bypassed():
+        waiter.wait(InstanceIds=[instance_id])
 
     if wait_ssm:
         print(f"Instance {instance_id} running. Waiting for SSM agent to come online ...")
@@ -204,7 +222,8 @@ def _wait_ssm_agent_online(config: Config, instance_ids: list[str]) -> None:
 
     timeout = 60 * 3  # seconds
     for _ in range(timeout):
-        response = client.describe_instance_information(Filters=[{"Key": "InstanceIds", "Values": instance_ids}])
+        with memo.bypassed():
+            response = client.describe_instance_information(Filters=[{"Key": "InstanceIds", "Values": instance_ids}])
         if response["InstanceInformationList"]:
             return
         sleep(1)
@@ -220,97 +239,214 @@ def describe(
     show_running_only: bool = False,
     sort_by: str = "State,Name",
     columns: str = "InstanceId,State,Name,Type,DnsName,LaunchTime,ImageId",
+    limit: int | None = None,
+    watch: bool = False,
+    filters: list[str] | None = None,
+    states: list[str] | None = None,
+    offline: bool = False,
 ) -> list[Instance]:
     """List EC2 instances in the region."""
 
-    ec2_client = boto3.client("ec2", region_name=config.get("region", None))
-
-    filters = to_filters(idents, name_match)
-    if show_running_only:
-        filters.append({"Name": "instance-state-name", "Values": ["pending", "running"]})
+    api_filters = to_filters(idents, name_match) + parse_filters(filters or [])
 
-    kwargs: dict[str, Any] = {"MaxResults": 1000, "Filters": filters}
-
-    response_fut = executor.submit(ec2_client.describe_instances, **kwargs)
+    # filter by state in the request, rather than downloading instances only to discard them
+    if not states:
+        if show_running_only:
+            states = ["pending", "running"]
+        elif not include_terminated:
+            states = [s for s in instance_states if s != "terminated"]
+    if states:
+        api_filters.append({"Name": "instance-state-name", "Values": states})
 
     cols = columns.split(",")
 
     # don't sort by cols we aren't showing
-    sort_cols = [sc for sc in sort_by.split(",") if sc in cols]
-
-    if "Volumes" in columns:
-        # fetch volume info
-        volumes_response: DescribeVolumesResultTypeDef = executor.submit(ec2_client.describe_volumes).result()
-        volumes: dict[str, list[str]] = defaultdict(list)
-        for v in volumes_response["Volumes"]:
-            for a in v["Attachments"]:
-                volumes[a["InstanceId"]].append(f"Size={v['Size']} GiB")
+    sort_fields = [(f, desc) for f, desc in parse_fields(sort_by) if f in cols]
+
+    if offline:
+        region = inventory.region(config)
+
+        def fetch(fields: list[tuple[str, bool]]) -> list[Instance]:
+            return _describe_offline(region, api_filters, cols, fields, limit)
     else:
-        volumes = {}
+        # reuse the same client for every poll when watching
+        ec2_client = boto3.client("ec2", region_name=config.get("region", None))
+
+        def fetch(fields: list[tuple[str, bool]]) -> list[Instance]:
+            return _describe(ec2_client, api_filters, cols, fields, limit)
+
+    if watch:
+        key = "InstanceId" if "InstanceId" in cols else None
+        # rows with a key stay in the order first seen, so later polls aren't sorted unless limited to the first rows
+        poll_sort_fields = sort_fields if limit or not key else []
+        rows = util_watch.watch(lambda: fetch(sort_fields), key=key, poll=lambda: fetch(poll_sort_fields))
+        return cast(list[Instance], rows)
+
+    return fetch(sort_fields)
+
+
+class PageInfo(NamedTuple):
+    """Info fetched for a page of instances, used by column extractors."""
+
+    volumes: dict[str, list[str]]
+    images: dict[str, ImageTypeDef]
+
+
+Extractor = Callable[["InstanceTypeDef", PageInfo], Any]
+
+# columns special to aec, other columns are copied from the instance
+column_extractors: dict[str, Extractor] = {
+    "State": lambda i, _: i["State"]["Name"],
+    "Name": lambda i, _: util_tags.get_value(i, "Name"),
+    "Type": lambda i, _: i["InstanceType"],
+    "DnsName": lambda i, _: i.get("PublicDnsName") or i.get("PrivateDnsName", ""),
+    "Volumes": lambda i, p: p.volumes.get(i["InstanceId"], []),
+}
+
+
+def column_extractor(col: str) -> Extractor:
+    if col in column_extractors:
+        return column_extractors[col]
+    elif col.startswith("Image."):
+        key = col.split(".")[1]
+        return lambda i, p: p.images.get(i["ImageId"], {}).get(key, None)
+    else:
+        return lambda i, _: i.get(col, None)
+
+
+def _describe(
+    ec2_client: EC2Client,
+    filters: list[FilterTypeDef],
+    cols: list[str],
+    sort_fields: list[tuple[str, bool]],
+    limit: int | None = None,
+) -> list[Instance]:
+    kwargs: dict[str, Any] = {"MaxResults": 1000, "Filters": filters}
+
+    # compiled once, rather than deciding how to extract each column for every instance
+    extractors = [(col, column_extractor(col)) for col in cols]
+    # only make the calls needed for the requested columns
+    fetch_volumes = "Volumes" in cols
+    fetch_images = any(col.startswith("Image.") for col in cols)
 
-    response = response_fut.result()
+    response = ec2_client.describe_instances(**kwargs)
 
     # import json; print(json.dumps(response))
 
     instances: list[Instance] = []
     while True:
-        if "Image." in columns:
-            # fetch image info
-            images_ids = [i["ImageId"] for r in response["Reservations"] for i in r["Instances"]]
-            images_response = ec2_client.describe_images(ImageIds=images_ids)
-            images_by_id = {i["ImageId"]: i for i in images_response["Images"]}
-        else:
-            images_by_id = {}
+        page = [i for r in response["Reservations"] for i in r["Instances"]]
 
-        for r in response["Reservations"]:
-            for i in r["Instances"]:
-                if include_terminated or i["State"]["Name"] != "terminated":
-                    desc: Instance = {}
-
-                    for col in cols:
-                        if col == "State":
-                            desc[col] = i["State"]["Name"]
-                        elif col == "Name":
-                            desc[col] = util_tags.get_value(i, "Name")
-                        elif col == "Type":
-                            desc[col] = i["InstanceType"]
-                        elif col == "DnsName":
-                            desc[col] = i.get("PublicDnsName") or i.get("PrivateDnsName", "")
-                        elif col == "Volumes":
-                            desc[col] = volumes.get(i["InstanceId"], [])
-                        elif "Image." in col:
-                            key = col.split(".")[1]
-                            desc[col] = images_by_id[i["ImageId"]].get(key, None)
-                        else:
-                            desc[col] = i.get(col, None)
-
-                    instances.append(desc)
+        if fetch_volumes and page:
+            # fetch volume info for just this page's instances, while we fetch the next page
+            volumes_fut = executor.submit(describe_volumes, ec2_client, [i["InstanceId"] for i in page])
+        else:
+            volumes_fut = None
 
         next_token = response.get("NextToken", None)
         if next_token:
             kwargs["NextToken"] = next_token
-            response = ec2_client.describe_instances(**kwargs)
+            response_fut = executor.submit(ec2_client.describe_instances, **kwargs)
         else:
+            response_fut = None
+
+        if fetch_images and page:
+            # only images not already cached are described
+            account = response["Reservations"][0]["OwnerId"]
+            images_by_id = image_cache.images(ec2_client, account, (i["ImageId"] for i in page))
+        else:
+            images_by_id = {}
+
+        info = PageInfo(volumes=volumes_fut.result() if volumes_fut else {}, images=images_by_id)
+
+        instances.extend(cast(Instance, {col: extract(i, info) for col, extract in extractors}) for i in page)
+
+        if not response_fut:
             break
 
-    return sorted(
-        instances,
-        key=lambda i: "".join(str(i[field]) for field in sort_cols),
+        response = response_fut.result()
+
+    return sort_rows(instances, sort_fields, limit)
+
+
+def _describe_offline(
+    region: str,
+    filters: list[FilterTypeDef],
+    cols: list[str],
+    sort_fields: list[tuple[str, bool]],
+    limit: int | None = None,
+) -> list[Instance]:
+    instances = inventory.instances(region, filters)
+
+    if "Volumes" in cols:
+        volumes = volumes_by_instance(inventory.attached_volumes(region, [i["InstanceId"] for i in instances]))
+    else:
+        volumes = {}
+
+    if any(col.startswith("Image.") for col in cols):
+        images = inventory.images_by_id(region, list({i["ImageId"] for i in instances}))
+    else:
+        images = {}
+
+    info = PageInfo(volumes=volumes, images=images)
+    extractors = [(col, column_extractor(col)) for col in cols]
+    rows = [cast(Instance, {col: extract(i, info) for col, extract in extractors}) for i in instances]
+
+    return sort_rows(rows, sort_fields, limit)
+
+
+# maximum number of values allowed in a single filter
+MAX_FILTER_VALUES = 200
+
+
+def describe_volumes(ec2_client: EC2Client, instance_ids: list[str]) -> dict[str, list[str]]:
+    """Map of instance id to descriptions of its attached volumes."""
+    # chunks are described concurrently
+    calls = [
+        Call(
+            ec2_client,
+            "describe_volumes",
+            {"Filters": [{"Name": "attachment.instance-id", "Values": instance_ids[c : c + MAX_FILTER_VALUES]}]},
+        )
+        for c in range(0, len(instance_ids), MAX_FILTER_VALUES)
+    ]
+    return volumes_by_instance(
+        cast("VolumeTypeDef", v) for pages in engine.results(calls) for page in pages for v in page["Volumes"]
     )
 
 
+def volumes_by_instance(volumes: Iterable[VolumeTypeDef]) -> dict[str, list[str]]:
+    """Map of instance id to descriptions of its attached volumes."""
+    by_instance: dict[str, list[str]] = defaultdict(list)
+    for v in volumes:
+        for a in v["Attachments"]:
+            by_instance[a["InstanceId"]].append(volume_text(v))
+
+    return by_instance
+
+
+def volume_text(volume: VolumeTypeDef) -> str:
+    text = f"Size={volume['Size']} GiB, Type={volume['VolumeType']}"
+    if volume.get("Iops", None):
+        text += f", Iops={volume['Iops']}"
+    if volume.get("Throughput", None):
+        text += f", Throughput={volume['Throughput']} MiB/s"
+    return text
+
+
 def describe_tags(
     config: Config,
     ident: str | None = None,
     name_match: str | None = None,
     keys: Sequence[str] = [],
     volumes: bool = False,
+    offline: bool = False,
 ) -> list[dict[str, Any]]:
     """List EC2 instances or volumes with their tags."""
     if volumes:
-        return volume_tags(config, ident, name_match, keys)
+        return volume_tags(config, ident, name_match, keys, offline)
 
-    return instance_tags(config, ident, name_match, keys)
+    return instance_tags(config, ident, name_match, keys, offline)
 
 
 def rename(
@@ -338,12 +474,21 @@ def tag(
     ident: str | None = None,
     name_match: str | None = None,
     tags: Sequence[str] = [],
+    from_file: str | None = None,
 ) -> list[dict[str, Any]]:
-    """Tag EC2 instance(s)."""
+    """Tag EC2 instance(s), or many resources with the tags in a csv or json file."""
+    if from_file:
+        if ident or name_match or tags:
+            raise HandledError("--from can't be combined with an instance identifier, name match or tags")
+        return tag_from(config, util_tags.read_mapping(from_file))
+
     if not ident and not name_match:
         # avoid tagging all instances when there's no name
         raise ValueError("Missing instance identifier or name_match")
 
+    if not tags:
+        raise HandledError("Specify the tags to create, or --from a file of tags")
+
     ec2_client = boto3.client("ec2", region_name=config.get("region", None))
 
     tagdefs: list[TagTypeDef] = []
@@ -361,45 +506,101 @@ def tag(
 
     ec2_client.create_tags(Resources=ids, Tags=tagdefs)
 
-    return describe_tags(config, ident, name_match, keys=[d["Key"] for d in tagdefs])
+    # the tags just created, rather than describing the instances again
+    return [
+        {
+            "InstanceId": i["InstanceId"],
+            "Name": i.get("Name", None),
+            **{f"Tag: {d['Key']}": d["Value"] for d in tagdefs},
+        }
+        for i in instances
+    ]
+
+
+def tag_from(config: Config, resources: dict[str, dict[str, str]]) -> list[dict[str, Any]]:
+    """Tag resources, making a create_tags call per chunk of resources with the same tags."""
+    ec2_client = boto3.client("ec2", region_name=config.get("region", None), config=throttle_retries)
+
+    # resources with identical tags can be tagged in the same call
+    groups: dict[tuple[tuple[str, str], ...], list[str]] = defaultdict(list)
+    for resource_id, resource_tags in resources.items():
+        if resource_tags:
+            groups[tuple(sorted(resource_tags.items()))].append(resource_id)
+
+    chunks = [
+        (tagset, ids[i : i + MAX_CREATE_TAGS_RESOURCES])
+        for tagset, ids in groups.items()
+        for i in range(0, len(ids), MAX_CREATE_TAGS_RESOURCES)
+    ]
+
+    def create_tags(chunk: tuple[tuple[tuple[str, str], ...], list[str]]) -> dict[str, Any]:
+        tagset, ids = chunk
+        try:
+            ec2_client.create_tags(Resources=ids, Tags=[{"Key": k, "Value": v} for k, v in tagset])
+            status = "tagged"
+        except ClientError as e:
+            status = f"{e.response['Error']['Code']}: {e.response['Error']['Message']}"
+
+        return {
+            "Tags": ", ".join(f"{k}={v}" for k, v in tagset),
+            "Resources": len(ids),
+            "First": ids[0],
+            "Status": status,
+        }
+
+    return fanout(create_tags, chunks)
 
 
 def instance_tags(
-    config: Config, ident: str | None = None, name_match: str | None = None, keys: Sequence[str] = []
+    config: Config,
+    ident: str | None = None,
+    name_match: str | None = None,
+    keys: Sequence[str] = [],
+    offline: bool = False,
 ) -> list[dict[str, Any]]:
     """List EC2 instances with their tags."""
 
-    ec2_client = boto3.client("ec2", region_name=config.get("region", None))
-
-    response = ec2_client.describe_instances(Filters=to_filters(ident, name_match))
+    filters = to_filters(ident, name_match)
+    if offline:
+        described = inventory.instances(inventory.region(config), filters)
+    else:
+        ec2_client = boto3.client("ec2", region_name=config.get("region", None))
+        response = ec2_client.describe_instances(Filters=filters)
+        described = [i for r in response["Reservations"] for i in r["Instances"]]
 
     instances: list[dict[str, Any]] = []
-    for r in response["Reservations"]:
-        for i in r["Instances"]:
-            if i["State"]["Name"] != "terminated":
-                inst = {"InstanceId": i["InstanceId"], "Name": util_tags.get_value(i, "Name")}
-                if not keys:
-                    inst["Tags"] = ", ".join(f"{tag['Key']}={tag['Value']}" for tag in i.get("Tags", []))
-                else:
-                    for key in keys:
-                        inst[f"Tag: {key}"] = util_tags.get_value(i, key)
-
-                instances.append(inst)
+    for i in described:
+        if i["State"]["Name"] != "terminated":
+            inst = {"InstanceId": i["InstanceId"], "Name": util_tags.get_value(i, "Name")}
+            if not keys:
+                inst["Tags"] = ", ".join(f"{tag['Key']}={tag['Value']}" for tag in i.get("Tags", []))
+            else:
+                for key in keys:
+                    inst[f"Tag: {key}"] = util_tags.get_value(i, key)
+
+            instances.append(inst)
 
     return sorted(instances, key=lambda i: str(i["Name"]))
 
 
 def volume_tags(
-    config: Config, ident: str | None = None, name_match: str | None = None, keys: Sequence[str] = []
+    config: Config,
+    ident: str | None = None,
+    name_match: str | None = None,
+    keys: Sequence[str] = [],
+    offline: bool = False,
 ) -> list[dict[str, Any]]:
     """List EC2 volumes with their tags."""
 
-    ec2_client = boto3.client("ec2", region_name=config.get("region", None))
-
-    response = ec2_client.describe_volumes(Filters=to_filters(ident, name_match))
+    filters = to_filters(ident, name_match)
+    if offline:
+        described = inventory.volumes(inventory.region(config), filters)
+    else:
+        ec2_client = boto3.client("ec2", region_name=config.get("region", None))
+        described = ec2_client.describe_volumes(Filters=filters)["Volumes"]
 
     volumes: list[dict[str, Any]] = []
-    for v in response["Volumes"]:
+    for v in described:
         vol = {"VolumeId": v["VolumeId"], "Name": util_tags.get_value(v, "Name")}
         if not keys:
             vol["Tags"] = ", ".join(f"{tag['Key']}={tag['Value']}" for tag in v.get("Tags", []))
@@ -412,69 +613,201 @@ def volume_tags(
     return sorted(volumes, key=lambda i: str(i["Name"]))
 
 
+# instance ids per start, stop or terminate call
+MAX_STATE_CHANGE_IDS = 1000
+
+# the key of the instances' state changes in each operation's response
+state_changes = {
+    "start_instances": "StartingInstances",
+    "stop_instances": "StoppingInstances",
+    "terminate_instances": "TerminatingInstances",
+}
+
+# seconds between polls, and the maximum wait, for instances to change state
+STATE_POLL_SECONDS = 5
+STATE_TIMEOUT_SECONDS = 60 * 10
+
+
+def _matching_instances(
+    config: Config,
+    idents: str | list[str] | None,
+    name_match: str | None,
+    filters: list[str] | None,
+    columns: str = "InstanceId,State,Name",
+) -> list[Instance]:
+    if isinstance(idents, str):
+        idents = [idents]
+    if not idents and not name_match and not filters:
+        # avoid changing all instances when there's no identifier
+        raise HandledError("Specify instance names or ids, a name match with -q, or filters with -f")
+    if idents and not all(idents):
+        # we already check args via arg parser, so this is defence in depth
+        raise ValueError("Missing instance identifier")
+
+    instances = describe(config, idents, name_match, columns=columns, filters=filters)
+
+    if not instances:
+        if idents or name_match:
+            raise NoInstancesError(name=idents, name_match=name_match)
+        raise HandledError(f"No instances matching {', '.join(filters or [])}")
+
+    return instances
+
+
+def _change_state(
+    ec2_client: EC2Client, operation: str, instances: list[Instance], wait_for: str | None = None
+) -> list[dict[str, Any]]:
+    """
+    Start, stop or terminate instances, in batches made concurrently.
+
+    When wait_for is a state, polls until every instance reaches it, or is terminated.
+    When a batch fails, every row has a Status, which is the error for the instances in that batch.
+    """
+    instance_ids = [i["InstanceId"] for i in instances]
+    batches = [instance_ids[b : b + MAX_STATE_CHANGE_IDS] for b in range(0, len(instance_ids), MAX_STATE_CHANGE_IDS)]
+
+    def change(batch: list[str]) -> tuple[dict[str, str], str | None]:
+        try:
+            response = getattr(ec2_client, operation)(InstanceIds=batch)
+        except ClientError as e:
+            return {}, f"{e.response['Error']['Code']}: {e.response['Error']['Message']}"
+        return {i["InstanceId"]: i["CurrentState"]["Name"] for i in response[state_changes[operation]]}, None
+
+    states: dict[str, str] = {}
+    errors: dict[str, str] = {}
+    for batch, (batch_states, error) in zip(batches, fanout(change, batches), strict=True):
+        states.update(batch_states)
+        if error:
+            errors.update(dict.fromkeys(batch, error))
+
+    if wait_for:
+        names = {i["InstanceId"]: i.get("Name") or i["InstanceId"] for i in instances}
+        states = _wait_for_state(ec2_client, names, states, wait_for)
+
+    rows: list[dict[str, Any]] = []
+    for i in instances:
+        instance_id = i["InstanceId"]
+        if instance_id in states:
+            row = {"State": states[instance_id], "InstanceId": instance_id}
+        elif instance_id in errors:
+            # unchanged
+            row = {"State": i.get("State"), "InstanceId": instance_id}
+        else:
+            continue
+        if errors:
+            row["Status"] = errors.get(instance_id, "ok")
+        rows.append(row)
+
+    return rows
+
+
+def _change_instance_state(ec2_client: EC2Client, operation: str, instance: Instance, wait_for: str) -> str:
+    """Start or stop a single instance, and wait until it reaches wait_for. Returns its state."""
+    instance_id = instance["InstanceId"]
+    response = getattr(ec2_client, operation)(InstanceIds=[instance_id])
+    states = {i["InstanceId"]: i["CurrentState"]["Name"] for i in response[state_changes[operation]]}
+    names = {instance_id: instance.get("Name") or instance_id}
+    return _wait_for_state(ec2_client, names, states, wait_for)[instance_id]
+
+
+def _wait_for_state(ec2_client: EC2Client, names: dict[str, str], states: dict[str, str], state: str) -> dict[str, str]:
+    """Poll the instances until they're all in state or terminated, printing each change in state."""
+    states = dict(states)
+    deadline = monotonic() + STATE_TIMEOUT_SECONDS
+
+    while pending := [i for i, s in states.items() if s not in (state, "terminated")]:
+        if monotonic() > deadline:
+            raise TimeoutError(f"{len(pending)} instances not {state} after {STATE_TIMEOUT_SECONDS} seconds")
+        sleep(STATE_POLL_SECONDS)
+
+        # only the pending instances, in chunks described concurrently
+        calls = [
+            Call(
+                ec2_client,
+                "describe_instances",
+                {"Filters": [{"Name": "instance-id", "Values": pending[c : c + MAX_FILTER_VALUES]}]},
+            )
+            for c in range(0, len(pending), MAX_FILTER_VALUES)
+        ]
+        with memo.bypassed():
+            results = list(engine.results(calls))
+        current = {
+            i["InstanceId"]: i["State"]["Name"]
+            for pages in results
+            for page in pages
+            for r in page["Reservations"]
+            for i in r["Instances"]
+        }
+        for instance_id in pending:
+            # instances terminated a while ago are purged, and no longer described
+            state_now = current.get(instance_id, "terminated")
+            if states[instance_id] != state_now:
+                print(f"{names[instance_id]} is {state_now}", flush=True)
+                states[instance_id] = state_now
+
+    return states
+
+
 def start(
     config: Config,
-    idents: str | list[str],
+    idents: str | list[str] | None = None,
+    name_match: str | None = None,
+    filters: list[str] | None = None,
     wait_ssm: bool = False,
 ) -> list[Instance]:
     """Start EC2 instance(s)."""
 
-    ec2_client = boto3.client("ec2", region_name=config.get("region", None))
-
-    instances = describe(config, idents)
+    ec2_client = boto3.client("ec2", region_name=config.get("region", None), config=throttle_retries)
 
-    if not instances:
-        raise NoInstancesError(idents)
+    instances = _matching_instances(config, idents, name_match, filters)
 
     for i in instances:
         name_or_id = i.get("Name") or i["InstanceId"]
         print(f"Starting instance {name_or_id} ... ")
 
-    instance_ids = [instance["InstanceId"] for instance in instances]
-
-    ec2_client.start_instances(InstanceIds=instance_ids)
+    for row in _change_state(ec2_client, "start_instances", instances, wait_for="running"):
+        if row.get("Status", "ok") != "ok":
+            print(f"Failed to start instance {row['InstanceId']}: {row['Status']}")
 
-    waiter = ec2_client.get_waiter("instance_running")
-    waiter.wait(InstanceIds=instance_ids)
+    instance_ids = [instance["InstanceId"] for instance in instances]
 
     if wait_ssm:
         instances_text = "Instances" if len(instance_ids) > 1 else "Instance"
         print(f"{instances_text} running. Waiting for SSM agent to come online ...")
         _wait_ssm_agent_online(config, instance_ids)
 
-    return describe(config, idents)
+    return describe(config, idents, name_match, filters=filters)
 
 
-def stop(config: Config, idents: list[str]) -> list[dict[str, Any]]:
+def stop(
+    config: Config,
+    idents: str | list[str] | None = None,
+    name_match: str | None = None,
+    filters: list[str] | None = None,
+    wait: bool = False,
+) -> list[dict[str, Any]]:
     """Stop EC2 instance(s)."""
 
-    ec2_client = boto3.client("ec2", region_name=config.get("region", None))
-
-    instances = describe(config, idents)
-
-    if not instances:
-        raise NoInstancesError(name=idents)
+    ec2_client = boto3.client("ec2", region_name=config.get("region", None), config=throttle_retries)
 
-    instance_ids = [instance["InstanceId"] for instance in instances]
-    response = ec2_client.stop_instances(InstanceIds=instance_ids)
+    instances = _matching_instances(config, idents, name_match, filters)
 
-    return [{"State": i["CurrentState"]["Name"], "InstanceId": i["InstanceId"]} for i in response["StoppingInstances"]]
+    return _change_state(ec2_client, "stop_instances", instances, wait_for="stopped" if wait else None)
 
 
-def terminate(config: Config, idents: list[str], yes: bool = True) -> list[dict[str, Any]]:
+def terminate(
+    config: Config,
+    idents: str | list[str] | None = None,
+    name_match: str | None = None,
+    filters: list[str] | None = None,
+    yes: bool = True,
+    wait: bool = False,
+) -> list[dict[str, Any]]:
     """Terminate EC2 instance(s)."""
 
-    if not idents or not idents[0]:
-        # avoid terminating all instances when there's no identifier
-        # we already check args via arg parser, so this is defence in depth
-        raise ValueError("Missing instance identifier")
-
-    ec2_client = boto3.client("ec2", region_name=config.get("region", None))
-
-    instances = describe(config, idents)
+    ec2_client = boto3.client("ec2", region_name=config.get("region", None), config=throttle_retries)
 
-    if not instances:
-        raise NoInstancesError(name=idents)
+    instances = _matching_instances(config, idents, name_match, filters)
 
     print("The following instances will be terminated:")
     for instance in instances:
@@ -491,40 +824,47 @@ def terminate(config: Config, idents: list[str], yes: bool = True) -> list[dict[
             print("Termination cancelled.")
             return []
 
-    instance_ids = [instance["InstanceId"] for instance in instances]
-    response = ec2_client.terminate_instances(InstanceIds=instance_ids)
-
-    return [
-        {"State": i["CurrentState"]["Name"], "InstanceId": i["InstanceId"]} for i in response["TerminatingInstances"]
-    ]
+    return _change_state(ec2_client, "terminate_instances", instances, wait_for="terminated" if wait else None)
 
 
 def modify(config: Config, ident: str, type: str) -> list[Instance]:
     """Change an instance's type."""
     ec2_client = boto3.client("ec2", region_name=config.get("region", None))
 
-    instances = describe(config, ident)
+    instances = describe(config, ident, columns="InstanceId,Name,Type,EbsOptimized")
 
     if not instances:
         raise NoInstancesError(name=ident)
 
-    instance_id = instances[0]["InstanceId"]
-    ec2_client.modify_instance_attribute(InstanceId=instance_id, InstanceType={"Value": type})
-    ec2_client.modify_instance_attribute(InstanceId=instance_id, EbsOptimized={"Value": is_ebs_optimizable(type)})
+    _modify_type(ec2_client, instances[0], type)
 
     return describe(config, ident)
 
 
+def _modify_type(ec2_client: EC2Client, instance: Instance, type: str) -> None:
+    """Change a stopped instance's type. The instance must be described with the Type and EbsOptimized columns."""
+    instance_id = instance["InstanceId"]
+    # each call modifies a single attribute
+    if instance["Type"] != type:
+        ec2_client.modify_instance_attribute(InstanceId=instance_id, InstanceType={"Value": type})
+    if instance["EbsOptimized"] != is_ebs_optimizable(type):
+        ec2_client.modify_instance_attribute(InstanceId=instance_id, EbsOptimized={"Value": is_ebs_optimizable(type)})
+
+
+def _restore_type(ec2_client: EC2Client, instance: Instance, was_running: bool) -> str | None:
+    """Change a stopped instance back to its described type, and start it if it was running. Returns its state."""
+    # the type may have changed before a failure to change EbsOptimized
+    ec2_client.modify_instance_attribute(InstanceId=instance["InstanceId"], InstanceType={"Value": instance["Type"]})
+    if not was_running:
+        return None
+    print(f"Starting instance {instance.get('Name') or instance['InstanceId']} as {instance['Type']} ... ", flush=True)
+    return _change_instance_state(ec2_client, "start_instances", instance, wait_for="running")
+
+
 def restart(config: Config, ident: str, type: str | None = None, wait_ssm: bool = False) -> list[Instance]:
     """Restart EC2 instance, optionally changing the instance type."""
     print(f"Stopping instance {ident}")
-    stop(config, [ident])
-
-    instance_status = describe(config, ident)[0]["State"]
-    while instance_status != "stopped":
-        print(f"Waiting for instance {ident} to stop ...")
-        sleep(5)
-        instance_status = describe(config, ident)[0]["State"]
+    stop(config, ident, wait=True)
 
     if type:
         print(f"Changing instance type to {type}")
@@ -533,6 +873,78 @@ def restart(config: Config, ident: str, type: str | None = None, wait_ssm: bool
     return start(config, ident, wait_ssm=wait_ssm)
 
 
+def resize(
+    config: Config,
+    type: str,
+    idents: list[str] | None = None,
+    name_match: str | None = None,
+    filters: list[str] | None = None,
+    max_parallel: int = 5,
+    wait_ssm: bool = True,
+) -> list[dict[str, Any]]:
+    """Change the type of many instances, restarting a few at a time."""
+    if max_parallel < 1:
+        raise HandledError("--max-parallel must be at least 1")
+
+    ec2_client = boto3.client("ec2", region_name=config.get("region", None), config=throttle_retries)
+
+    instances = _matching_instances(
+        config, idents, name_match, filters, columns="InstanceId,State,Name,Type,EbsOptimized"
+    )
+
+    # once an instance fails, the rest are skipped so a bad type doesn't take down the whole fleet
+    failed = threading.Event()
+
+    def resize_instance(instance: Instance) -> dict[str, Any]:
+        name_or_id = instance.get("Name") or instance["InstanceId"]
+        state = instance["State"]
+        was_running = state in ("pending", "running")
+        applied = instance["Type"]
+
+        if instance["Type"] == type:
+            status = "unchanged"
+        elif failed.is_set():
+            status = "skipped"
+        else:
+            try:
+                if state != "stopped":
+                    print(f"Stopping instance {name_or_id} ... ", flush=True)
+                    state = _change_instance_state(ec2_client, "stop_instances", instance, wait_for="stopped")
+
+                try:
+                    _modify_type(ec2_client, instance, type)
+                except ClientError:
+                    # put the instance back as it was, rather than leaving it stopped
+                    state = _restore_type(ec2_client, instance, was_running) or state
+                    raise
+                applied = type
+
+                if was_running:
+                    print(f"Starting instance {name_or_id} as {type} ... ", flush=True)
+                    state = _change_instance_state(ec2_client, "start_instances", instance, wait_for="running")
+                    if wait_ssm:
+                        _wait_ssm_agent_online(config, [instance["InstanceId"]])
+
+                status = "resized"
+            except ClientError as e:
+                failed.set()
+                status = f"{e.response['Error']['Code']}: {e.response['Error']['Message']}"
+            except TimeoutError as e:
+                failed.set()
+                status = str(e)
+
+        return {
+            "InstanceId": instance["InstanceId"],
+            "Name": instance.get("Name"),
+            "Type": applied,
+            "State": state,
+            "Status": status,
+        }
+
+    # a sliding window, the next instance starts resizing as soon as one finishes
+    return fanout(resize_instance, instances, max_workers=max_parallel)
+
+
 def create_key_pair(config: Config, key_name: str, file_path: str) -> str:
     """Create a key pair."""
 
@@ -579,53 +991,75 @@ def status(
     config: Config,
     ident: str | None = None,
     name_match: str | None = None,
+    watch: bool = False,
 ) -> list[dict[str, Any]]:
     """Describe instances status checks."""
-    ec2_client = boto3.client("ec2", region_name=config.get("region", None))
-
-    kwargs: dict[str, Any] = {"MaxResults": 1000}
-
-    response_fut = executor.submit(ec2_client.describe_instance_status, **kwargs)
-    instances = executor.submit(describe_running_instances_names, config).result()
-    response = response_fut.result()
-
-    def match(instance_id: str, instance_name: str | None) -> bool:
-        # describe_instance_status doesn't support name filters in the request so match here
-        if not ident and not name_match:
-            return True
-
-        if ident is not None:
-            return (ident.startswith("i-") and ident == instance_id) or (ident == instance_name)
-
-        return not name_match or name_match in (instance_name or "")
-
-    statuses = []
-    while True:
-        statuses.extend(
-            [
-                {
-                    "InstanceId": i["InstanceId"],
-                    "State": i["InstanceState"]["Name"],
-                    "Name": instances.get(i["InstanceId"], None),
-                    "System status check": status_text(i["SystemStatus"]),
-                    "Instance status check": status_text(i["InstanceStatus"]),
-                }
-                for i in response["InstanceStatuses"]
-                if match(i["InstanceId"], instances.get(i["InstanceId"], None))
-            ]
+    ec2_client = boto3.client("ec2", region_name=config.get("region", None), config=throttle_retries)
+
+    if watch:
+        # reuse the same client for every poll
+        rows = util_watch.watch(lambda: _status(config, ec2_client, ident, name_match), key="InstanceId")
+        return cast(list[dict[str, Any]], rows)
+
+    return _status(config, ec2_client, ident, name_match)
+
+
+def _status(config: Config, ec2_client: EC2Client, ident: str | None, name_match: str | None) -> list[dict[str, Any]]:
+    if ident or name_match:
+        # describe_instance_status doesn't support name filters, so resolve the matching instances
+        # first and then request the status of just those instances
+        filters = {f["Name"]: f["Values"] for f in to_filters(ident, name_match)}
+        instances = describe_instances_names(config, {**filters, "instance-state-name": ["running"]}, ec2_client)
+        instance_ids = list(instances.keys())
+
+        # batches are described concurrently
+        calls = [
+            Call(
+                ec2_client,
+                "describe_instance_status",
+                {"InstanceIds": instance_ids[b : b + MAX_STATUS_INSTANCE_IDS]},
+                paginate=False,
+            )
+            for b in range(0, len(instance_ids), MAX_STATUS_INSTANCE_IDS)
+        ]
+        instance_statuses = cast(
+            "list[InstanceStatusTypeDef]",
+            [s for pages in engine.results(calls) for page in pages for s in page["InstanceStatuses"]],
         )
+    else:
+        kwargs: dict[str, Any] = {"MaxResults": 1000}
+
+        response_fut = executor.submit(ec2_client.describe_instance_status, **kwargs)
+        instances = executor.submit(describe_running_instances_names, config, ec2_client).result()
+        response = response_fut.result()
+
+        instance_statuses = []
+        while True:
+            instance_statuses.extend(response["InstanceStatuses"])
+
+            next_token = response.get("NextToken", None)
+            if next_token:
+                kwargs["NextToken"] = next_token
+                response = ec2_client.describe_instance_status(**kwargs)
+            else:
+                break
+
+    statuses = [
+        {
+            "InstanceId": i["InstanceId"],
+            "State": i["InstanceState"]["Name"],
+            "Name": instances.get(i["InstanceId"], None),
+            "System status check": status_text(i["SystemStatus"]),
+            "Instance status check": status_text(i["InstanceStatus"]),
+        }
+        for i in instance_statuses
+    ]
 
-        next_token = response.get("NextToken", None)
-        if next_token:
-            kwargs["NextToken"] = next_token
-            response = ec2_client.describe_instance_status(**kwargs)
-        else:
-            break
+    return sort_rows(statuses, parse_fields("State,Name"))
 
-    return sorted(
-        statuses,
-        key=lambda i: "".join(str(i[field]) for field in ["State", "Name"]),
-    )
+
+# maximum number of instance ids describe_instance_status accepts in a single request
+MAX_STATUS_INSTANCE_IDS = 100
 
 
 def status_text(summary: InstanceStatusSummaryTypeDef, key: str = "reachability") -> str:
@@ -707,6 +1141,29 @@ def user_data(config: Config, ident: str) -> str | None:
         return None
 
 
+instance_states = ["pending", "running", "shutting-down", "terminated", "stopping", "stopped"]
+
+# shorthand names for common filters
+filter_aliases = {"az": "availability-zone", "type": "instance-type", "vpc": "vpc-id", "subnet": "subnet-id"}
+
+
+def parse_filters(filters: list[str]) -> list[FilterTypeDef]:
+    """
+    Convert key=value strings into describe_instances filters, eg: tag:Team=infra or instance-type=t3.small,t3.medium
+
+    Comma separated values match any of the values. The same key given more than once also matches any of its values.
+    """
+    values_by_name: dict[str, list[str]] = {}
+    for f in filters:
+        key, sep, value = f.partition("=")
+        if not sep or not key:
+            raise ValueError(f"Invalid filter '{f}'. Must be in key=value form.")
+        name = filter_aliases.get(key, key)
+        values_by_name.setdefault(name, []).extend(value.split(","))
+
+    return [{"Name": name, "Values": values} for name, values in values_by_name.items()]
+
+
 def to_filters(idents: str | list[str] | None = None, name_match: str | None = None) -> list[FilterTypeDef]:
     if not idents:
         if name_match:
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+import boto3
+
+import aec.command.ami as ami_cmd
+import aec.util.config as util_config
+import aec.util.inventory as inventory
+from aec.command.ec2 import MAX_FILTER_VALUES
+from aec.util.config import Config
+from aec.util.threads import fanout, throttle_retries
+
+if TYPE_CHECKING:
+    from mypy_boto3_ec2.client import EC2Client
+    from mypy_boto3_ec2.type_defs import FilterTypeDef, ImageTypeDef, InstanceTypeDef, VolumeTypeDef
+    from mypy_boto3_ssm.client import SSMClient
+    from mypy_boto3_ssm.type_defs import InstanceInformationTypeDef
+
+
+def sync(config: Config, all_profiles: bool = False) -> list[dict[str, Any]]:
+    """Sync instances, volumes, images and SSM agents to a local inventory, for querying with --offline."""
+
+    configs = list(util_config.load_profiles(util_config.DEFAULT_CONFIG_FILE).values()) if all_profiles else [config]
+
+    # profiles can share a region, so sync each region once for all its profiles' image queries
+    image_queries_by_region: dict[str, set[ImageQuery]] = {}
+    for c in configs:
+        name_match = c.get("describe_images_name_match", None)
+        image_queries_by_region.setdefault(inventory.region(c), set()).update(
+            ImageQuery(owner, name_match) for owner in ami_cmd.image_owners(c)
+        )
+
+    # clients are created up front, because creating them concurrently isn't thread safe
+    clients = [
+        (
+            region,
+            boto3.client("ec2", region_name=region, config=throttle_retries),
+            boto3.client("ssm", region_name=region, config=throttle_retries),
+            sorted(queries, key=str),
+        )
+        for region, queries in image_queries_by_region.items()
+    ]
+
+    return fanout(lambda c: sync_region(*c), clients)
+
+
+class ImageQuery(NamedTuple):
+    owner: str
+    # as per the describe_images_name_match config
+    name_match: str | None
+
+
+def sync_region(
+    region: str, ec2_client: EC2Client, ssm_client: SSMClient, image_queries: list[ImageQuery]
+) -> dict[str, Any]:
+    start = time.perf_counter()
+
+    # each resource is paged through concurrently
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        instances_fut = pool.submit(fetch_instances, ec2_client)
+        volumes_fut = pool.submit(fetch_volumes, ec2_client)
+        images_fut = pool.submit(fetch_images, ec2_client, image_queries)
+        agents_fut = pool.submit(fetch_ssm_agents, ssm_client)
+
+        instances = instances_fut.result()
+        images = images_fut.result()
+
+        # fetch images used by instances that weren't fetched for an owner, for Image.* columns
+        synced_image_ids = {i["ImageId"] for imgs in images.values() for i in imgs}
+        missing_image_ids = sorted({i["ImageId"] for i in instances if "ImageId" in i} - synced_image_ids)
+        images[""] = fetch_images_by_id(ec2_client, missing_image_ids)
+
+        volumes = volumes_fut.result()
+        agents = agents_fut.result()
+
+    inventory.replace(region, instances, volumes, images, agents)
+
+    return {
+        "Region": region,
+        "Instances": len(instances),
+        "Volumes": len(volumes),
+        "Images": len({i["ImageId"] for imgs in images.values() for i in imgs}),
+        "SSM agents": len(agents),
+        "Seconds": round(time.perf_counter() - start, 1),
+    }
+
+
+def fetch_instances(ec2_client: EC2Client) -> list[InstanceTypeDef]:
+    # terminated instances are excluded, they disappear shortly anyway
+    states = ["pending", "running", "shutting-down", "stopping", "stopped"]
+    paginator = ec2_client.get_paginator("describe_instances")
+    pages = paginator.paginate(
+        Filters=[{"Name": "instance-state-name", "Values": states}], PaginationConfig={"PageSize": 1000}
+    )
+    return [i for page in pages for r in page["Reservations"] for i in r["Instances"]]
+
+
+def fetch_volumes(ec2_client: EC2Client) -> list[VolumeTypeDef]:
+    paginator = ec2_client.get_paginator("describe_volumes")
+    return [v for page in paginator.paginate(PaginationConfig={"PageSize": 500}) for v in page["Volumes"]]
+
+
+def fetch_images(ec2_client: EC2Client, image_queries: list[ImageQuery]) -> dict[str, list[ImageTypeDef]]:
+    """Images by owner."""
+    paginator = ec2_client.get_paginator("describe_images")
+    images: dict[str, list[ImageTypeDef]] = {}
+    for q in image_queries:
+        filters: list[FilterTypeDef] = [{"Name": "name", "Values": [f"*{q.name_match}*"]}] if q.name_match else []
+        pages = paginator.paginate(Owners=[q.owner], Filters=filters, PaginationConfig={"PageSize": 1000})
+        images.setdefault(q.owner, []).extend(i for page in pages for i in page["Images"])
+    return images
+
+
+def fetch_images_by_id(ec2_client: EC2Client, image_ids: list[str]) -> list[ImageTypeDef]:
+    paginator = ec2_client.get_paginator("describe_images")
+    images: list[ImageTypeDef] = []
+    for c in range(0, len(image_ids), MAX_FILTER_VALUES):
+        # a filter rather than ImageIds, so deregistered images don't cause an error
+        chunk = image_ids[c : c + MAX_FILTER_VALUES]
+        for page in paginator.paginate(Filters=[{"Name": "image-id", "Values": chunk}]):
+            images.extend(page["Images"])
+    return images
+
+
+def fetch_ssm_agents(ssm_client: SSMClient) -> list[InstanceInformationTypeDef]:
+    paginator = ssm_client.get_paginator("describe_instance_information")
+    pages = paginator.paginate(PaginationConfig={"PageSize": 50})
+    return [i for page in pages for i in page["InstanceInformationList"]]
@@ -9,11 +9,25 @@ from typing import IO, TYPE_CHECKING, Any, Literal, TypedDict, TypeVar, cast
 import boto3
 from botocore.exceptions import ClientError
 
+import aec.util.engine as engine
+import aec.util.inventory as inventory
+import aec.util.tags as util_tags
 from aec.util.config import Config
-from aec.util.ec2_util import describe_instances, describe_instances_names, describe_running_instances_names
+from aec.util.ec2_util import (
+    describe_instances,
+    describe_instances_call,
+    describe_instances_names,
+    describe_running_instances_names,
+    instance_name_states,
+)
+from aec.util.engine import Call
 
 if TYPE_CHECKING:
-    from mypy_boto3_ssm.type_defs import InstanceInformationStringFilterTypeDef, ListCommandInvocationsRequestTypeDef
+    from mypy_boto3_ssm.type_defs import (
+        InstanceInformationStringFilterTypeDef,
+        InstanceInformationTypeDef,
+        ListCommandInvocationsRequestTypeDef,
+    )
 
 
 class Agent(TypedDict):
@@ -28,43 +42,61 @@ def describe(
     config: Config,
     ident: str | None = None,
     name_match: str | None = None,
+    offline: bool = False,
 ) -> Iterator[Agent]:
     """List running instances with the SSM agent."""
 
-    instances_names = describe_running_instances_names(config)
+    if offline:
+        yield from describe_offline(config, ident, name_match)
+        return
 
-    if ident:
-        filters = name_filters([ident])
-    elif name_match:
+    client = boto3.client("ssm", region_name=config.get("region", None))
+
+    def agents_call(filters: list[InstanceInformationStringFilterTypeDef]) -> Call:
+        return Call(client, "describe_instance_information", {"Filters": filters, "PaginationConfig": {"PageSize": 50}})
+
+    if name_match:
+        instances_names = describe_running_instances_names(config)
         # unlike ec2 describe_instances, ssm describe_instance_information doesn't
         # support a wildcard name filter. So do the name match here.
         names = [n for n in instances_names.values() if n and name_match in n]
         if not names:
             return
-        filters = name_filters(names)
+        [agents_pages] = engine.results([agents_call(name_filters(names))])
     else:
-        filters = []
-
-    kwargs: dict[str, Any] = {"MaxResults": 50, "Filters": filters}
-    client = boto3.client("ssm", region_name=config.get("region", None))
-    while True:
-        response = client.describe_instance_information(**kwargs)
-
-        for i in response["InstanceInformationList"]:
-            a: Agent = {
-                "ID": i["InstanceId"],
-                "Name": instances_names.get(i["InstanceId"], None),
-                "PingStatus": i["PingStatus"],
-                "Platform": f"{i['PlatformName']} {i['PlatformVersion']}",
-                "AgentVersion": i["AgentVersion"],
-            }
-            yield a
-
-        next_token = response.get("NextToken", None)
-        if next_token:
-            kwargs["NextToken"] = next_token
-        else:
-            break
+        # names are described concurrently with the agents
+        ec2_client = boto3.client("ec2", region_name=config.get("region", None))
+        names_call = describe_instances_call(ec2_client, {"instance-state-name": ["running"]})
+        names_pages, agents_pages = engine.results([names_call, agents_call(name_filters([ident] if ident else None))])
+        instances_names = {k: v["Name"] for k, v in instance_name_states(names_pages).items()}
+
+    for page in agents_pages:
+        for i in page["InstanceInformationList"]:
+            yield to_agent(i, instances_names.get(i["InstanceId"]))
+
+
+def describe_offline(config: Config, ident: str | None = None, name_match: str | None = None) -> Iterator[Agent]:
+    region = inventory.region(config)
+    running = inventory.instances(region, [{"Name": "instance-state-name", "Values": ["running"]}])
+    instances_names = {i["InstanceId"]: util_tags.get_value(i, "Name") for i in running}
+
+    for i in inventory.ssm_agents(region):
+        name = instances_names.get(i["InstanceId"])
+        if ident and ident not in (i["InstanceId"], name):
+            continue
+        if name_match and not (name and name_match in name):
+            continue
+        yield to_agent(i, name)
+
+
+def to_agent(i: InstanceInformationTypeDef, name: str | None) -> Agent:
+    return {
+        "ID": i["InstanceId"],
+        "Name": name,
+        "PingStatus": i["PingStatus"],
+        "Platform": f"{i['PlatformName']} {i['PlatformVersion']}",
+        "AgentVersion": i["AgentVersion"],
+    }
 
 
 def patch_summary(config: Config) -> Iterator[dict[str, Any]]:
@@ -76,10 +108,13 @@ def patch_summary(config: Config) -> Iterator[dict[str, Any]]:
 
     max_at_a_time = 50
 
-    for i in range(0, len(instance_ids), max_at_a_time):
-        chunk = instance_ids[i : i + max_at_a_time]
-        response = client.describe_instance_patch_states(InstanceIds=chunk)
-        for i in response["InstancePatchStates"]:
+    # chunks are described concurrently
+    calls = [
+        Call(client, "describe_instance_patch_states", {"InstanceIds": instance_ids[c : c + max_at_a_time]})
+        for c in range(0, len(instance_ids), max_at_a_time)
+    ]
+    for pages in engine.results(calls):
+        for i in (s for page in pages for s in page["InstancePatchStates"]):
             yield {
                 "InstanceId": i["InstanceId"],
                 "Name": (instances.get(i["InstanceId"], None) or {}).get("Name", None),
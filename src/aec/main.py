@@ -7,11 +7,17 @@ import botocore.exceptions
 import aec.command.ami as ami
 import aec.command.compute_optimizer as compute_optimizer
 import aec.command.ec2 as ec2
+import aec.command.inventory as inventory
 import aec.command.ssm as ssm
 import aec.util.cli as cli
+import aec.util.completion as completion
 import aec.util.config as config
 import aec.util.configure as configure
+import aec.util.daemon as daemon
 import aec.util.display as display
+import aec.util.limiter as limiter
+import aec.util.memo as memo
+import aec.util.trace as trace
 from aec.util.cli import Arg, Cmd, parameter_defaults
 from aec.util.errors import HandledError
 
@@ -33,6 +39,24 @@ def tag_arg_checker(tag: str) -> str:
     return tag
 
 
+def filter_arg_checker(f: str) -> str:
+    try:
+        ec2.parse_filters([f])
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+    return f
+
+
+def duration_arg_checker(s: str) -> str:
+    try:
+        ami.parse_duration(s)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e)) from None
+
+    return s
+
+
 def non_empty(s: str) -> str:
     if not s:
         raise argparse.ArgumentTypeError("is empty string.")
@@ -57,8 +81,13 @@ ec2_cli = [
         Arg("-q", type=str, dest='name_match', help="Filter to instances with a Name tag containing NAME_MATCH."),
         Arg("-r", "--show-running-only", action='store_true', help="Show running or pending instances only"),
         Arg("-it", "--include-terminated", action='store_true', help="Include terminated instances"),
-        Arg("-s", "--sort-by", type=str, help="Sort by one or more fields", default=parameter_defaults(ec2.describe)["sort_by"]),
+        Arg("-s", "--sort-by", type=str, help="Sort by one or more fields. Prefix a field with - to sort descending, eg: -s=-LaunchTime", default=parameter_defaults(ec2.describe)["sort_by"]),
         Arg("-c", "--columns", type=str, help="Customise the columns shown", default=parameter_defaults(ec2.describe)["columns"]),
+        Arg("-l", "--limit", type=int, help="Show only the first LIMIT instances after sorting"),
+        Arg("--watch", action='store_true', help="Keep polling and highlight instances that change, until interrupted with Ctrl-C"),
+        Arg("-f", "--filter", type=filter_arg_checker, dest='filters', action='append', help="Filter to instances matching key=value, eg: tag:Team=infra, instance-type=t3.small, vpc-id, subnet-id or az. Comma separate values to match any of them. Can be used multiple times."),
+        Arg("--state", dest='states', action='append', choices=ec2.instance_states, help="Filter to instances in this state. Can be used multiple times."),
+        Arg("--offline", action='store_true', help="Query the local inventory created by aec sync, rather than AWS"),
     ]),
     Cmd(ec2.launch, [
         config_arg,
@@ -83,12 +112,17 @@ ec2_cli = [
     ]),
     Cmd(ec2.start, [
         config_arg,
-        Arg("idents", type=non_empty, nargs="+", help="Name tags of instances or instance ids"),
+        Arg("idents", type=non_empty, nargs="*", help="Name tags of instances or instance ids"),
+        Arg("-q", type=str, dest='name_match', help="Filter to instances with a Name tag containing NAME_MATCH."),
+        Arg("-f", "--filter", type=filter_arg_checker, dest='filters', action='append', help="Filter to instances matching key=value, eg: tag:Team=infra. Can be used multiple times."),
         Arg("-w", "--wait-ssm", action='store_true', help="Wait until the SSM agent is online before exiting"),
     ]),
     Cmd(ec2.stop, [
         config_arg,
-        Arg("idents", type=non_empty, nargs="+", help="Name tags of instances or instance ids")
+        Arg("idents", type=non_empty, nargs="*", help="Name tags of instances or instance ids"),
+        Arg("-q", type=str, dest='name_match', help="Filter to instances with a Name tag containing NAME_MATCH."),
+        Arg("-f", "--filter", type=filter_arg_checker, dest='filters', action='append', help="Filter to instances matching key=value, eg: tag:Team=infra. Can be used multiple times."),
+        Arg("--wait", action='store_true', help="Wait until the instances are stopped, showing their progress"),
     ]),
     Cmd(ec2.restart, [
         config_arg,
@@ -96,6 +130,15 @@ ec2_cli = [
         Arg("-t", "--type", type=str, help="Modify the instance to the given type"),
         Arg("-w", "--wait-ssm", action='store_true', help="Wait until the SSM agent is online before exiting"),
     ]),
+    Cmd(ec2.resize, [
+        config_arg,
+        Arg("-t", "--type", type=str, required=True, help="The new instance type"),
+        Arg("idents", type=non_empty, nargs="*", help="Name tags of instances or instance ids"),
+        Arg("-q", type=str, dest='name_match', help="Filter to instances with a Name tag containing NAME_MATCH."),
+        Arg("-f", "--filter", type=filter_arg_checker, dest='filters', action='append', help="Filter to instances matching key=value, eg: tag:Team=infra. Can be used multiple times."),
+        Arg("-p", "--max-parallel", type=int, default=5, help="Resize at most this many instances at a time"),
+        Arg("--no-wait-ssm", dest="wait_ssm", action='store_false', help="Don't wait for the SSM agent to come online before resizing the next instance"),
+    ]),
     Cmd(ec2.sec_groups, [
         config_arg,
         Arg("-v", "--vpc-id", help="Filter to these VPCs"),
@@ -113,7 +156,8 @@ ec2_cli = [
         config_arg,
         Arg("ident", type=non_empty, nargs="?", help="Filter to instances with this Name tag or instance id."),
         Arg("-q", type=str, dest='name_match', help="Filter to instances with a Name tag containing NAME_MATCH."),
-        Arg("-t", "--tags", type=tag_arg_checker, action="append", metavar="TAG", help="Tags to create in key=value form. This flag can be repeated multiple times.", default = [], required = True),
+        Arg("-t", "--tags", type=tag_arg_checker, action="append", metavar="TAG", help="Tags to create in key=value form. This flag can be repeated multiple times.", default = []),
+        Arg("--from", type=str, dest="from_file", metavar="FILE", help="Tag resources with the tags in a csv file with a ResourceId column and a column per tag key, or a json file of resource ids to tags."),
     ]),
     Cmd(ec2.describe_tags, [
         config_arg,
@@ -121,19 +165,24 @@ ec2_cli = [
         Arg("-q", type=str, dest='name_match', help="Filter to instances with a Name tag containing NAME_MATCH."),
         Arg("-v", "--volumes", action='store_true', help="Show volumes"),
         Arg("-k", "--keys", type=str, action="append", metavar="KEY", help="Filter tags to display. This flag can be repeated multiple times.", default = []),
+        Arg("--offline", action='store_true', help="Query the local inventory created by aec sync, rather than AWS"),
     ], name = "tags"),
     Cmd(ec2.status, [
         config_arg,
         Arg("ident", type=non_empty, nargs="?", help="Filter to instances with this Name tag or instance id."),
         Arg("-q", type=str, dest='name_match', help="Filter to instances with a Name tag containing NAME_MATCH."),
+        Arg("--watch", action='store_true', help="Keep polling and highlight instances whose status changes, until interrupted with Ctrl-C"),
     ]),
     Cmd(ec2.templates, [
         config_arg
     ]),
     Cmd(ec2.terminate, [
         config_arg,
-        Arg("idents", type=non_empty, nargs="+", help="Name tags of instances or instance ids"),
-        Arg("-y", "--yes", action='store_true', help="Confirm termination without prompting")
+        Arg("idents", type=non_empty, nargs="*", help="Name tags of instances or instance ids"),
+        Arg("-q", type=str, dest='name_match', help="Filter to instances with a Name tag containing NAME_MATCH."),
+        Arg("-f", "--filter", type=filter_arg_checker, dest='filters', action='append', help="Filter to instances matching key=value, eg: tag:Team=infra. Can be used multiple times."),
+        Arg("-y", "--yes", action='store_true', help="Confirm termination without prompting"),
+        Arg("--wait", action='store_true', help="Wait until the instances are terminated, showing their progress"),
     ]),
     Cmd(ec2.user_data, [
         config_arg,
@@ -151,7 +200,15 @@ ami_cli = [
         Arg("idents", type=non_empty, nargs="*", help="Filter to these AMI names or ids"),
         Arg("--owner", type=str, help="Filter to this owning account"),
         Arg("-q", type=str, dest='name_match', help="Filter to images with a name containing NAME_MATCH."),
-        Arg("--show-snapshot-id", action='store_true', help="Show snapshot id")
+        Arg("--show-snapshot-id", action='store_true', help="Show snapshot id"),
+        Arg("--offline", action='store_true', help="Query the local inventory created by aec sync, rather than AWS"),
+    ]),
+    Cmd(ami.prune, [
+        config_arg,
+        Arg("--older-than", type=duration_arg_checker, required=True, help="Only prune images older than this age, eg: 30d, 12h, 2w"),
+        Arg("--keep", type=int, help="Always keep this many of the most recent matching images", default=parameter_defaults(ami.prune)["keep"]),
+        Arg("-q", "--name-match", type=str, dest='name_match', help="Filter to images with a name containing NAME_MATCH."),
+        Arg("--dry-run", action='store_true', help="Show the images and snapshots that would be deleted without deleting them"),
     ]),
     Cmd(ami.describe_tags, [
         config_arg,
@@ -159,11 +216,13 @@ ami_cli = [
         Arg("--owner", type=str, help="Filter to this owning account"),
         Arg("-q", type=str, dest='name_match', help="Filter to images with a name containing NAME_MATCH."),
         Arg("-k", "--keys", type=str, action="append", metavar="KEY", help="Filter tags to display. This flag can be repeated multiple times.", default = []),
+        Arg("--offline", action='store_true', help="Query the local inventory created by aec sync, rather than AWS"),
     ], name = "tags"),
     Cmd(ami.share, [
         config_arg,
-        Arg("ami", type=str, help="AMI id"),
-        Arg("account", type=str, help="Account id"),
+        Arg("amis", type=str, nargs="+", help="AMI ids, optionally followed by account ids to share with"),
+        Arg("-a", "--account", type=str, dest="accounts", action="append", metavar="ACCOUNT", help="Account id to share with. This flag can be repeated multiple times."),
+        Arg("--snapshots", action='store_true', help="Also grant create volume permission on the images' snapshots"),
     ])
 ]
 
@@ -185,6 +244,7 @@ ssm_cli = [
         config_arg,
         Arg("ident", type=non_empty, nargs="?", help="Filter to instances with this Name tag or instance id."),
         Arg("-q", type=str, dest='name_match', help="Filter to instances with a Name tag containing NAME_MATCH."),
+        Arg("--offline", action='store_true', help="Query the local inventory created by aec sync, rather than AWS"),
     ]),
     Cmd(ssm.invocations, [
         config_arg,
@@ -210,33 +270,52 @@ ssm_cli = [
         Arg("idents", type=str, nargs="+", help="Name tags of instance or instance ids. Use 'all' for all running instances.")
     ]),
 ]
+sync_cmd = Cmd(inventory.sync, [
+    config_arg,
+    Arg("--all-profiles", action='store_true', help="Sync the regions of every profile in the config file"),
+])
+daemon_cmd = Cmd(daemon.serve, [
+    Arg("--stop", dest="stop_daemon", action='store_true', help="Stop the running daemon"),
+    Arg("--idle-timeout", type=int, default=60, help="Minutes without a command before stopping, or 0 to never stop"),
+], name="daemon")
+completion_cmd = Cmd(completion.completion, [
+    Arg("shell", nargs="?", choices=["bash", "zsh"], help="Shell to print the completion script for"),
+    Arg("--refresh-names", action='store_true', help="Refresh the cached instance names used to complete idents"),
+    config_arg,
+])
+
 # fmt: on
 
 
 def build_parser() -> argparse.ArgumentParser:
     # prog=aec so that we run in cog the program name isn't cog
     parser = argparse.ArgumentParser(prog="aec", description="aws ec2 cli")
+    parser.add_argument("--profile", action="store_true", help="Print a summary of where the time was spent to stderr")
+    parser.add_argument("--trace", metavar="FILE", help="Write a Chrome trace of where the time was spent to FILE")
     subparsers = parser.add_subparsers(title="commands")
 
+    inject_config = config.inject_config(config.DEFAULT_CONFIG_FILE)
+
     cli.add_command_group(subparsers, "configure", "Configure subcommands", configure_cli)
-    cli.add_command_group(subparsers, "ec2", "EC2 subcommands", ec2_cli, config.inject_config("~/.aec/ec2.toml"))
-    cli.add_command_group(subparsers, "ami", "AMI subcommands", ami_cli, config.inject_config("~/.aec/ec2.toml"))
-    cli.add_command_group(
-        subparsers,
-        "co",
-        "Compute optimizer subcommands",
-        compute_optimizer_cli,
-        config.inject_config("~/.aec/ec2.toml"),
-    )
-    cli.add_command_group(subparsers, "ssm", "SSM subcommands", ssm_cli, config.inject_config("~/.aec/ec2.toml"))
+    cli.add_command_group(subparsers, "ec2", "EC2 subcommands", ec2_cli, inject_config)
+    cli.add_command_group(subparsers, "ami", "AMI subcommands", ami_cli, inject_config)
+    cli.add_command_group(subparsers, "co", "Compute optimizer subcommands", compute_optimizer_cli, inject_config)
+    cli.add_command_group(subparsers, "ssm", "SSM subcommands", ssm_cli, inject_config)
+    cli.add_command(subparsers, sync_cmd, inject_config)
+    cli.add_command(subparsers, daemon_cmd)
+    cli.add_command(subparsers, completion_cmd)
 
     return parser
 
 
 def main(args: list[str] = sys.argv[1:]) -> None:
+    # each command, including each run by aec daemon, starts with nothing memoised
+    memo.start()
     try:
         result, output_format = cli.dispatch(build_parser(), args)
-        display.pretty_print(result, output_format)
+        # includes any AWS calls made while consuming iterators
+        with trace.span("display.pretty_print"):
+            display.pretty_print(result, output_format)
     except botocore.exceptions.ClientError as e:
         code = e.response["Error"]["Code"]
 
@@ -266,6 +345,11 @@ def main(args: list[str] = sys.argv[1:]) -> None:
     except HandledError as e:
         print(e, file=sys.stderr)
 
+    finally:
+        memo.finish()
+        limiter.report()
+        trace.finish()
+
 
 if __name__ == "__main__":
     main()
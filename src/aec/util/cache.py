@@ -0,0 +1,9 @@
+import os
+from pathlib import Path
+
+
+def cache_dir() -> Path:
+    """Directory for local caches, ~/.aec/cache unless overridden by AEC_CACHE_DIR. Created if missing."""
+    path = Path(os.environ.get("AEC_CACHE_DIR", None) or os.path.expanduser("~/.aec/cache"))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
@@ -1,11 +1,16 @@
 """Helper functions for describing and building a CLI with command groups, which contain many subcommands."""
 
 import inspect
+import time
 from argparse import ArgumentDefaultsHelpFormatter, ArgumentParser, Namespace, _SubParsersAction
 from collections.abc import Callable
 from typing import Any
 
+import aec
+import aec.util.limiter as limiter
+import aec.util.trace as trace
 from aec.util.display import OutputFormat
+from aec.util.errors import HandledError
 
 
 class Arg:
@@ -64,25 +69,65 @@ def add_command_group(
     subcommands = group.add_subparsers(title="subcommands")
 
     for cmd in cmds:
-        parser = subcommands.add_parser(
-            cmd.name, help=cmd.help, description=cmd.help, formatter_class=ArgumentDefaultsHelpFormatter
-        )
-        parser.set_defaults(call_me=cmd.call_me)
-        if cmd.args:
-            for arg in cmd.args:
-                parser.add_argument(*arg.args, **arg.kwargs)
+        add_command_parser(subcommands, cmd)
 
-        # add output arg to every command
-        parser.add_argument(
-            "-o", "--output", choices=OutputFormat.__members__, help="Output format", default=OutputFormat.table.value
-        )
+
+def add_command(
+    parent: _SubParsersAction,
+    cmd: Cmd,
+    args_pre_processor: Callable[[Namespace], None] | None = None,
+) -> None:
+    """Add a top level command, that isn't in a command group."""
+    parser = add_command_parser(parent, cmd)
+    if args_pre_processor:
+        parser.set_defaults(args_pre_processor=args_pre_processor)
+
+
+def add_command_parser(parent: _SubParsersAction, cmd: Cmd) -> ArgumentParser:
+    parser = parent.add_parser(
+        cmd.name, help=cmd.help, description=cmd.help, formatter_class=ArgumentDefaultsHelpFormatter
+    )
+    parser.set_defaults(call_me=cmd.call_me)
+    if cmd.args:
+        for arg in cmd.args:
+            parser.add_argument(*arg.args, **arg.kwargs)
+
+    # add output arg to every command
+    parser.add_argument(
+        "-o", "--output", choices=OutputFormat.__members__, help="Output format", default=OutputFormat.table.value
+    )
+
+    return parser
 
 
 def dispatch(parser: ArgumentParser, args: list[str]) -> tuple[Any, OutputFormat]:
+    parse_start = time.perf_counter()
     pargs = parser.parse_args(args)
+    parse_end = time.perf_counter()
+
+    if getattr(pargs, "watch", False) and getattr(pargs, "output", None) not in (None, OutputFormat.table.value):
+        # watching redraws a live table until interrupted, so there's nothing to write in another format
+        raise HandledError("--watch can only be used with table output")
+
+    # remove tracing args because the call_me function doesn't expect them
+    profile = False
+    if "profile" in pargs:
+        profile = pargs.profile
+        delattr(pargs, "profile")
+    trace_file = None
+    if "trace" in pargs:
+        trace_file = pargs.trace
+        delattr(pargs, "trace")
+
+    if tracer := trace.start(profile, trace_file, origin=aec.imported_at):
+        tracer.add("import aec", "aec", aec.imported_at, parse_start)
+        tracer.add("parse args", "aec", parse_start, parse_end)
+
+    limiter.register()
 
     if "args_pre_processor" in pargs:
-        pargs.args_pre_processor(pargs)
+        with trace.span("load config"):
+            pargs.args_pre_processor(pargs)
         delattr(pargs, "args_pre_processor")
 
     if "call_me" not in pargs:
@@ -101,7 +146,10 @@ def dispatch(parser: ArgumentParser, args: list[str]) -> tuple[Any, OutputFormat
         output_format = OutputFormat[pargs.output]
         delattr(pargs, "output")
 
-    return (call_me(**vars(pargs)), output_format)
+    with trace.span(f"{call_me.__module__.rsplit('.', 1)[-1]}.{call_me.__name__}"):
+        result = call_me(**vars(pargs))
+
+    return (result, output_format)
 
 
 def parameter_defaults(func: Callable) -> dict[str, Any]:
@@ -0,0 +1,151 @@
+"""
+Write rows as Arrow or Parquet. Requires the optional pyarrow dependency, ie: pip install aec-cli[arrow]
+
+Each batch of rows is typed by its own values, and the batches are then widened to a type that fits every batch,
+eg: a column of ints in one batch and floats in another is written as floats.
+"""
+
+from __future__ import annotations
+
+import itertools
+import json
+from collections.abc import Callable, Iterable
+from datetime import date, datetime
+from typing import IO, TYPE_CHECKING, Any
+
+from aec.util.errors import HandledError
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+# rows are converted to arrow in batches of this size, so the whole result is never held as python objects
+BATCH_ROWS = 10_000
+
+# columns that contain ISO 8601 timestamp strings, rather than datetimes
+TIMESTAMP_COLUMNS = {"CreationDate", "Image.CreationDate", "LaunchTime"}
+
+
+def import_pyarrow() -> None:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise HandledError(
+            "pyarrow is needed for arrow and parquet output. Install it with: pip install aec-cli[arrow]"
+        ) from None
+
+
+def parse_timestamp(v: object) -> datetime | None:
+    if v is None or isinstance(v, datetime):
+        return v
+    if isinstance(v, date):
+        return datetime(v.year, v.month, v.day)
+    # fromisoformat doesn't support the Z suffix before python 3.11
+    return datetime.fromisoformat(str(v).replace("Z", "+00:00"))
+
+
+def to_str(v: object) -> str | None:
+    if v is None or isinstance(v, str):
+        return v
+    if isinstance(v, dict):
+        return json.dumps(v, default=str)
+    return str(v)
+
+
+def column_converter(name: str, sample: list[Any]) -> tuple[pa.DataType, Callable[[Any], Any]]:
+    """Choose a column's arrow type and value converter from a sample of its values. Null if there are no values."""
+    import pyarrow as pa
+
+    values = [v for v in sample if v is not None]
+    types = {type(v) for v in values}
+
+    if name in TIMESTAMP_COLUMNS or (types and all(issubclass(t, date) for t in types)):
+        return pa.timestamp("us", tz="UTC"), parse_timestamp
+    elif not types:
+        return pa.null(), lambda _: None
+    elif types == {bool}:
+        return pa.bool_(), lambda v: v
+    elif types == {int}:
+        return pa.int64(), lambda v: v
+    elif types and types <= {int, float}:
+        return pa.float64(), lambda v: v if v is None else float(v)
+    elif types == {list}:
+        return pa.list_(pa.string()), lambda v: v if v is None else [to_str(i) for i in v]
+
+    return pa.string(), to_str
+
+
+def build(column_names: list[str], rows: list[tuple[Any, ...]]) -> pa.RecordBatch:
+    """Build a record batch from projected rows, with column types chosen from the batch's values."""
+    import pyarrow as pa
+
+    # transpose rows to columns
+    columns = [list(c) for c in zip(*rows, strict=True)]
+    converters = [column_converter(n, c) for n, c in zip(column_names, columns, strict=True)]
+
+    arrays = [pa.array([convert(v) for v in c], type=t) for c, (t, convert) in zip(columns, converters, strict=True)]
+    return pa.RecordBatch.from_arrays(arrays, names=column_names)
+
+
+def widen(a: pa.DataType, b: pa.DataType) -> pa.DataType:
+    """A type that fits the values of both types."""
+    import pyarrow as pa
+
+    if a == b or pa.types.is_null(b):
+        return a
+    elif pa.types.is_null(a):
+        return b
+    elif {a, b} == {pa.int64(), pa.float64()}:
+        return pa.float64()
+    # eg: a column of ints in one batch and strings in another
+    return pa.string()
+
+
+def unified_schema(column_names: list[str], batches: list[pa.RecordBatch]) -> pa.Schema:
+    import pyarrow as pa
+
+    types = [column_converter(n, [])[0] for n in column_names]
+    for b in batches:
+        types = [widen(t, f.type) for t, f in zip(types, b.schema, strict=True)]
+
+    # columns without any values
+    return pa.schema([(n, pa.string() if pa.types.is_null(t) else t) for n, t in zip(column_names, types, strict=True)])
+
+
+def conform(batch: pa.RecordBatch, schema: pa.Schema) -> pa.RecordBatch:
+    """Convert the batch's columns to the schema's wider types."""
+    import pyarrow as pa
+
+    arrays = []
+    for array, field in zip(batch.columns, schema, strict=True):
+        if array.type == field.type:
+            arrays.append(array)
+        elif field.type == pa.string():
+            # formatted the same as a column of mixed types, which arrow's casts don't do for all types, eg: lists
+            arrays.append(pa.array([to_str(v) for v in array.to_pylist()], type=pa.string()))
+        else:
+            arrays.append(array.cast(field.type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def write(column_names: list[str], rows: Iterable[tuple[Any, ...]], file_format: str, sink: IO[bytes]) -> None:
+    """
+    Write rows to sink in batches as they are produced.
+
+    :param column_names: names of the columns, in the same order as each row's values
+    :param rows: row values, see display.projected
+    :param file_format: "parquet", or "arrow" for the Arrow IPC streaming format
+    """
+    import_pyarrow()
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    rows = iter(rows)
+    # held as arrow until every row is read, so a column's type can be widened to fit a later batch
+    batches = [build(column_names, batch) for batch in iter(lambda: list(itertools.islice(rows, BATCH_ROWS)), [])]
+    schema = unified_schema(column_names, batches)
+
+    # an empty table with the schema when there are no rows
+    writer = pq.ParquetWriter(sink, schema) if file_format == "parquet" else pa.ipc.new_stream(sink, schema)
+    with writer:
+        for batch in batches:
+            writer.write_batch(conform(batch, schema))
@@ -0,0 +1,196 @@
+"""
+Bash and zsh completion of commands, options, choices and instance names.
+
+The completion script is generated from the argument parser. Instance names are completed from an index cached
+per config profile, which the script reads directly and refreshes in the background when it's stale, so completing
+doesn't wait on python or AWS.
+"""
+
+from __future__ import annotations
+
+import os
+import shlex
+from argparse import Action, ArgumentParser, _SubParsersAction
+from pathlib import Path
+
+import aec.util.config as util_config
+from aec.command.ami import ami_keywords
+from aec.util.cache import cache_dir
+from aec.util.ec2_util import describe_instances_names
+from aec.util.errors import HandledError
+
+# refresh the cached names in the background when they're older than this
+REFRESH_MINUTES = 5
+
+# command groups whose ident args are instance names
+INSTANCE_GROUPS = ["ec2", "ssm"]
+
+
+def completion(shell: str | None = None, refresh_names: bool = False, config: str | None = None) -> str:
+    """Print a bash or zsh completion script, eg: add eval "$(aec completion bash)" to your .bashrc"""
+    if refresh_names:
+        return f"Cached {cache_names(config)} instance names"
+
+    if not shell:
+        raise HandledError("Specify the shell, bash or zsh.")
+
+    # imported here because main imports this module
+    from aec.main import build_parser
+
+    return script(build_parser(), shell)
+
+
+def names_path(profile: str | None = None) -> Path:
+    # the script finds the file without resolving the default profile
+    return cache_dir() / (f"names-{profile}.txt" if profile else "names.txt")
+
+
+def cache_names(profile: str | None = None) -> int:
+    """Cache the names of the profile's instances, except those terminated. Returns the number of names."""
+    config = util_config.load_config(util_config.DEFAULT_CONFIG_FILE, profile)
+    states = ["pending", "running", "shutting-down", "stopping", "stopped"]
+    names = sorted({n for n in describe_instances_names(config, {"instance-state-name": states}).values() if n})
+
+    # replaced atomically, so a completion never reads a partially written file
+    path = names_path(profile)
+    tmp = path.with_suffix(f".{os.getpid()}.tmp")
+    tmp.write_text("".join(f"{n}\n" for n in names))
+    tmp.replace(path)
+
+    return len(names)
+
+
+def actions(parser: ArgumentParser) -> list[Action]:
+    # argparse doesn't expose a parser's actions publicly
+    return parser._actions  # noqa: SLF001
+
+
+def commands(parser: ArgumentParser, key: str = "") -> dict[str, ArgumentParser]:
+    """The parser and all its sub parsers, by command, eg: "ec2 describe"."""
+    found = {key: parser}
+    for action in actions(parser):
+        if isinstance(action, _SubParsersAction):
+            for name, sub in action.choices.items():
+                found.update(commands(sub, f"{key} {name}".strip()))
+    return found
+
+
+def words(ws: list[str]) -> str:
+    # newline separated because the script completes with IFS set to newline
+    return "printf '%s\\n' " + " ".join(shlex.quote(w) for w in ws) if ws else "true"
+
+
+def script(parser: ArgumentParser, shell: str) -> str:
+    subcommands: list[str] = []
+    options: list[str] = []
+    values: list[str] = []
+    idents: list[str] = []
+
+    for key, p in commands(parser).items():
+        q = shlex.quote(key)
+        for action in actions(p):
+            if isinstance(action, _SubParsersAction):
+                subcommands.append(f"        {q}) {words(list(action.choices))} ;;")
+            elif not action.option_strings:
+                if action.dest in ("ident", "idents") and key.split(" ")[0] in INSTANCE_GROUPS:
+                    idents.append(q)
+            elif action.nargs != 0 and action.dest != "config":
+                choices = [str(c) for c in action.choices] if action.choices else []
+                if action.dest == "ami":
+                    choices = list(ami_keywords)
+                patterns = "|".join(shlex.quote(f"{key} {o}") for o in action.option_strings)
+                values.append(f"        {patterns}) {words(choices)} ;;")
+        option_strings = [o for a in actions(p) for o in a.option_strings]
+        options.append(f"        {q}) {words(option_strings)} ;;")
+
+    body = BASH_TEMPLATE.format(
+        refresh_minutes=REFRESH_MINUTES,
+        subcommands="\n".join(subcommands),
+        options="\n".join(options),
+        values="\n".join(values),
+        idents="|".join(idents) or "''",
+    )
+
+    if shell == "zsh":
+        # zsh runs bash completion functions via bashcompinit
+        return f"autoload -U +X bashcompinit && bashcompinit\n{body}"
+    elif shell == "bash":
+        return body
+    else:
+        raise HandledError(f"Unsupported shell {shell}, use bash or zsh.")
+
+
+BASH_TEMPLATE = """\
+# aec completion, generated by aec completion
+
+_aec_subcommands() {{
+    case "$1" in
+{subcommands}
+    esac
+}}
+
+_aec_options() {{
+    case "$1" in
+{options}
+    esac
+}}
+
+# values of the option, or returns 1 if the option doesn't take a value
+_aec_values() {{
+    case "$1 $2" in
+        *" --config") sed -n 's/^\\[\\([^].]*\\)\\]$/\\1/p' ~/.aec/ec2.toml 2>/dev/null ;;
+{values}
+        *) return 1 ;;
+    esac
+}}
+
+_aec_has_idents() {{
+    case "$1" in
+        {idents}) return 0 ;;
+        *) return 1 ;;
+    esac
+}}
+
+# cached instance names of the config profile, refreshed in the background when stale
+_aec_names() {{
+    local dir="${{AEC_CACHE_DIR:-$HOME/.aec/cache}}"
+    local cache="$dir/names${{1:+-$1}}.txt"
+    if [[ ! -f "$cache" || -n "$(find "$cache" -mmin +{refresh_minutes} 2>/dev/null)" ]]; then
+        # touched first so only one refresh runs at a time
+        mkdir -p "$dir" && touch "$cache"
+        (aec completion --refresh-names ${{1:+--config "$1"}} >/dev/null 2>&1 &)
+    fi
+    cat "$cache" 2>/dev/null
+}}
+
+_aec() {{
+    local cur="${{COMP_WORDS[COMP_CWORD]}}" prev="${{COMP_WORDS[COMP_CWORD-1]}}"
+    local key="" config="" i w subcommands values
+    local IFS=$'\\n'
+
+    # the command is the subcommands so far, eg: "ec2 describe"
+    for ((i = 1; i < COMP_CWORD; i++)); do
+        w="${{COMP_WORDS[i]}}"
+        case "$w" in
+            --config=*) config="${{w#--config=}}" ;;
+            --config) config="${{COMP_WORDS[i+1]}}" ;;
+            *)
+                case $'\\n'"$(_aec_subcommands "$key")"$'\\n' in
+                    *$'\\n'"$w"$'\\n'*) key="${{key:+$key }}$w" ;;
+                esac
+                ;;
+        esac
+    done
+
+    if values="$(_aec_values "$key" "$prev")"; then
+        COMPREPLY=($(compgen -W "$values" -- "$cur"))
+    elif [[ "$cur" == -* ]]; then
+        COMPREPLY=($(compgen -W "$(_aec_options "$key")" -- "$cur"))
+    elif subcommands="$(_aec_subcommands "$key")" && [[ -n "$subcommands" ]]; then
+        COMPREPLY=($(compgen -W "$subcommands" -- "$cur"))
+    elif _aec_has_idents "$key"; then
+        COMPREPLY=($(compgen -W "$(_aec_names "$config")" -- "$cur"))
+    fi
+}}
+
+complete -o default -F _aec aec"""
@@ -1,9 +1,17 @@
-import os.path
+import copy
+import os
+import sys
 from argparse import Namespace
 from collections.abc import Callable
-from typing import Any, TypedDict
+from typing import Any, NamedTuple, TypedDict, cast
 
-import pytoml as toml
+if sys.version_info >= (3, 11):
+    import tomllib
+else:
+    import tomli as tomllib
+
+
+DEFAULT_CONFIG_FILE = "~/.aec/ec2.toml"
 
 
 class SsmConfig(TypedDict, total=False):
@@ -44,18 +52,20 @@ def inject_config(config_file: str) -> Callable[[Namespace], None]:
     return inner
 
 
-# TODO add tests for this
 def load_config(config_file: str, profile_override: str | None = None) -> Config:
     """
     Load profile from the config file.
 
+    The file is only parsed again when it changes, and each profile is only resolved once.
+
     :param config_file: path to config file
     :param profile_override: override the value of the default profile in the config file
     :raises Exception: if problem loading the config
-    :return: config dictionary
+    :return: config dictionary, a copy that's safe to modify
     """
     config_filepath = os.path.expanduser(config_file)
-    config = load_user_config_file(config_filepath)
+    parsed = parse_config_file(config_filepath)
+    config = parsed.toml
 
     profile = profile_override
     if not profile:
@@ -64,19 +74,61 @@ def load_config(config_file: str, profile_override: str | None = None) -> Config
             raise Exception(f"No profile override supplied, or default profile set in {config_filepath}")
         profile = config["default_profile"]
 
-    # make top level keys available in the profile
-    if config.get("additional_tags", None):
-        config[profile]["additional_tags"] = config["additional_tags"]
+    resolved = parsed.profiles.get(profile, None)
+    if resolved is None:
+        try:
+            resolved = config[profile]
+        except KeyError:
+            raise Exception(f"Missing profile {profile} in {config_filepath}") from None
+
+        # make top level keys available in the profile
+        if config.get("additional_tags", None):
+            resolved = cast(Config, {**resolved, "additional_tags": config["additional_tags"]})
+
+        parsed.profiles[profile] = resolved
+
+    return copy.deepcopy(resolved)
+
+
+def load_profiles(config_file: str) -> dict[str, Config]:
+    """Load every profile in the config file."""
+    config = parse_config_file(os.path.expanduser(config_file)).toml
+    # profiles are tables, other than the top level keys
+    names = [k for k, v in config.items() if isinstance(v, dict) and k != "additional_tags"]
+    return {n: load_config(config_file, n) for n in names}
 
+
+class ParsedConfig(NamedTuple):
+    # file modification time and size when parsed
+    stamp: tuple[int, int]
+    toml: dict[str, Any]
+    # profiles resolved so far, by name
+    profiles: dict[str, Config]
+
+
+# parsed config files by path
+parsed_configs: dict[str, ParsedConfig] = {}
+
+
+def parse_config_file(config_filepath: str) -> ParsedConfig:
+    """Parse the config file, or return the previous parse if the file hasn't changed since."""
     try:
-        return config[profile]
-    except KeyError:
-        raise Exception(f"Missing profile {profile_override} in {config_filepath}") from None
+        stat = os.stat(config_filepath)
+    except FileNotFoundError:
+        raise Exception(f"No config file {config_filepath}") from None
+
+    stamp = (stat.st_mtime_ns, stat.st_size)
+    parsed = parsed_configs.get(config_filepath)
+    if parsed is None or parsed.stamp != stamp:
+        parsed = ParsedConfig(stamp, load_user_config_file(config_filepath), {})
+        parsed_configs[config_filepath] = parsed
+
+    return parsed
 
 
 def load_user_config_file(config_filepath: str) -> dict[str, Any]:
     if not os.path.isfile(config_filepath):
         raise Exception(f"No config file {config_filepath}")
 
-    with open(config_filepath) as config_file:
-        return toml.load(config_file)
+    with open(config_filepath, "rb") as config_file:
+        return tomllib.load(config_file)
@@ -0,0 +1,401 @@
+"""
+A daemon that keeps aec warm, ie: imported, with config parsed, credentials resolved and botocore models loaded.
+
+The aec script forwards commands to the daemon over a Unix socket when it's running, and streams back their output.
+Commands run one at a time in the daemon, in the client's working directory and environment. A command is
+interrupted when its client goes away, eg: on ctrl-c, so it doesn't hold up the commands after it.
+
+This module is imported before everything else by the aec script, so only uses the standard library at the top level.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import io
+import json
+import os
+import select
+import socket
+import struct
+import sys
+import threading
+import time
+import traceback
+from collections.abc import Iterator, Mapping, Sequence
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import IO, TYPE_CHECKING, Any
+
+from aec.util.cache import cache_dir
+from aec.util.errors import HandledError
+
+if TYPE_CHECKING:
+    from _typeshed import ReadableBuffer
+
+# response frames are a channel and payload length, followed by the payload
+HEADER = struct.Struct(">BI")
+STDOUT = 1
+STDERR = 2
+EXIT = 3
+# the daemon won't run the command, so the client runs it instead
+REFUSED = 4
+
+# options of commands that keep running until they're done waiting, or interrupted
+WAIT_OPTIONS = {"--watch", "--wait", "-w", "--wait-ssm"}
+
+# how often the daemon checks whether the client has gone away
+CLIENT_CHECK_SECONDS = 0.1
+
+
+def socket_path() -> Path:
+    return cache_dir() / "daemon.sock"
+
+
+def fingerprint(env: Mapping[str, str]) -> dict[str, str]:
+    """Environment the daemon's session, credentials and clients depend on, which must match the client's."""
+    return {k: v for k, v in env.items() if k.startswith(("AWS_", "BOTO_")) or k == "HOME"}
+
+
+def aws_files(env: Mapping[str, str]) -> dict[str, float | None]:
+    """Modification times of the AWS credentials and config files, which the daemon's session has loaded."""
+    home = env.get("HOME", "~")
+    paths = [
+        env.get("AWS_SHARED_CREDENTIALS_FILE", None) or f"{home}/.aws/credentials",
+        env.get("AWS_CONFIG_FILE", None) or f"{home}/.aws/config",
+    ]
+    return {p: mtime(p) for p in paths}
+
+
+def mtime(path: str) -> float | None:
+    try:
+        return os.stat(os.path.expanduser(path)).st_mtime
+    except OSError:
+        return None
+
+
+def runs_locally(args: Sequence[str]) -> bool:
+    # the daemon itself, commands that read stdin: ssm run reads its script, and terminate prompts to confirm,
+    # and long running commands, which would hold up every other command while they run in the daemon
+    return (
+        "daemon" in args
+        or ("ssm" in args and "run" in args)
+        or ("terminate" in args and not {"-y", "--yes"} & set(args))
+        or "resize" in args
+        or bool(WAIT_OPTIONS & set(args))
+    )
+
+
+def connect(path: Path) -> socket.socket | None:
+    if not path.exists():
+        return None
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        conn.connect(str(path))
+    except OSError:
+        # stale socket left by a daemon that was killed
+        conn.close()
+        return None
+    return conn
+
+
+def send(conn: socket.socket, channel: int, payload: bytes = b"") -> None:
+    conn.sendall(HEADER.pack(channel, len(payload)) + payload)
+
+
+def receive(conn: socket.socket) -> tuple[int, bytes]:
+    channel, length = HEADER.unpack(receive_exactly(conn, HEADER.size))
+    return channel, receive_exactly(conn, length)
+
+
+def receive_exactly(conn: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        chunk = conn.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("aec daemon disconnected")
+        data.extend(chunk)
+    return bytes(data)
+
+
+def forward(args: Sequence[str], stdout: IO[bytes] | None = None, stderr: IO[bytes] | None = None) -> int | None:
+    """
+    Run the command in the daemon, if it's running, and write its output to stdout and stderr.
+
+    :return: the command's exit code, or None if it wasn't run by the daemon and should be run locally
+    """
+    if runs_locally(args):
+        return None
+
+    conn = connect(socket_path())
+    if not conn:
+        return None
+
+    env = dict(os.environ)
+    if sys.stdout.isatty() and "COLUMNS" not in env:
+        # so output is formatted to the width of the client's terminal
+        env["COLUMNS"] = str(os.get_terminal_size(sys.stdout.fileno()).columns)
+
+    request = {
+        "args": list(args),
+        "cwd": os.getcwd(),
+        "env": env,
+        "stdout_isatty": sys.stdout.isatty(),
+        "stderr_isatty": sys.stderr.isatty(),
+    }
+    streams = {STDOUT: stdout or sys.stdout.buffer, STDERR: stderr or sys.stderr.buffer}
+
+    with conn:
+        conn.sendall(json.dumps(request).encode() + b"\n")
+        try:
+            while True:
+                channel, payload = receive(conn)
+                if channel == REFUSED:
+                    return None
+                elif channel == EXIT:
+                    return int(payload)
+                streams[channel].write(payload)
+                streams[channel].flush()
+        except ConnectionError as e:
+            streams[STDERR].write(f"{e}\n".encode())
+            return 1
+        except KeyboardInterrupt:
+            # closing the connection interrupts the command in the daemon
+            return 130
+
+
+class FrameWriter(io.RawIOBase):
+    """Writes output to the client as frames on a channel."""
+
+    def __init__(self, conn: socket.socket, channel: int, isatty: bool):
+        self.conn = conn
+        self.channel = channel
+        self._isatty = isatty
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b: ReadableBuffer) -> int:
+        data = bytes(b)
+        send(self.conn, self.channel, data)
+        return len(data)
+
+    def isatty(self) -> bool:
+        # rich and display decide whether to use colour and rich tables based on the client's terminal
+        return self._isatty
+
+
+def output(conn: socket.socket, channel: int, isatty: bool) -> io.TextIOWrapper:
+    # buffered, so many small writes are sent as a few frames
+    return io.TextIOWrapper(
+        io.BufferedWriter(FrameWriter(conn, channel, isatty), buffer_size=65536), encoding="utf-8", write_through=True
+    )
+
+
+def run(request: dict[str, Any], conn: socket.socket) -> int:
+    """Run the requested command with its output sent to the client, and return its exit code."""
+    import aec
+    import aec.main
+    import aec.util.inventory as inventory
+
+    stdout = output(conn, STDOUT, request["stdout_isatty"])
+    stderr = output(conn, STDERR, request["stderr_isatty"])
+    saved_cwd, saved_env = os.getcwd(), dict(os.environ)
+    saved_streams = sys.stdout, sys.stderr, sys.stdin
+
+    try:
+        os.chdir(request["cwd"])
+        os.environ.clear()
+        os.environ.update(request["env"])
+        # commands that read stdin run locally
+        sys.stdout, sys.stderr, sys.stdin = stdout, stderr, io.StringIO()
+
+        # reset state that is per invocation
+        aec.imported_at = time.perf_counter()
+        inventory.reported.clear()
+
+        try:
+            with interrupted_on_close(conn):
+                aec.main.main(request["args"])
+            return 0
+        except KeyboardInterrupt:
+            # the client went away, so there's no one to tell
+            return 130
+        except SystemExit as e:
+            if e.code is None or isinstance(e.code, int):
+                return e.code or 0
+            print(e.code, file=sys.stderr)
+            return 1
+        except Exception:
+            traceback.print_exc()
+            return 1
+        finally:
+            stdout.flush()
+            stderr.flush()
+    finally:
+        sys.stdout, sys.stderr, sys.stdin = saved_streams
+        os.environ.clear()
+        os.environ.update(saved_env)
+        os.chdir(saved_cwd)
+
+
+@contextmanager
+def interrupted_on_close(conn: socket.socket) -> Iterator[None]:
+    """Raise KeyboardInterrupt in this thread, as ctrl-c would locally, if the client closes conn within the block."""
+    thread_id = threading.get_ident()
+    lock = threading.Lock()
+    done = False
+
+    def watch() -> None:
+        while not done:
+            readable, _, _ = select.select([conn], [], [], CLIENT_CHECK_SECONDS)
+            if readable:
+                with lock:
+                    if not done and not client_connected(conn):
+                        ctypes.pythonapi.PyThreadState_SetAsyncExc(
+                            ctypes.c_ulong(thread_id), ctypes.py_object(KeyboardInterrupt)
+                        )
+                return
+
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        yield
+    finally:
+        # after which the command can't be interrupted
+        with lock:
+            done = True
+        watcher.join()
+
+
+def client_connected(conn: socket.socket) -> bool:
+    # the client sends nothing after its request, so conn is only readable when the client has closed it
+    try:
+        return bool(conn.recv(1, socket.MSG_PEEK))
+    except OSError:
+        return False
+
+
+def handle(conn: socket.socket, daemon_env: Mapping[str, str], daemon_files: dict[str, float | None]) -> bool:
+    """
+    Handle a request from the client. Returns True when the daemon should stop.
+
+    daemon_files are the AWS files loaded by the daemon's session, and are updated when the session is reloaded.
+    """
+    with conn.makefile("rb") as f:
+        line = f.readline()
+    if not line:
+        # the client closed the connection without a request
+        return False
+    request = json.loads(line)
+
+    if request.get("stop", False):
+        send(conn, EXIT, b"0")
+        return True
+
+    if fingerprint(request["env"]) != fingerprint(daemon_env):
+        # eg: a different AWS_PROFILE
+        send(conn, REFUSED)
+        return False
+
+    if (files := aws_files(request["env"])) != daemon_files:
+        # credentials or config changed on disk, so the next command creates a new session that loads them
+        import boto3
+
+        boto3.DEFAULT_SESSION = None
+        daemon_files.clear()
+        daemon_files.update(files)
+
+    code = run(request, conn)
+    send(conn, EXIT, str(code).encode())
+    return False
+
+
+def warm_up() -> None:
+    """Import everything, and load config, credentials and the botocore models for each configured region."""
+    import boto3
+
+    import aec.main  # noqa: F401
+    import aec.util.config as config
+
+    # the daemon is still useful without a config file, credentials or a region, they're loaded by the first command
+    try:
+        regions = {c.get("region", None) for c in config.load_profiles(config.DEFAULT_CONFIG_FILE).values()}
+    except Exception as e:
+        print(f"Warm up incomplete: {e}", file=sys.stderr)
+        regions = set()
+
+    for region in regions:
+        warm_up_region(region)
+
+    try:
+        if boto3.DEFAULT_SESSION:
+            boto3.DEFAULT_SESSION.get_credentials()
+    except Exception as e:
+        print(f"Warm up incomplete: {e}", file=sys.stderr)
+
+
+def warm_up_region(region: str | None) -> None:
+    import boto3
+
+    try:
+        boto3.client("ec2", region_name=region)
+        boto3.client("ssm", region_name=region)
+        boto3.client("compute-optimizer", region_name=region)
+    except Exception as e:
+        # eg: a profile without a region when there's no default region, the other regions are still warmed
+        print(f"Warm up of region {region} incomplete: {e}", file=sys.stderr)
+
+
+def stop() -> bool:
+    """Stop the running daemon. Returns False if it isn't running."""
+    conn = connect(socket_path())
+    if not conn:
+        return False
+    with conn:
+        conn.sendall(json.dumps({"stop": True}).encode() + b"\n")
+        receive(conn)
+    return True
+
+
+def serve(stop_daemon: bool = False, idle_timeout: int = 60) -> str:
+    """Run a daemon that keeps aec warm, so commands are faster. Commands are sent to it while it's running."""
+    if stop_daemon:
+        return "Stopped aec daemon" if stop() else "aec daemon isn't running"
+
+    path = socket_path()
+    if conn := connect(path):
+        conn.close()
+        raise HandledError(f"aec daemon is already running on {path}")
+    path.unlink(missing_ok=True)
+
+    warm_up()
+    daemon_env = dict(os.environ)
+    daemon_files = aws_files(daemon_env)
+
+    with closing(socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)) as listener:
+        # only the user can connect
+        umask = os.umask(0o077)
+        try:
+            listener.bind(str(path))
+        finally:
+            os.umask(umask)
+        listener.listen()
+        listener.settimeout(idle_timeout * 60 or None)
+        print(f"aec daemon listening on {path}", file=sys.stderr)
+
+        try:
+            while True:
+                try:
+                    conn, _ = listener.accept()
+                except TimeoutError:
+                    return f"Stopped aec daemon after {idle_timeout} minutes idle"
+
+                with conn:
+                    try:
+                        if handle(conn, daemon_env, daemon_files):
+                            return "Stopped aec daemon"
+                    except OSError:
+                        # the client went away, eg: ctrl-c
+                        pass
+        finally:
+            path.unlink(missing_ok=True)
@@ -1,19 +1,68 @@
 import csv
 import enum
+import functools
+import itertools
 import json
+import operator
 import sys
-from collections.abc import Iterable, Iterator, Sequence
-from typing import Any, cast
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from datetime import date
+from typing import IO, Any
 
 from rich import box
 from rich.console import Console
 from rich.live import Live
 from rich.table import Table
 
+from aec.util.errors import HandledError
+
 
 class OutputFormat(enum.Enum):
     table = "table"
     csv = "csv"
+    jsonl = "jsonl"
+    # alias for jsonl
+    ndjson = "jsonl"
+    # columnar formats, these need the optional pyarrow dependency
+    arrow = "arrow"
+    parquet = "parquet"
+
+
+# above this many rows tables are printed as plain text, because rich is slow to lay out large tables
+PLAIN_TABLE_MIN_ROWS = 1000
+# number of rows used to size the columns of plain text tables
+PLAIN_TABLE_SAMPLE_ROWS = 100
+
+
+Projection = Callable[[Mapping[str, Any]], tuple[Any, ...]]
+
+
+@functools.lru_cache
+def projection(keys: tuple[str, ...]) -> Projection:
+    """
+    Compile a function that projects a row dict onto a tuple of its values for keys, in order.
+
+    Used by every output format, so each row is only looked up once.
+    Missing keys project to None.
+    """
+    if not keys:
+        return lambda _: ()
+
+    getter = operator.itemgetter(*keys)
+
+    def project(d: Mapping[str, Any]) -> tuple[Any, ...]:
+        try:
+            values = getter(d)
+        except KeyError:
+            return tuple(map(d.get, keys))
+        # itemgetter returns a single value rather than a tuple when there's one key
+        return values if len(keys) > 1 else (values,)
+
+    return project
+
+
+def projected(rows: Iterable[Mapping[str, Any]], keys: Sequence[str]) -> Iterator[tuple[Any, ...]]:
+    return map(projection(tuple(keys)), rows)
 
 
 def as_table(dicts: Sequence[dict[str, Any]], keys: list[str] | None = None) -> list[list[str | None]]:
@@ -29,77 +78,151 @@ def as_table(dicts: Sequence[dict[str, Any]], keys: list[str] | None = None) ->
 
     if keys is None:
         keys = list(dicts[0].keys())
-    return [keys] + [[str(d.get(f, "")) if d.get(f, "") else None for f in keys] for d in dicts]  # type: ignore
+    return [list(keys), *([str(v) if v else None for v in values] for values in projected(dicts, keys))]
 
 
 def as_strings(values: Iterable[Any]) -> list[str]:
     return [str(v) if v else "" for v in values]
 
 
+def print_plain_table(column_names: list[str], rows: Iterable[Sequence[str]], file: IO[str] | None = None) -> None:
+    """
+    Print rows as fixed-width plain text, streaming them as they are produced.
+
+    Column widths are sized from the header and the first PLAIN_TABLE_SAMPLE_ROWS rows.
+    Later rows with wider values aren't truncated, they just push the rest of their line along.
+    """
+    out = file or sys.stdout
+    rows = iter(rows)
+    sample = list(itertools.islice(rows, PLAIN_TABLE_SAMPLE_ROWS))
+
+    widths = [len(c) for c in column_names]
+    for r in sample:
+        widths = [max(w, len(v)) for w, v in zip(widths, r, strict=True)]
+
+    template = "  ".join([f"{{:<{w}}}" for w in widths[:-1]] + ["{}"])
+
+    def line(values: Sequence[str]) -> str:
+        # without trailing whitespace, including when the last values are empty
+        return template.format(*values).rstrip() + "\n"
+
+    out.write(line(column_names))
+    out.write(line(["-" * w for w in widths]))
+    out.writelines(line(r) for r in sample)
+    for r in rows:
+        out.write(line(r))
+
+
+def json_default(o: object) -> str:
+    # datetimes are the most common non-json type in boto responses
+    if isinstance(o, date):
+        return o.isoformat()
+    return str(o)
+
+
+# compact separators, and reused so the encoder is only configured once
+json_encoder = json.JSONEncoder(default=json_default, ensure_ascii=False, separators=(",", ":"))
+
+
+def print_jsonl(rows: Iterable[Mapping[str, Any]], file: IO[str] | None = None, flush: bool = False) -> None:
+    """Print each row as a line of JSON as it is produced."""
+    out = file or sys.stdout
+    encode = json_encoder.encode
+    for r in rows:
+        out.write(encode(r) + "\n")
+        if flush:
+            out.flush()
+
+
+def write_columnar(keys: list[str], values: Iterable[tuple[Any, ...]], output_format: OutputFormat) -> None:
+    import aec.util.columnar as columnar
+
+    if sys.stdout.isatty():
+        raise HandledError(f"Refusing to write {output_format.value} to a terminal, redirect stdout to a file.")
+
+    sys.stdout.flush()
+    columnar.write(keys, values, output_format.value, sys.stdout.buffer)
+
+
+def use_plain_table(console: Console, num_rows: int | None = None) -> bool:
+    return not console.is_terminal or (num_rows is not None and num_rows > PLAIN_TABLE_MIN_ROWS)
+
+
 def pretty_print(
     result: list[dict[str, Any]] | Iterator[dict[str, Any]] | dict | str | None,
     output_format: OutputFormat = OutputFormat.table,
+    plain: bool | None = None,
 ) -> None:
-    """print results as table/csv/json."""
+    """
+    print results as table/csv/json.
+
+    :param plain: print tables as plain text rather than rich tables. Defaults to plain text for
+                  large tables or when stdout isn't a terminal.
+    """
 
     console = Console()
 
-    if isinstance(result, list) and not result:
-        console.print("No results")
+    if output_format == OutputFormat.jsonl and isinstance(result, list | Iterator | dict):
+        # streamed row by row, and no "No results" message which would be invalid json
+        print_jsonl([result] if isinstance(result, dict) else result, flush=isinstance(result, Iterator))
+        return
+
+    if isinstance(result, list | Iterator):
+        rows = iter(result)
+        try:
+            first = next(rows)
+        except StopIteration:
+            if output_format in (OutputFormat.table, OutputFormat.csv):
+                console.print("No results")
+            elif output_format in (OutputFormat.arrow, OutputFormat.parquet):
+                # a valid file with no rows, rather than an empty file readers can't open. The columns are unknown.
+                write_columnar([], [], output_format)
+            return
+
+        keys = list(first.keys())
+        values = projected(itertools.chain([first], rows), keys)
+
+    elif isinstance(result, dict):
+        print(json.dumps(result, default=str))
         return
 
-    elif isinstance(result, list) and output_format == OutputFormat.table:
-        rows = as_table(result)
-        column_names = cast(list[str], rows[0])
+    else:
+        # a message rather than rows, which would make jsonl, arrow or parquet output invalid
+        rows_only = output_format in (OutputFormat.jsonl, OutputFormat.arrow, OutputFormat.parquet)
+        print(result or "Done ✨", file=sys.stderr if rows_only else sys.stdout)
+        return
+
+    if output_format in (OutputFormat.arrow, OutputFormat.parquet):
+        write_columnar(keys, values, output_format)
+
+    elif output_format == OutputFormat.csv:
+        writer = csv.writer(sys.stdout)
+        writer.writerow(keys)
+        writer.writerows(values)
+
+    elif plain if plain is not None else use_plain_table(console, len(result) if isinstance(result, list) else None):
+        print_plain_table(keys, map(as_strings, values))
+
+    elif isinstance(result, list):
         table = Table(box=box.SIMPLE)
-        for c in column_names:
+        for c in keys:
             if c in ["CommandId"]:
                 table.add_column(c, no_wrap=True)
             else:
                 table.add_column(c)
 
-        for r in rows[1:]:
-            table.add_row(*r)
+        for v in values:
+            table.add_row(*[str(c) if c else None for c in v])
 
         console.print(table)
 
-    elif isinstance(result, list) and output_format == OutputFormat.csv:
-        writer = csv.DictWriter(sys.stdout, fieldnames=list(result[0].keys()))
-
-        writer.writeheader()
-        for r in result:
-            writer.writerow(r)
-
-    elif isinstance(result, Iterator) and output_format == OutputFormat.table:
-        try:
-            first = next(result)
-        except StopIteration:
-            console.print("No results")
-            return
-
+    else:
         table = Table(box=box.SIMPLE)
-        for c in first:
+        for c in keys:
             table.add_column(c)
 
-        table.add_row(*as_strings(first.values()))
+        table.add_row(*as_strings(next(values)))
 
         with Live(table, refresh_per_second=1):
-            for row in result:
-                table.add_row(*as_strings(row.values()))
-
-    elif isinstance(result, Iterator) and output_format == OutputFormat.csv:
-        writer = csv.writer(sys.stdout)
-        first = next(result)
-        writer.writerow(first.keys())
-        writer.writerow(first.values())
-        for row in result:
-            writer.writerow(row.values())
-
-    elif isinstance(result, dict):
-        print(json.dumps(result, default=str))
-
-    elif not result:
-        print("Done ✨")
-
-    else:
-        print(result)
+            for v in values:
+                table.add_row(*as_strings(v))
@@ -41,5 +41,6 @@ def docs(
 ) -> str:
     capture = io.StringIO()
     with redirect_stdout(capture):
-        display.pretty_print(result)
+        # show the rich tables seen in a terminal
+        display.pretty_print(result, plain=False)
     return f"{cmd_name}\n{capture.getvalue().rstrip()}"
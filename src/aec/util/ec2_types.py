@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-from collections.abc import Sequence
 from typing import TYPE_CHECKING
 
 if TYPE_CHECKING:
@@ -13,7 +12,6 @@ if TYPE_CHECKING:
         ElasticGpuSpecificationTypeDef,
         ElasticInferenceAcceleratorTypeDef,
         EnclaveOptionsRequestTypeDef,
-        FilterTypeDef,
         HibernationOptionsRequestTypeDef,
         IamInstanceProfileSpecificationTypeDef,
         InstanceIpv6AddressTypeDef,
@@ -71,11 +69,3 @@ class RunArgs(_RequiredRunArgs, total=False):
     LicenseSpecifications: list[LicenseConfigurationRequestTypeDef]
     MetadataOptions: InstanceMetadataOptionsRequestTypeDef
     EnclaveOptions: EnclaveOptionsRequestTypeDef
-
-
-class DescribeArgs(TypedDict, total=False):
-    Filters: Sequence[FilterTypeDef]
-    InstanceIds: Sequence[str]
-    DryRun: bool
-    MaxResults: int
-    NextToken: str
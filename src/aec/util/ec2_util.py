@@ -1,11 +1,17 @@
-from collections.abc import Sequence
-from typing import TypedDict
+from __future__ import annotations
+
+from collections.abc import Iterable, Sequence
+from typing import TYPE_CHECKING, Any, TypedDict
 
 import boto3
 
+if TYPE_CHECKING:
+    from mypy_boto3_ec2.client import EC2Client
+
+import aec.util.engine as engine
 import aec.util.tags as util_tags
 from aec.util.config import Config
-from aec.util.ec2_types import DescribeArgs
+from aec.util.engine import Call
 
 
 class InstanceNameState(TypedDict):
@@ -14,31 +20,40 @@ class InstanceNameState(TypedDict):
     Name: str | None
 
 
-def describe_running_instances_names(config: Config) -> dict[str, str | None]:
+def describe_running_instances_names(config: Config, ec2_client: EC2Client | None = None) -> dict[str, str | None]:
     # 2x speed up (8 -> 4 secs) compared to listing all names
-    return describe_instances_names(config, {"instance-state-name": ["running"]})
+    return describe_instances_names(config, {"instance-state-name": ["running"]}, ec2_client)
 
 
-def describe_instances_names(config: Config, filters: dict[str, Sequence[str]] | None = None) -> dict[str, str | None]:
+def describe_instances_names(
+    config: Config, filters: dict[str, Sequence[str]] | None = None, ec2_client: EC2Client | None = None
+) -> dict[str, str | None]:
     """Map of EC2 instance ids to names in the region."""
-    instances = describe_instances(config, filters)
+    instances = describe_instances(config, filters, ec2_client)
     return {id: state["Name"] for id, state in instances.items()}
 
 
-def describe_instances(config: Config, filters: dict[str, Sequence[str]] | None = None) -> dict[str, InstanceNameState]:
+def describe_instances(
+    config: Config, filters: dict[str, Sequence[str]] | None = None, ec2_client: EC2Client | None = None
+) -> dict[str, InstanceNameState]:
     """Map of EC2 instance ids to InstanceNameState in the region."""
-    ec2_client = boto3.client("ec2", region_name=config.get("region", None))
+    ec2_client = ec2_client or boto3.client("ec2", region_name=config.get("region", None))
+    return instance_name_states(engine.call_pages(describe_instances_call(ec2_client, filters)))
 
-    kwargs: DescribeArgs = {"MaxResults": 1000}
+
+def describe_instances_call(ec2_client: EC2Client, filters: dict[str, Sequence[str]] | None = None) -> Call:
+    """Call to describe instances, for making concurrently with other calls via aec.util.engine."""
+    kwargs: dict[str, Any] = {"PaginationConfig": {"PageSize": 1000}}
     if filters:
         kwargs["Filters"] = [{"Name": k, "Values": v} for k, v in filters.items()]
+    return Call(ec2_client, "describe_instances", kwargs)
 
-    instances: dict[str, InstanceNameState] = {}
 
-    while True:
-        response = ec2_client.describe_instances(**kwargs)
-
-        for r in response["Reservations"]:
+def instance_name_states(pages: Iterable[dict[str, Any]]) -> dict[str, InstanceNameState]:
+    """Map of EC2 instance ids to InstanceNameState from describe_instances pages."""
+    instances: dict[str, InstanceNameState] = {}
+    for page in pages:
+        for r in page["Reservations"]:
             for i in r["Instances"]:
                 instance_id = i["InstanceId"]
                 instances[instance_id] = {
@@ -47,10 +62,4 @@ def describe_instances(config: Config, filters: dict[str, Sequence[str]] | None
                     "Name": util_tags.get_value(i, "Name"),
                 }
 
-        next_token = response.get("NextToken", None)
-        if next_token:
-            kwargs["NextToken"] = next_token
-        else:
-            break
-
     return instances
@@ -0,0 +1,144 @@
+"""
+Make many independent, possibly paginated, AWS read calls concurrently.
+
+By default calls are made by boto3 clients on a thread pool. Setting AEC_ENGINE=async makes them on a single
+asyncio event loop with aiobotocore instead, which can drive hundreds of concurrent requests without a thread each.
+The async engine requires the optional aiobotocore dependency, ie: pip install aec-cli[async]
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import os
+import queue
+import threading
+from collections.abc import Iterator, Sequence
+from contextlib import AsyncExitStack
+from typing import TYPE_CHECKING, Any, NamedTuple, cast
+
+import aec.util.limiter as limiter
+import aec.util.memo as memo
+import aec.util.trace as trace
+from aec.util.errors import HandledError
+from aec.util.threads import MAX_FANOUT_WORKERS, ContextThreadPoolExecutor
+
+if TYPE_CHECKING:
+    from botocore.client import BaseClient
+
+# concurrent calls on the event loop
+MAX_ASYNC_CONCURRENCY = 100
+
+Page = dict[str, Any]
+
+
+class Call(NamedTuple):
+    # determines the service and region of the call
+    client: BaseClient
+    # client method, eg: describe_volumes
+    operation: str
+    kwargs: dict[str, Any]
+    # whether to make the call via its paginator and fetch every page
+    paginate: bool = True
+
+
+def results(calls: Sequence[Call]) -> Iterator[list[Page]]:
+    """
+    Make the calls concurrently, and yield each call's pages.
+
+    Yields in the same order as calls, as soon as each call and all those before it have completed,
+    so rows can be displayed while later calls are still in flight.
+    """
+    if not calls:
+        return iter([])
+    elif os.environ.get("AEC_ENGINE", None) == "async":
+        return async_results(calls)
+    else:
+        return thread_results(calls)
+
+
+def call_pages(call: Call) -> list[Page]:
+    if call.paginate:
+        return list(call.client.get_paginator(call.operation).paginate(**call.kwargs))
+    return [getattr(call.client, call.operation)(**call.kwargs)]
+
+
+def thread_results(calls: Sequence[Call]) -> Iterator[list[Page]]:
+    if len(calls) == 1:
+        yield call_pages(calls[0])
+        return
+
+    with ContextThreadPoolExecutor(min(MAX_FANOUT_WORKERS, len(calls))) as pool:
+        yield from pool.map(call_pages, calls)
+
+
+# put on the queue when the event loop has finished
+DONE = object()
+
+
+def async_results(calls: Sequence[Call]) -> Iterator[list[Page]]:
+    """Run the calls on an event loop in a background thread, and yield their results from this thread."""
+    try:
+        import aiobotocore  # noqa: F401
+    except ImportError:
+        raise HandledError(
+            "AEC_ENGINE=async requires aiobotocore. Install it with: pip install aec-cli[async]"
+        ) from None
+
+    results_queue: queue.Queue[object] = queue.Queue()
+    # the event loop thread runs in this thread's context, eg: within memo.bypassed()
+    context = contextvars.copy_context()
+
+    def run() -> None:
+        try:
+            context.run(asyncio.run, produce(calls, results_queue))
+        except BaseException as e:
+            results_queue.put(e)
+        finally:
+            results_queue.put(DONE)
+
+    threading.Thread(target=run, daemon=True).start()
+
+    while (item := results_queue.get()) is not DONE:
+        if isinstance(item, BaseException):
+            raise item
+        yield cast(list[Page], item)
+
+
+async def produce(calls: Sequence[Call], results_queue: queue.Queue[object]) -> None:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+
+    session = get_session()
+    # the same rate limiting, memoisation and tracing as calls made by boto3 clients
+    limiter.limiter.register_async(session)
+    memo.memo.register_async(session)
+    if trace.tracer:
+        trace.tracer.register_async(session)
+    config = AioConfig(max_pool_connections=MAX_ASYNC_CONCURRENCY, retries={"max_attempts": 10, "mode": "standard"})
+    semaphore = asyncio.Semaphore(MAX_ASYNC_CONCURRENCY)
+
+    async with AsyncExitStack() as stack:
+        # an async client per service and region, shared by all calls to it
+        clients: dict[tuple[str, str | None], Any] = {}
+        for c in calls:
+            key = (c.client.meta.service_model.service_name, c.client.meta.region_name)
+            if key not in clients:
+                clients[key] = await stack.enter_async_context(
+                    session.create_client(key[0], region_name=key[1], config=config)
+                )
+
+        async def fetch(call: Call) -> list[Page]:
+            client = clients[(call.client.meta.service_model.service_name, call.client.meta.region_name)]
+            async with semaphore:
+                if call.paginate:
+                    return [p async for p in client.get_paginator(call.operation).paginate(**call.kwargs)]
+                return [await getattr(client, call.operation)(**call.kwargs)]
+
+        tasks = [asyncio.create_task(fetch(c)) for c in calls]
+        try:
+            for t in tasks:
+                results_queue.put(await t)
+        finally:
+            for t in tasks:
+                t.cancel()
@@ -0,0 +1,136 @@
+"""
+Local SQLite cache of AMI metadata, by account, region and image id, used for the Image.* columns of instances.
+
+An image's metadata doesn't change once it's available, so cached images are kept indefinitely and only images
+missing from the cache are described. Images that aren't found, eg: because they've been deregistered, are
+cached as missing for a day so they aren't described again for every instance launched from them. Which images
+can be described depends on the account, so each account has its own entries.
+"""
+
+from __future__ import annotations
+
+import sqlite3
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+import aec.util.engine as engine
+from aec.util.cache import cache_dir
+from aec.util.engine import Call
+from aec.util.inventory import MAX_PARAMS, dumps, loads
+
+if TYPE_CHECKING:
+    from mypy_boto3_ec2.client import EC2Client
+    from mypy_boto3_ec2.type_defs import ImageTypeDef
+
+# bump when the schema changes, so existing caches are rebuilt
+SCHEMA_VERSION = 2
+
+# data is null for images that weren't found
+SCHEMA = """
+create table images (
+    account text not null,
+    region text not null,
+    image_id text not null,
+    data text,
+    cached_at real not null,
+    primary key (account, region, image_id)
+);
+"""
+
+# seconds before an image that wasn't found is described again, in case it's since been shared with the account
+MISSING_TTL = 60 * 60 * 24
+
+# maximum number of values allowed in a single filter
+MAX_FILTER_VALUES = 200
+
+
+def path() -> Path:
+    return cache_dir() / "images.sqlite"
+
+
+@contextmanager
+def connect() -> Iterator[sqlite3.Connection]:
+    """Connect to the cache in a transaction, creating or rebuilding it if needed."""
+    with closing(sqlite3.connect(path())) as db:
+        if db.execute("pragma user_version").fetchone()[0] != SCHEMA_VERSION:
+            db.execute("drop table if exists images")
+            # concurrent aec commands can read while another writes
+            db.execute("pragma journal_mode = wal")
+            db.executescript(SCHEMA)
+            db.execute(f"pragma user_version = {SCHEMA_VERSION}")
+        with db:
+            yield db
+
+
+def images(ec2_client: EC2Client, account: str, image_ids: Iterable[str]) -> dict[str, ImageTypeDef]:
+    """
+    Images by id, from the cache, describing and caching those not yet cached.
+
+    :param account: id of the account ec2_client calls, eg: the OwnerId of its instances' reservations
+    """
+    region = ec2_client.meta.region_name
+    ids = sorted(set(image_ids))
+
+    found = lookup(account, region, ids)
+    misses = [i for i in ids if i not in found]
+    if misses:
+        described = describe(ec2_client, misses)
+        store(account, region, misses, described)
+        found.update(described)
+
+    return {k: v for k, v in found.items() if v is not None}
+
+
+def lookup(account: str, region: str, image_ids: list[str]) -> dict[str, ImageTypeDef | None]:
+    """Cached images, or None for images cached as missing."""
+    cached: dict[str, str | None] = {}
+    try:
+        with connect() as db:
+            for c in range(0, len(image_ids), MAX_PARAMS):
+                chunk = image_ids[c : c + MAX_PARAMS]
+                rows = db.execute(
+                    "select image_id, data from images where account = ? and region = ? "
+                    f"and (data is not null or cached_at > ?) and image_id in ({','.join('?' * len(chunk))})",
+                    [account, region, time.time() - MISSING_TTL, *chunk],
+                )
+                cached.update(rows)
+    except sqlite3.OperationalError:
+        # eg: the cache is locked by another aec command while it's being rebuilt, so describe every image
+        return {}
+
+    return {k: cast("ImageTypeDef", loads(d)) if d else None for k, d in cached.items()}
+
+
+def describe(ec2_client: EC2Client, image_ids: list[str]) -> dict[str, ImageTypeDef]:
+    # a filter rather than ImageIds, so deregistered images don't cause an error. Chunks are described concurrently.
+    calls = [
+        Call(
+            ec2_client,
+            "describe_images",
+            {"Filters": [{"Name": "image-id", "Values": image_ids[c : c + MAX_FILTER_VALUES]}]},
+        )
+        for c in range(0, len(image_ids), MAX_FILTER_VALUES)
+    ]
+    return {
+        i["ImageId"]: cast("ImageTypeDef", i) for pages in engine.results(calls) for p in pages for i in p["Images"]
+    }
+
+
+def store(account: str, region: str, image_ids: list[str], described: dict[str, ImageTypeDef]) -> None:
+    """Cache the described images, and those not found as missing."""
+    now = time.time()
+    rows = [
+        (account, region, i, dumps(described[i]) if i in described else None, now)
+        for i in image_ids
+        # pending images are described again once they're available
+        if i not in described or described[i].get("State") == "available"
+    ]
+    try:
+        with connect() as db:
+            db.executemany("insert or replace into images values (?, ?, ?, ?, ?)", rows)
+    except sqlite3.OperationalError:
+        # eg: the cache is locked by another aec command, so the images will be described again next time
+        pass
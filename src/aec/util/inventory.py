@@ -0,0 +1,347 @@
+"""
+Local SQLite index of instances, volumes, images and SSM agents, populated by aec sync.
+
+Queries with --offline are answered from the index without calling AWS.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import time
+from collections.abc import Iterable, Iterator, Sequence
+from contextlib import closing, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, cast
+
+import boto3
+from rich.console import Console
+
+import aec.util.tags as util_tags
+from aec.util.cache import cache_dir
+from aec.util.config import Config
+from aec.util.display import json_encoder
+from aec.util.errors import HandledError
+
+if TYPE_CHECKING:
+    from mypy_boto3_ec2.type_defs import FilterTypeDef, ImageTypeDef, InstanceTypeDef, VolumeTypeDef
+    from mypy_boto3_ssm.type_defs import InstanceInformationTypeDef
+
+# bump when the schema changes, so existing indexes are rebuilt
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+create table syncs (region text primary key, synced_at real not null);
+
+create table instances (
+    region text not null,
+    instance_id text not null,
+    name text,
+    state text,
+    instance_type text,
+    image_id text,
+    vpc_id text,
+    subnet_id text,
+    availability_zone text,
+    data text not null,
+    primary key (region, instance_id)
+);
+create index instances_name on instances (region, name);
+
+create table instance_tags (
+    region text not null,
+    instance_id text not null,
+    key text not null,
+    value text,
+    primary key (region, instance_id, key)
+);
+create index instance_tags_key_value on instance_tags (region, key, value);
+
+create table volumes (
+    region text not null,
+    volume_id text not null,
+    name text,
+    data text not null,
+    primary key (region, volume_id)
+);
+
+create table volume_attachments (region text not null, volume_id text not null, instance_id text not null);
+create index volume_attachments_instance on volume_attachments (region, instance_id);
+
+-- owner is the Owners value the image was synced for, or empty for images referenced by instances
+create table images (
+    region text not null,
+    image_id text not null,
+    owner text not null,
+    name text,
+    data text not null,
+    primary key (region, image_id, owner)
+);
+create index images_name on images (region, name);
+
+create table ssm_agents (
+    region text not null,
+    instance_id text not null,
+    data text not null,
+    primary key (region, instance_id)
+);
+"""
+
+TABLES = ["instances", "instance_tags", "volumes", "volume_attachments", "images", "ssm_agents"]
+
+# fields stored as ISO 8601 strings that are restored to datetimes when loaded
+INSTANCE_DATETIMES = ["LaunchTime", "UsageOperationUpdateTime"]
+VOLUME_DATETIMES = ["CreateTime"]
+SSM_AGENT_DATETIMES = ["LastPingDateTime", "RegistrationDate", "LastAssociationExecutionDate"]
+
+# filters answerable offline, by the column they match
+instance_filter_columns = {
+    "instance-id": "instance_id",
+    "tag:Name": "name",
+    "instance-state-name": "state",
+    "instance-type": "instance_type",
+    "image-id": "image_id",
+    "vpc-id": "vpc_id",
+    "subnet-id": "subnet_id",
+    "availability-zone": "availability_zone",
+}
+volume_filter_columns = {"volume-id": "volume_id", "tag:Name": "name"}
+image_filter_columns = {"image-id": "image_id", "name": "name"}
+
+# keep under sqlite's limit on the number of parameters in a query
+MAX_PARAMS = 500
+
+
+def path() -> Path:
+    return cache_dir() / "inventory.sqlite"
+
+
+@contextmanager
+def connect() -> Iterator[sqlite3.Connection]:
+    """Connect to the index in a transaction, creating or rebuilding it if needed."""
+    with closing(sqlite3.connect(path())) as db:
+        if db.execute("pragma user_version").fetchone()[0] != SCHEMA_VERSION:
+            rebuild(db)
+        with db:
+            yield db
+
+
+def rebuild(db: sqlite3.Connection) -> None:
+    tables = [r[0] for r in db.execute("select name from sqlite_master where type = 'table'")]
+    for t in tables:
+        db.execute(f"drop table {t}")
+    # readers aren't blocked by aec sync
+    db.execute("pragma journal_mode = wal")
+    db.executescript(SCHEMA)
+    db.execute(f"pragma user_version = {SCHEMA_VERSION}")
+
+
+def region(config: Config) -> str:
+    name = config.get("region", None) or boto3.session.Session().region_name
+    if not name:
+        raise HandledError("No region in the config profile or the AWS config.")
+    return name
+
+
+def dumps(d: object) -> str:
+    return json_encoder.encode(d)
+
+
+def loads(data: str, datetime_keys: Sequence[str] = ()) -> dict[str, Any]:
+    d = json.loads(data)
+    for k in datetime_keys:
+        if k in d:
+            d[k] = datetime.fromisoformat(d[k])
+    return d
+
+
+def replace(
+    region: str,
+    instances: Sequence[InstanceTypeDef],
+    volumes: Sequence[VolumeTypeDef],
+    images_by_owner: dict[str, list[ImageTypeDef]],
+    ssm_agents: Sequence[InstanceInformationTypeDef],
+) -> None:
+    """Replace everything indexed for the region, in a single transaction."""
+    with connect() as db:
+        for t in TABLES:
+            db.execute(f"delete from {t} where region = ?", (region,))
+
+        db.executemany(
+            "insert into instances values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                (
+                    region,
+                    i["InstanceId"],
+                    util_tags.get_value(i, "Name"),
+                    i["State"]["Name"],
+                    i["InstanceType"],
+                    i.get("ImageId", None),
+                    i.get("VpcId", None),
+                    i.get("SubnetId", None),
+                    i.get("Placement", {}).get("AvailabilityZone", None),
+                    dumps(i),
+                )
+                for i in instances
+            ),
+        )
+        db.executemany(
+            "insert into instance_tags values (?, ?, ?, ?)",
+            ((region, i["InstanceId"], t["Key"], t["Value"]) for i in instances for t in i.get("Tags", [])),
+        )
+        db.executemany(
+            "insert into volumes values (?, ?, ?, ?)",
+            ((region, v["VolumeId"], util_tags.get_value(v, "Name"), dumps(v)) for v in volumes),
+        )
+        db.executemany(
+            "insert into volume_attachments values (?, ?, ?)",
+            ((region, v["VolumeId"], a["InstanceId"]) for v in volumes for a in v.get("Attachments", [])),
+        )
+        db.executemany(
+            "insert or ignore into images values (?, ?, ?, ?, ?)",
+            (
+                (region, i["ImageId"], owner, i.get("Name", None), dumps(i))
+                for owner, images in images_by_owner.items()
+                for i in images
+            ),
+        )
+        db.executemany(
+            "insert into ssm_agents values (?, ?, ?)", ((region, a["InstanceId"], dumps(a)) for a in ssm_agents)
+        )
+        db.execute("insert or replace into syncs values (?, ?)", (region, time.time()))
+
+
+# regions whose age has been reported
+reported: set[str] = set()
+
+
+@contextmanager
+def query(region: str) -> Iterator[sqlite3.Connection]:
+    """Connect to the index to query the region, printing the age of its data to stderr the first time."""
+    with connect() as db:
+        row = db.execute("select synced_at from syncs where region = ?", (region,)).fetchone()
+        if not row:
+            raise HandledError(f"No offline inventory for {region}. Run aec sync first.")
+
+        if region not in reported:
+            Console(stderr=True).print(f"Offline inventory for {region} synced {age_text(time.time() - row[0])} ago")
+            reported.add(region)
+
+        yield db
+
+
+def age_text(seconds: float) -> str:
+    for unit, size in [("d", 86400), ("h", 3600), ("m", 60)]:
+        if seconds >= size:
+            return f"{seconds // size:.0f}{unit}"
+    return f"{seconds:.0f}s"
+
+
+def glob(value: str) -> str:
+    # filter values use * and ? wildcards like sqlite's glob, but [ is special to glob
+    return value.replace("[", "[[]")
+
+
+def to_where(
+    filters: Iterable[FilterTypeDef], table: str, columns: dict[str, str], tags_table: str | None = None
+) -> tuple[str, list[str]]:
+    """
+    Convert API filters into a where clause for table.
+
+    :param columns: filter names mapped to the column they match
+    :param tags_table: table to match tag:<key> filters against, if any
+    :raises HandledError: if a filter isn't supported offline
+    :return: sql to append to a where clause, and its parameters
+    """
+    clauses: list[str] = []
+    params: list[str] = []
+    for f in filters:
+        name = f["Name"]
+        values = [glob(v) for v in f["Values"]]
+        if not values:
+            clauses.append("0")
+        elif name in columns:
+            clauses.append("(" + " or ".join(f"{columns[name]} glob ?" for _ in values) + ")")
+            params.extend(values)
+        elif tags_table and name.startswith("tag:"):
+            id_column = columns["instance-id"]
+            clauses.append(
+                f"exists (select 1 from {tags_table} t where t.region = {table}.region "
+                f"and t.{id_column} = {table}.{id_column} and t.key = ? and ("
+                + " or ".join("t.value glob ?" for _ in values)
+                + "))"
+            )
+            params.extend([name[4:], *values])
+        else:
+            raise HandledError(f"The {name} filter isn't supported offline.")
+
+    return "".join(f" and {c}" for c in clauses), params
+
+
+def instances(region: str, filters: Sequence[FilterTypeDef] = ()) -> list[InstanceTypeDef]:
+    where, params = to_where(filters, "instances", instance_filter_columns, "instance_tags")
+    with query(region) as db:
+        rows = db.execute(f"select data from instances where region = ?{where}", [region, *params])
+        return cast("list[InstanceTypeDef]", [loads(r[0], INSTANCE_DATETIMES) for r in rows])
+
+
+def volumes(region: str, filters: Sequence[FilterTypeDef] = ()) -> list[VolumeTypeDef]:
+    where, params = to_where(filters, "volumes", volume_filter_columns)
+    with query(region) as db:
+        rows = db.execute(f"select data from volumes where region = ?{where}", [region, *params])
+        return cast("list[VolumeTypeDef]", [loads(r[0], VOLUME_DATETIMES) for r in rows])
+
+
+def attached_volumes(region: str, instance_ids: Sequence[str]) -> list[VolumeTypeDef]:
+    """Volumes attached to the instances."""
+    volume_data: dict[str, str] = {}
+    with query(region) as db:
+        for c in range(0, len(instance_ids), MAX_PARAMS):
+            chunk = instance_ids[c : c + MAX_PARAMS]
+            rows = db.execute(
+                "select v.volume_id, v.data from volumes v join volume_attachments a "
+                "on a.region = v.region and a.volume_id = v.volume_id "
+                f"where v.region = ? and a.instance_id in ({','.join('?' * len(chunk))})",
+                [region, *chunk],
+            )
+            volume_data.update(rows)
+
+    return cast("list[VolumeTypeDef]", [loads(d, VOLUME_DATETIMES) for d in volume_data.values()])
+
+
+def images(
+    region: str, owners: Sequence[str] | None = None, filters: Sequence[FilterTypeDef] = ()
+) -> list[ImageTypeDef]:
+    """
+    Images synced for owners, or any image including those referenced by instances if owners is None.
+    """
+    where, params = to_where(filters, "images", image_filter_columns)
+    if owners is not None:
+        where += f" and owner in ({','.join('?' * len(owners))})"
+        params.extend(owners)
+
+    with query(region) as db:
+        rows = db.execute(f"select image_id, data from images where region = ?{where}", [region, *params])
+        # an image can be synced for more than one owner
+        return cast("list[ImageTypeDef]", [loads(d) for d in dict(rows.fetchall()).values()])
+
+
+def images_by_id(region: str, image_ids: Sequence[str]) -> dict[str, ImageTypeDef]:
+    image_data: dict[str, str] = {}
+    with query(region) as db:
+        for c in range(0, len(image_ids), MAX_PARAMS):
+            chunk = image_ids[c : c + MAX_PARAMS]
+            rows = db.execute(
+                f"select image_id, data from images where region = ? and image_id in ({','.join('?' * len(chunk))})",
+                [region, *chunk],
+            )
+            image_data.update(rows)
+
+    return cast("dict[str, ImageTypeDef]", {k: loads(d) for k, d in image_data.items()})
+
+
+def ssm_agents(region: str) -> list[InstanceInformationTypeDef]:
+    with query(region) as db:
+        rows = db.execute("select data from ssm_agents where region = ?", (region,))
+        return cast("list[InstanceInformationTypeDef]", [loads(r[0], SSM_AGENT_DATETIMES) for r in rows])
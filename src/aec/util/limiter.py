@@ -0,0 +1,190 @@
+"""
+Client-side rate limiting of AWS calls, shared by every client and thread calling the same service in a region.
+
+Calls aren't limited until the service throttles them. The rate is then cut to a fraction of the rate calls were
+being sent at, and increased gradually while calls succeed, ie: additive increase, multiplicative decrease. So
+concurrent fan outs converge on the maximum rate the service will sustain, rather than each thread backing off
+and retrying on its own.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import time
+from collections import deque
+from typing import TYPE_CHECKING, Any
+
+import boto3
+
+if TYPE_CHECKING:
+    from botocore.awsrequest import AWSRequest
+    from botocore.model import OperationModel
+    from botocore.session import Session
+
+THROTTLE_CODES = {
+    "RequestLimitExceeded",
+    "Throttling",
+    "ThrottlingException",
+    "ThrottledException",
+    "RequestThrottled",
+    "RequestThrottledException",
+    "TooManyRequestsException",
+    "EC2ThrottledException",
+}
+
+# fraction of the rate to cut to when throttled
+BETA = 0.7
+# calls per second the rate increases by, per second of successful calls
+INCREASE = 1.0
+MIN_RATE = 0.5
+# concurrent calls are throttled together, so the rate is cut at most once in this many seconds
+COOLDOWN = 1.0
+
+# key in the request context
+BUCKET = "aec_limiter_bucket"
+
+
+class Bucket:
+    """Token bucket for a service in a region."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        # calls per second, or None when unlimited
+        self.rate: float | None = None
+        self.tokens = 0.0
+        self.refilled_at = time.monotonic()
+        self.cut_at = 0.0
+        # send times in the last second, to measure the rate before being throttled
+        self.sent: deque[float] = deque()
+        self.calls = 0
+        self.throttles = 0
+        self.waited = 0.0
+
+    def acquire(self) -> None:
+        """Wait until a call can be sent."""
+        if wait := self.reserve():
+            time.sleep(wait)
+
+    def reserve(self) -> float:
+        """Reserve a call, returning the seconds to wait before sending it."""
+        with self.lock:
+            now = time.monotonic()
+            self.calls += 1
+            if self.rate is None:
+                self.sent.append(now)
+                while self.sent[0] < now - 1:
+                    self.sent.popleft()
+                return 0.0
+
+            # at most one call's worth of tokens accrue, so calls are paced rather than sent in bursts
+            self.tokens = min(1.0, self.tokens + (now - self.refilled_at) * self.rate)
+            self.refilled_at = now
+            # reserve a token, and wait outside the lock until it's accrued
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            self.waited += wait
+            return wait
+
+    def throttled(self) -> None:
+        with self.lock:
+            self.throttles += 1
+            now = time.monotonic()
+            if now - self.cut_at < COOLDOWN:
+                return
+            self.cut_at = now
+            measured = self.rate if self.rate is not None else len(self.sent)
+            self.rate = max(MIN_RATE, measured * BETA)
+            self.tokens = 0.0
+            self.refilled_at = now
+
+    def succeeded(self) -> None:
+        with self.lock:
+            if self.rate is not None:
+                # about rate calls succeed per second, so this increases the rate by INCREASE each second
+                self.rate += INCREASE / self.rate
+
+
+class Limiter:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.buckets: dict[tuple[str, str | None], Bucket] = {}
+
+    def bucket(self, service: str, region: str | None) -> Bucket:
+        with self.lock:
+            return self.buckets.setdefault((service, region), Bucket())
+
+    def register(self, session: boto3.Session) -> None:
+        """Limit every AWS call made by clients subsequently created from session."""
+        # unique ids so registering again, eg: for each command run by aec daemon, is a no-op
+        session.events.register("before-call", self.before_call, unique_id="aec-limiter-before-call")
+        session.events.register("request-created", self.request_created, unique_id="aec-limiter-request-created")
+        session.events.register("needs-retry", self.needs_retry, unique_id="aec-limiter-needs-retry")
+
+    def register_async(self, session: Session) -> None:
+        """Limit every AWS call made by aiobotocore clients subsequently created from session."""
+        session.register("before-call", self.before_call)
+        session.register("request-created", self.async_request_created)  # type: ignore
+        session.register("needs-retry", self.needs_retry)
+
+    def before_call(self, model: OperationModel, context: dict[str, Any], **_: Any) -> None:
+        context[BUCKET] = self.bucket(model.service_model.service_name, context.get("client_region"))
+
+    def request_created(self, request: AWSRequest, **_: Any) -> None:
+        # called for every attempt, so retries wait for the bucket too
+        if bucket := request.context.get(BUCKET):
+            bucket.acquire()
+
+    async def async_request_created(self, request: AWSRequest, **_: Any) -> None:
+        # waits without blocking the event loop's other calls
+        if bucket := request.context.get(BUCKET):
+            await asyncio.sleep(bucket.reserve())
+
+    def needs_retry(
+        self,
+        response: tuple[Any, dict[str, Any]] | None,
+        operation: OperationModel,
+        request_dict: dict[str, Any],
+        **_: Any,
+    ) -> None:
+        # called after every attempt, including retries. Returns None so botocore's retry handler decides.
+        if response is None:
+            return
+        bucket = self.bucket(operation.service_model.service_name, request_dict["context"].get("client_region"))
+        if response[1].get("Error", {}).get("Code") in THROTTLE_CODES:
+            bucket.throttled()
+        else:
+            bucket.succeeded()
+
+    def report(self) -> None:
+        """Print the number of throttled calls to stderr, if any, and reset the counts."""
+        with self.lock:
+            buckets = sorted(self.buckets.items(), key=lambda kv: (kv[0][0], kv[0][1] or ""))
+        for (service, region), b in buckets:
+            with b.lock:
+                if b.throttles:
+                    print(
+                        f"{service} in {region} was throttled {b.throttles} times during {b.calls} calls, "
+                        f"now limited to {b.rate:.1f} calls/s, waited {b.waited:.1f}s in total",
+                        file=sys.stderr,
+                    )
+                b.calls = b.throttles = 0
+                b.waited = 0.0
+
+
+# shared by all clients created from the default session
+limiter = Limiter()
+
+
+def register() -> None:
+    """Limit calls made by clients subsequently created from the default session."""
+    if not boto3.DEFAULT_SESSION:
+        boto3.setup_default_session()
+    assert boto3.DEFAULT_SESSION
+    limiter.register(boto3.DEFAULT_SESSION)
+
+
+def report() -> None:
+    """Print throttled calls to stderr, if any."""
+    limiter.report()
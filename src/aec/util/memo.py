@@ -0,0 +1,232 @@
+"""
+Memoisation of AWS read calls for the duration of a command.
+
+Commands often make the same call more than once, eg: describing instances before and after a step. Identical
+read calls, ie: Describe*, Get* and List* operations with the same parameters and without streaming output, are
+answered from memory, and concurrent identical calls wait for the first rather than each calling AWS.
+
+Any other call mutates resources, so it invalidates the memoised calls of its service and region that could be
+affected: calls for specific resource ids are invalidated when the mutation names one of those ids, and all other
+calls, eg: those filtering by name, are invalidated by every mutation. Polling loops, which expect a fresh response
+each time, run within bypassed().
+"""
+
+from __future__ import annotations
+
+import asyncio
+import copy
+import json
+import threading
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, NamedTuple
+
+import boto3
+
+if TYPE_CHECKING:
+    from botocore.awsrequest import AWSResponse
+    from botocore.model import OperationModel
+    from botocore.session import Session
+
+READ_PREFIXES = ("Describe", "Get", "List")
+
+# parameters and filters whose values are ids of the resources a call is limited to. Other values can look like
+# ids, eg: a Name tag of web-0123abcd or a vpc-id filter, without limiting the resources a call returns.
+ID_PARAMS = {"InstanceId", "InstanceIds", "VolumeId", "VolumeIds", "ImageId", "ImageIds", "Resources"}
+ID_FILTERS = {"instance-id", "volume-id", "image-id"}
+
+# keys in the request context
+KEY = "aec_memo_key"
+IDS = "aec_memo_ids"
+GENERATION = "aec_memo_generation"
+OWNER = "aec_memo_owner"
+HIT = "aec_memo_hit"
+
+Key = tuple[str, str | None, str, str]
+
+
+class Entry(NamedTuple):
+    http_response: AWSResponse
+    parsed: dict[str, Any]
+    # resource ids the call was limited to, or None when it could return any resource
+    ids: frozenset[str] | None
+
+
+def resource_ids(params: dict[str, Any]) -> set[str]:
+    """Ids of the resources the call is limited to, or empty if it isn't limited to specific resources."""
+    ids: set[str] = set()
+    for k, v in params.items():
+        if k in ID_PARAMS:
+            ids.update([v] if isinstance(v, str) else v)
+        elif k == "Filters":
+            ids.update(i for f in v if f.get("Name") in ID_FILTERS for i in f.get("Values", []))
+    return ids
+
+
+class Memo:
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.enabled = False
+        # per context rather than shared, so a polling loop doesn't bypass concurrent reads elsewhere
+        self.bypass: ContextVar[bool] = ContextVar("aec_memo_bypass", default=False)
+        # incremented by every mutation, so reads in flight during a mutation aren't memoised
+        self.generation = 0
+        self.entries: dict[Key, Entry] = {}
+        self.in_flight: dict[Key, threading.Event] = {}
+
+    def register(self, session: boto3.Session) -> None:
+        """Memoise calls made by clients subsequently created from session, while enabled."""
+        events = session.events
+        events.register("before-parameter-build", self.before_parameter_build, unique_id="aec-memo-before-build")
+        # first, so a memoised response is returned without waiting on the rate limiter
+        events.register_first("before-call", self.before_call, unique_id="aec-memo-before-call")  # type: ignore
+        events.register("after-call", self.after_call, unique_id="aec-memo-after-call")
+        events.register("after-call-error", self.after_call_error, unique_id="aec-memo-after-call-error")
+
+    def register_async(self, session: Session) -> None:
+        """Memoise calls made by aiobotocore clients subsequently created from session, while enabled."""
+        events = session.get_component("event_emitter")
+        events.register("before-parameter-build", self.before_parameter_build)
+        events.register_first("before-call", self.async_before_call)
+        events.register("after-call", self.after_call)
+        events.register("after-call-error", self.after_call_error)
+
+    def start(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.enabled = True
+
+    def finish(self) -> None:
+        with self.lock:
+            self.enabled = False
+            self.entries.clear()
+
+    @contextmanager
+    def bypassed(self) -> Iterator[None]:
+        """Call AWS for every read within the block, eg: when polling. Responses are still memoised."""
+        token = self.bypass.set(True)
+        try:
+            yield
+        finally:
+            self.bypass.reset(token)
+
+    def before_parameter_build(
+        self, params: dict[str, Any], model: OperationModel, context: dict[str, Any], **_: Any
+    ) -> None:
+        if not self.enabled:
+            return
+        ids = resource_ids(params)
+        if model.has_streaming_output:
+            # the body is a stream that can only be read once, so isn't memoised
+            return
+        elif model.name.startswith(READ_PREFIXES):
+            service = model.service_model.service_name
+            context[KEY] = (
+                service,
+                context.get("client_region"),
+                model.name,
+                json.dumps(params, sort_keys=True, default=str),
+            )
+            context[IDS] = frozenset(ids) if ids else None
+        else:
+            context[IDS] = ids
+
+    def before_call(self, context: dict[str, Any], **_: Any) -> tuple[AWSResponse, dict[str, Any]] | None:
+        while True:
+            response, in_flight = self.lookup(context)
+            if not in_flight:
+                return response
+            # wait for the identical call in flight, and then use its response
+            in_flight.wait()
+
+    async def async_before_call(self, context: dict[str, Any], **_: Any) -> tuple[AWSResponse, dict[str, Any]] | None:
+        while True:
+            response, in_flight = self.lookup(context)
+            if not in_flight:
+                return response
+            # the call in flight may be on this event loop, so poll rather than block it
+            while not in_flight.is_set():  # noqa: ASYNC110
+                await asyncio.sleep(0.01)
+
+    def lookup(
+        self, context: dict[str, Any]
+    ) -> tuple[tuple[AWSResponse, dict[str, Any]] | None, threading.Event | None]:
+        """The memoised response, if any, or else the identical call in flight to wait for, if any."""
+        key: Key | None = context.get(KEY)
+        if not self.enabled or not key:
+            return None, None
+
+        with self.lock:
+            context[GENERATION] = self.generation
+            if self.bypass.get():
+                return None, None
+            if entry := self.entries.get(key):
+                context[HIT] = True
+                return (entry.http_response, copy.deepcopy(entry.parsed)), None
+            if event := self.in_flight.get(key):
+                return None, event
+            self.in_flight[key] = threading.Event()
+            context[OWNER] = True
+            return None, None
+
+    def after_call(
+        self,
+        http_response: AWSResponse,
+        parsed: dict[str, Any],
+        model: OperationModel,
+        context: dict[str, Any],
+        **_: Any,
+    ) -> None:
+        if context.get(HIT):
+            return
+
+        with self.lock:
+            key: Key | None = context.get(KEY)
+            if not self.enabled:
+                pass
+            elif key:
+                if http_response.status_code < 300 and context.get(GENERATION) == self.generation:
+                    self.entries[key] = Entry(http_response, copy.deepcopy(parsed), context[IDS])
+            elif IDS in context:
+                self.invalidate(model.service_model.service_name, context.get("client_region"), context[IDS])
+            # always, so calls waiting on this one don't wait forever
+            self.release(context)
+
+    def after_call_error(self, context: dict[str, Any], **_: Any) -> None:
+        with self.lock:
+            self.release(context)
+
+    def release(self, context: dict[str, Any]) -> None:
+        # called with the lock held
+        if context.pop(OWNER, None) and (event := self.in_flight.pop(context[KEY], None)):
+            event.set()
+
+    def invalidate(self, service: str, region: str | None, ids: set[str]) -> None:
+        # called with the lock held
+        self.generation += 1
+        for key, entry in list(self.entries.items()):
+            if key[:2] == (service, region) and (entry.ids is None or not ids or entry.ids & ids):
+                del self.entries[key]
+
+
+# shared by all clients created from the default session
+memo = Memo()
+
+
+def start() -> None:
+    """Memoise calls made by clients subsequently created from the default session, until finish()."""
+    if not boto3.DEFAULT_SESSION:
+        boto3.setup_default_session()
+    assert boto3.DEFAULT_SESSION
+    memo.register(boto3.DEFAULT_SESSION)
+    memo.start()
+
+
+def finish() -> None:
+    memo.finish()
+
+
+def bypassed() -> AbstractContextManager[None]:
+    """Call AWS for every read within the block, eg: when polling."""
+    return memo.bypassed()
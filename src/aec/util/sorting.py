@@ -0,0 +1,81 @@
+"""Sort rows by one or more typed fields, eg: State,-LaunchTime"""
+
+import heapq
+from collections.abc import Callable, Iterable, Mapping, Sequence
+from datetime import date, datetime, timezone
+from functools import total_ordering
+from typing import Any
+
+SortKey = tuple[Any, ...]
+
+
+@total_ordering
+class Descending:
+    """Wraps a value so it sorts in reverse order."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: tuple[int, Any]):
+        self.value = value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Descending) and self.value == other.value
+
+    def __lt__(self, other: "Descending") -> bool:
+        return other.value < self.value
+
+
+def typed(value: object) -> tuple[int, Any]:
+    """Rank values by type, so a field with mixed types can be compared without raising a TypeError."""
+    if isinstance(value, bool | int | float):
+        return (0, value)
+    elif isinstance(value, datetime):
+        # naive datetimes are taken as UTC, so they compare with aware ones
+        return (1, value if value.tzinfo else value.replace(tzinfo=timezone.utc))
+    elif isinstance(value, date):
+        # midnight UTC, so dates compare with datetimes
+        return (1, datetime(value.year, value.month, value.day, tzinfo=timezone.utc))
+    elif isinstance(value, str):
+        return (2, value)
+    return (3, str(value))
+
+
+def parse_fields(sort_by: str | Sequence[str]) -> list[tuple[str, bool]]:
+    """Parse fields into (field, descending) pairs. Fields prefixed with - are descending."""
+    fields = sort_by.split(",") if isinstance(sort_by, str) else sort_by
+    return [(f[1:], True) if f.startswith("-") else (f, False) for f in fields if f]
+
+
+def sort_key(fields: Sequence[tuple[str, bool]]) -> Callable[[Mapping[str, Any]], SortKey]:
+    """
+    Make a function that builds a row's sort key for fields.
+
+    Missing and None values sort last, whether ascending or descending.
+    """
+
+    def key(row: Mapping[str, Any]) -> SortKey:
+        k: list[Any] = []
+        for field, descending in fields:
+            value = row.get(field, None)
+            k.append(value is None)
+            if value is not None:
+                k.append(Descending(typed(value)) if descending else typed(value))
+            else:
+                # keep the key's shape consistent so fields line up across rows
+                k.append(None)
+        return tuple(k)
+
+    return key
+
+
+def sort_rows(
+    rows: Iterable[Mapping[str, Any]],
+    fields: Sequence[tuple[str, bool]],
+    limit: int | None = None,
+) -> list[Any]:
+    """Sort rows by fields, keeping just the first limit rows if given."""
+    key = sort_key(fields)
+    if limit is not None:
+        # partial sort is cheaper than a full sort when we only need the top N
+        return heapq.nsmallest(limit, rows, key=key)
+    return sorted(rows, key=key)
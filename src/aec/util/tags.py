@@ -1,6 +1,10 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+import csv
+import json
+from typing import TYPE_CHECKING, cast
+
+from aec.util.errors import HandledError
 
 if TYPE_CHECKING:
     from mypy_boto3_ec2.type_defs import ImageTypeDef, InstanceTypeDef, SubnetTypeDef, VolumeTypeDef
@@ -9,3 +13,34 @@ if TYPE_CHECKING:
 def get_value(resource: ImageTypeDef | InstanceTypeDef | VolumeTypeDef | SubnetTypeDef, key: str) -> str | None:
     tag_value = [t["Value"] for t in resource.get("Tags", []) if t["Key"] == key]
     return tag_value[0] if tag_value else None
+
+
+def read_mapping(path: str) -> dict[str, dict[str, str]]:
+    """
+    Read the tags to apply to each resource from a csv or json file.
+
+    A csv file has a ResourceId column, and a column per tag key. A json file is an object of resource ids to
+    objects of tag keys to values. Empty values are skipped, so resources can have different tag keys.
+    """
+    try:
+        with open(path, newline="") as f:
+            if path.endswith(".json"):
+                mapping = json.load(f)
+                if not isinstance(mapping, dict):
+                    raise HandledError(f"{path} must contain an object of resource ids to tags")
+                for r, t in mapping.items():
+                    if not isinstance(t, dict):
+                        raise HandledError(f"{path} has tags for {r} that aren't an object of tag keys to values")
+                rows = [{"ResourceId": r, **cast(dict[str, str], t)} for r, t in mapping.items()]
+            else:
+                rows = list(csv.DictReader(f))
+    except (OSError, ValueError) as e:
+        raise HandledError(f"Can't read {path}: {e}") from None
+
+    resources: dict[str, dict[str, str]] = {}
+    for row in rows:
+        resource_id = row.pop("ResourceId", None)
+        if not resource_id:
+            raise HandledError(f"{path} has a row without a ResourceId")
+        resources.setdefault(resource_id, {}).update({k: str(v) for k, v in row.items() if k and v})
+    return resources
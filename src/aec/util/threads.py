@@ -1,6 +1,39 @@
-from concurrent.futures import ThreadPoolExecutor
+import contextvars
+from collections.abc import Callable, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, TypeVar
+
+from botocore.config import Config as BotoConfig
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class ContextThreadPoolExecutor(ThreadPoolExecutor):
+    """Runs each call in a copy of the submitter's context, so context variables, eg: memo.bypassed(), carry over."""
+
+    def submit(self, fn: Callable[..., R], /, *args: Any, **kwargs: Any) -> Future[R]:
+        return super().submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
 
 # used to execute IO in parallel
 
 NUM_WORKERS = 2
-executor = ThreadPoolExecutor(NUM_WORKERS)
+executor = ContextThreadPoolExecutor(NUM_WORKERS)
+
+# used to fan out many independent requests, eg: one per resource
+MAX_FANOUT_WORKERS = 10
+
+# clients used for fan outs retry when throttled. The rate is limited by aec.util.limiter, which is shared
+# across clients and threads, rather than by adaptive mode which limits each client separately
+throttle_retries = BotoConfig(retries={"max_attempts": 10, "mode": "standard"})
+
+
+def fanout(fn: Callable[[T], R], items: Iterable[T], max_workers: int = MAX_FANOUT_WORKERS) -> list[R]:
+    """Call fn on each item concurrently, returning results in the same order as items."""
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(i) for i in items]
+
+    with ContextThreadPoolExecutor(min(max_workers, len(items))) as pool:
+        return list(pool.map(fn, items))
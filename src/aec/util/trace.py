@@ -0,0 +1,293 @@
+"""
+Record where a command spends its time, eg: imports, config loading, credentials, AWS calls and rendering.
+
+Enabled by --profile, which prints a summary to stderr, or --trace FILE, which writes a Chrome trace
+that can be opened in https://ui.perfetto.dev or chrome://tracing.
+Setting AEC_TRACE=1 is the same as --profile, and AEC_TRACE=FILE the same as --trace FILE.
+"""
+
+from __future__ import annotations
+
+import inspect
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from typing import TYPE_CHECKING, Any, NamedTuple, cast
+
+import boto3
+from rich import box
+from rich.console import Console
+from rich.table import Table
+
+import aec.util.memo as memo
+
+if TYPE_CHECKING:
+    from botocore.awsrequest import AWSResponse
+    from botocore.model import OperationModel
+    from botocore.session import Session
+
+# key in the botocore request context used to hold the call's start time
+START_KEY = "aec_trace_start"
+
+
+class Span(NamedTuple):
+    name: str
+    category: str
+    # perf_counter times
+    start: float
+    end: float
+    thread_id: int
+    args: dict[str, Any]
+
+
+class CallStats:
+    """Totals for all calls to an AWS operation. Each page of a paginated operation is a call."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.retries = 0
+        self.errors = 0
+        self.bytes = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, span: Span) -> None:
+        duration = span.end - span.start
+        self.calls += 1
+        self.retries += span.args.get("retries", 0)
+        self.errors += span.args.get("status", 200) >= 300 or "error" in span.args
+        self.bytes += span.args.get("bytes", 0)
+        self.total += duration
+        self.max = max(self.max, duration)
+
+
+class Tracer:
+    def __init__(self, summary: bool = True, trace_file: str | None = None, origin: float | None = None):
+        # print a summary table to stderr when finished
+        self.summary = summary
+        # write a chrome trace to this file when finished
+        self.trace_file = trace_file
+        # perf_counter time that the trace starts from
+        self.origin = time.perf_counter() if origin is None else origin
+        self.spans: list[Span] = []
+        self.lock = threading.Lock()
+        self.session: boto3.Session | None = None
+
+    def add(self, name: str, category: str, start: float, end: float | None = None, **args: Any) -> None:
+        span = Span(name, category, start, time.perf_counter() if end is None else end, threading.get_ident(), args)
+        # spans can be added from executor threads
+        with self.lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, category: str = "aec", **args: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, **args)
+
+    def register(self, session: boto3.Session) -> None:
+        """Time every AWS call made by clients subsequently created from session."""
+        session.events.register("before-call", self.before_call)
+        session.events.register("after-call", self.after_call)
+        session.events.register("after-call-error", self.after_call_error)
+        self.session = session
+
+        # resolve credentials now, rather than hiding their time inside the first client created
+        with self.span("credentials", "boto"):
+            session.get_credentials()
+
+    def register_async(self, session: Session) -> None:
+        """Time every AWS call made by aiobotocore clients subsequently created from session."""
+        session.register("before-call", self.before_call)
+        session.register("after-call", self.async_after_call)  # type: ignore
+        session.register("after-call-error", self.after_call_error)
+
+    def unregister(self) -> None:
+        if self.session:
+            self.session.events.unregister("before-call", self.before_call)
+            self.session.events.unregister("after-call", self.after_call)
+            self.session.events.unregister("after-call-error", self.after_call_error)
+            self.session = None
+
+    def before_call(self, context: dict[str, Any], **_: Any) -> None:
+        context[START_KEY] = time.perf_counter()
+
+    def after_call(
+        self,
+        http_response: AWSResponse,
+        parsed: dict[str, Any],
+        model: OperationModel,
+        context: dict[str, Any],
+        **_: Any,
+    ) -> None:
+        if context.get(memo.HIT):
+            # answered from memory, not AWS
+            return
+        if model.has_streaming_output:
+            # don't read the body, the caller streams it
+            size = int(http_response.headers.get("content-length", 0))
+        else:
+            size = len(http_response.content)
+        self.add_call(http_response, parsed, model, context, size)
+
+    async def async_after_call(
+        self,
+        http_response: AWSResponse,
+        parsed: dict[str, Any],
+        model: OperationModel,
+        context: dict[str, Any],
+        **_: Any,
+    ) -> None:
+        if context.get(memo.HIT):
+            return
+        if model.has_streaming_output:
+            size = int(http_response.headers.get("content-length", 0))
+        else:
+            content: object = http_response.content
+            # aiobotocore's content is a coroutine, returning the body it's already read
+            size = len(await content if inspect.isawaitable(content) else cast(bytes, content))
+        self.add_call(http_response, parsed, model, context, size)
+
+    def add_call(
+        self,
+        http_response: AWSResponse,
+        parsed: dict[str, Any],
+        model: OperationModel,
+        context: dict[str, Any],
+        size: int,
+    ) -> None:
+        self.add(
+            call_name(model),
+            "aws",
+            context.get(START_KEY, time.perf_counter()),
+            region=context.get("client_region"),
+            status=http_response.status_code,
+            retries=parsed.get("ResponseMetadata", {}).get("RetryAttempts", 0),
+            bytes=size,
+        )
+
+    def after_call_error(self, exception: Exception, model: OperationModel, context: dict[str, Any], **_: Any) -> None:
+        # raised when a request couldn't be sent, eg: a connection error
+        self.add(
+            call_name(model),
+            "aws",
+            context.get(START_KEY, time.perf_counter()),
+            region=context.get("client_region"),
+            error=repr(exception),
+        )
+
+    def call_stats(self) -> dict[str, CallStats]:
+        stats: dict[str, CallStats] = defaultdict(CallStats)
+        for s in self.spans:
+            if s.category == "aws":
+                stats[s.name].add(s)
+        return stats
+
+    def summary_tables(self) -> tuple[Table, Table]:
+        phases = Table("Phase", "Start ms", "ms", box=box.SIMPLE, title="Phases")
+        for s in sorted(self.spans, key=lambda s: s.start):
+            if s.category != "aws":
+                phases.add_row(s.name, ms(s.start - self.origin), ms(s.end - s.start))
+        phases.add_row("total", "", ms(time.perf_counter() - self.origin), style="bold")
+
+        calls = Table(
+            "Call", "Calls", "Retries", "Errors", "KiB", "Total ms", "Max ms", box=box.SIMPLE, title="AWS calls"
+        )
+        # slowest first
+        for name, st in sorted(self.call_stats().items(), key=lambda kv: kv[1].total, reverse=True):
+            calls.add_row(
+                name, str(st.calls), str(st.retries), str(st.errors), f"{st.bytes / 1024:.1f}", ms(st.total), ms(st.max)
+            )
+
+        return phases, calls
+
+    def chrome_trace(self) -> dict[str, Any]:
+        """Spans in the Chrome trace event format, as complete events with microsecond timestamps."""
+        pid = os.getpid()
+        events = [
+            {
+                "name": s.name,
+                "cat": s.category,
+                "ph": "X",
+                "ts": round((s.start - self.origin) * 1e6),
+                "dur": round((s.end - s.start) * 1e6),
+                "pid": pid,
+                "tid": s.thread_id,
+                "args": s.args,
+            }
+            for s in self.spans
+        ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def report(self) -> None:
+        if self.summary:
+            console = Console(stderr=True)
+            for t in self.summary_tables():
+                console.print(t)
+
+        if self.trace_file:
+            with open(os.path.expanduser(self.trace_file), "w") as f:
+                json.dump(self.chrome_trace(), f, default=str)
+
+
+def call_name(model: OperationModel) -> str:
+    return f"{model.service_model.service_name}.{model.name}"
+
+
+def ms(seconds: float) -> str:
+    return f"{seconds * 1000:.1f}"
+
+
+# the active tracer, if any
+tracer: Tracer | None = None
+
+
+def start(profile: bool = False, trace_file: str | None = None, origin: float | None = None) -> Tracer | None:
+    """
+    Start tracing if requested by profile or trace_file, or else the AEC_TRACE environment variable.
+
+    :param origin: perf_counter time to start the trace from, defaults to now
+    :return: the active tracer, or None when not tracing
+    """
+    global tracer
+
+    if not profile and not trace_file:
+        env = os.environ.get("AEC_TRACE", "")
+        if env.lower() in ("1", "true", "yes"):
+            profile = True
+        elif env not in ("", "0"):
+            trace_file = env
+
+    if not profile and not trace_file:
+        return None
+
+    tracer = Tracer(profile, trace_file, origin)
+
+    # clients are created from the default session, and copy its event handlers when created
+    if not boto3.DEFAULT_SESSION:
+        boto3.setup_default_session()
+    assert boto3.DEFAULT_SESSION
+    tracer.register(boto3.DEFAULT_SESSION)
+
+    return tracer
+
+
+def span(name: str, category: str = "aec", **args: Any) -> AbstractContextManager[None]:
+    """Time the block as a span of the active tracer. Does nothing when not tracing."""
+    return tracer.span(name, category, **args) if tracer else nullcontext()
+
+
+def finish() -> None:
+    """Report and stop the active tracer, if any."""
+    global tracer
+
+    if tracer:
+        tracer.unregister()
+        tracer.report()
+        tracer = None
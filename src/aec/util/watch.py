@@ -0,0 +1,103 @@
+"""Poll a command's rows and redraw them live, highlighting what changed."""
+
+import time
+from collections.abc import Callable, Mapping, Sequence
+from datetime import datetime
+from typing import Any
+
+from rich import box
+from rich.console import Console
+from rich.live import Live
+from rich.table import Table
+
+import aec.util.memo as memo
+from aec.util.display import as_strings
+
+Row = Mapping[str, Any]
+
+CHANGED_STYLE = "bold yellow"
+
+
+class WatchedRows:
+    """
+    Rows kept in the order they were first seen, so they aren't re-sorted between polls.
+
+    Only rows that are new or whose values changed are re-rendered.
+    """
+
+    def __init__(self, key: str | None = None):
+        # key column that identifies a row across polls, or None to use the row's position
+        self.key = key
+        self.rows: dict[Any, Row] = {}
+        self.cells: dict[Any, list[str]] = {}
+        self.changed: set[Any] = set()
+
+    def update(self, rows: Sequence[Row]) -> bool:
+        """Merge in the latest rows, returning True if anything changed."""
+        latest = {(r.get(self.key) if self.key else n): r for n, r in enumerate(rows)}
+
+        removed = self.rows.keys() - latest.keys()
+        for k in removed:
+            del self.rows[k]
+            del self.cells[k]
+
+        self.changed = set()
+        for k, row in latest.items():
+            if self.rows.get(k) != row:
+                self.rows[k] = row
+                self.cells[k] = as_strings(row.values())
+                self.changed.add(k)
+
+        return bool(removed or self.changed)
+
+    def table(self, caption: str | None = None) -> Table:
+        table = Table(box=box.SIMPLE, caption=caption)
+        if self.rows:
+            for c in next(iter(self.rows.values())):
+                table.add_column(c)
+
+        for k, cells in self.cells.items():
+            table.add_row(*cells, style=CHANGED_STYLE if k in self.changed else None)
+
+        return table
+
+
+def watch(
+    fetch: Callable[[], Sequence[Row]],
+    key: str | None = None,
+    min_interval: float = 2.0,
+    max_interval: float = 30.0,
+    poll: Callable[[], Sequence[Row]] | None = None,
+) -> list[Row]:
+    """
+    Call fetch, then poll repeatedly, and redraw the rows whenever they change until interrupted with Ctrl-C.
+
+    The poll interval starts at min_interval and backs off towards max_interval while nothing changes.
+
+    :param poll: fetches the rows after the first time, eg: without sorting them. Defaults to fetch.
+    :return: the most recently fetched rows
+    """
+    poll = poll or fetch
+    watched = WatchedRows(key)
+    watched.update(fetch())
+    # nothing has changed yet
+    watched.changed.clear()
+    changed = True
+    interval = min_interval
+
+    # every poll calls AWS, rather than repeating the memoised response
+    with memo.bypassed(), Live(console=Console(), auto_refresh=False, transient=True) as live:
+        try:
+            while True:
+                if changed:
+                    # only rebuilt and redrawn when something changed
+                    caption = f"Changed at {datetime.now():%H:%M:%S}. Ctrl-C to stop."
+                    live.update(watched.table(caption), refresh=True)
+
+                time.sleep(interval)
+                changed = watched.update(poll())
+                interval = min_interval if changed else min(interval * 1.5, max_interval)
+        except KeyboardInterrupt:
+            pass
+
+    return list(watched.rows.values())
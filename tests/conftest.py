@@ -17,6 +17,12 @@ def aws_credentials():
         del os.environ["AWS_CREDENTIAL_EXPIRATION"]
 
 
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path_factory: pytest.TempPathFactory, monkeypatch: pytest.MonkeyPatch):
+    """Keep local caches out of the user's home directory."""
+    monkeypatch.setenv("AEC_CACHE_DIR", str(tmp_path_factory.mktemp("cache")))
+
+
 @pytest.fixture(scope="session")
 def _mock_aws():
     with mock_aws():
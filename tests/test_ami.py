@@ -1,10 +1,12 @@
+from datetime import timedelta
+
 import boto3
 import pytest
 from moto.ec2.models.amis import AMIS
 from mypy_boto3_ec2 import EC2Client
 from mypy_boto3_ec2.type_defs import TagTypeDef
 
-from aec.command.ami import delete, describe, describe_tags, share
+from aec.command.ami import delete, describe, describe_tags, parse_duration, prune, share
 from aec.util.config import Config
 
 
@@ -126,3 +128,97 @@ def test_delete_image(mock_aws_config: Config):
 
 def test_share_image(mock_aws_config: Config):
     share(mock_aws_config, AMIS[0]["ami_id"], "123456789012")
+
+
+def test_share_images_with_accounts(mock_aws_config: Config):
+    ec2_client: EC2Client = boto3.client("ec2", region_name=mock_aws_config["region"])
+
+    response = ec2_client.run_instances(ImageId=AMIS[0]["ami_id"], MaxCount=1, MinCount=1)
+    instance_id = response["Instances"][0]["InstanceId"]
+    image_ids = [ec2_client.create_image(InstanceId=instance_id, Name=f"golden-{n}")["ImageId"] for n in range(2)]
+    accounts = ["111122223333", "444455556666"]
+
+    shared = share(mock_aws_config, image_ids, accounts, snapshots=True)
+
+    assert [s["ImageId"] for s in shared] == image_ids
+    assert {s["Status"] for s in shared} == {"shared"}
+    for s in shared:
+        permissions = ec2_client.describe_image_attribute(ImageId=s["ImageId"], Attribute="launchPermission")
+        assert {p["UserId"] for p in permissions["LaunchPermissions"]} == set(accounts)
+
+        snapshot_permissions = ec2_client.describe_snapshot_attribute(
+            SnapshotId=s["Snapshots"], Attribute="createVolumePermission"
+        )
+        assert {p["UserId"] for p in snapshot_permissions["CreateVolumePermissions"]} == set(accounts)
+
+
+def test_share_positional_account(mock_aws_config: Config):
+    ec2_client: EC2Client = boto3.client("ec2", region_name=mock_aws_config["region"])
+
+    shared = share(mock_aws_config, [AMIS[0]["ami_id"], "123456789012"])
+
+    assert [(s["ImageId"], s["Accounts"], s["Status"]) for s in shared] == [
+        (AMIS[0]["ami_id"], "123456789012", "shared")
+    ]
+    permissions = ec2_client.describe_image_attribute(ImageId=AMIS[0]["ami_id"], Attribute="launchPermission")
+    assert "123456789012" in {p.get("UserId") for p in permissions["LaunchPermissions"]}
+
+
+def test_share_missing_image_with_snapshots(mock_aws_config: Config):
+    ec2_client: EC2Client = boto3.client("ec2", region_name=mock_aws_config["region"])
+
+    response = ec2_client.run_instances(ImageId=AMIS[0]["ami_id"], MaxCount=1, MinCount=1)
+    image_id = ec2_client.create_image(InstanceId=response["Instances"][0]["InstanceId"], Name="golden")["ImageId"]
+
+    shared = share(mock_aws_config, [image_id, "ami-00000000000000000"], "111122223333", snapshots=True)
+
+    assert [(s["ImageId"], s["Status"]) for s in shared] == [
+        (image_id, "shared"),
+        ("ami-00000000000000000", "not found"),
+    ]
+
+
+def test_delete_image_deletes_snapshots(mock_aws_config: Config):
+    ec2_client: EC2Client = boto3.client("ec2", region_name=mock_aws_config["region"])
+
+    response = ec2_client.run_instances(ImageId=AMIS[0]["ami_id"], MaxCount=1, MinCount=1)
+    image_id = ec2_client.create_image(InstanceId=response["Instances"][0]["InstanceId"], Name="ci-build")["ImageId"]
+    snapshot_id = describe(mock_aws_config, idents=image_id, show_snapshot_id=True)[0]["SnapshotId"]
+
+    delete(mock_aws_config, image_id)
+
+    assert not ec2_client.describe_images(Owners=["self"])["Images"]
+    assert snapshot_id not in {s["SnapshotId"] for s in ec2_client.describe_snapshots(OwnerIds=["self"])["Snapshots"]}
+
+
+def test_prune(mock_aws_config: Config):
+    ec2_client: EC2Client = boto3.client("ec2", region_name=mock_aws_config["region"])
+
+    response = ec2_client.run_instances(ImageId=AMIS[0]["ami_id"], MaxCount=1, MinCount=1)
+    instance_id = response["Instances"][0]["InstanceId"]
+    for name in ["ci-build-1", "ci-build-2", "ci-build-3", "golden"]:
+        ec2_client.create_image(InstanceId=instance_id, Name=name)
+
+    # nothing is old enough
+    assert prune(mock_aws_config, older_than="1d") == []
+
+    pruned = prune(mock_aws_config, older_than="0d", keep=1, name_match="ci-build", dry_run=True)
+    assert len(pruned) == 2
+    assert {p["Status"] for p in pruned} == {"would delete"}
+    assert all(p["Snapshots"].startswith("snap-") for p in pruned)
+    assert len(ec2_client.describe_images(Owners=["self"])["Images"]) == 4
+
+    pruned = prune(mock_aws_config, older_than="0d", keep=1, name_match="ci-build")
+    assert {p["Status"] for p in pruned} == {"deleted"}
+    remaining = {i["Name"] for i in ec2_client.describe_images(Owners=["self"])["Images"]}
+    assert len(remaining) == 2
+    assert "golden" in remaining
+    assert not remaining & {p["Name"] for p in pruned}
+
+
+def test_parse_duration():
+    assert parse_duration("30d") == timedelta(days=30)
+    assert parse_duration("12h") == timedelta(hours=12)
+
+    with pytest.raises(ValueError):
+        parse_duration("30 days")
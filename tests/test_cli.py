@@ -7,6 +7,7 @@ import aec.util.cli as cli
 import aec.util.config as config
 from aec.main import build_parser
 from aec.util.cli import Arg, Cmd
+from aec.util.errors import HandledError
 
 
 def test_cli_injects_config():
@@ -39,3 +40,8 @@ def test_terminate_with_empty_string_fails(capsys: pytest.CaptureFixture):
 
     _stdout, stderr = capsys.readouterr()
     assert "is empty string" in stderr
+
+
+def test_watch_requires_table_output():
+    with pytest.raises(HandledError, match="--watch can only be used with table output"):
+        cli.dispatch(build_parser(), args=["ec2", "describe", "--watch", "-o", "csv"])
@@ -0,0 +1,89 @@
+import datetime
+import io
+
+import pytest
+from dateutil.tz import tzutc
+
+from aec.util import columnar
+from aec.util.display import OutputFormat, pretty_print, projected
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+rows = [
+    {
+        "InstanceId": "i-1",
+        "LaunchTime": datetime.datetime(2019, 8, 19, 6, 3, 6, tzinfo=tzutc()),
+        "Image.CreationDate": "2019-08-01T10:58:45.000Z",
+        "Volumes": ["Size=15 GiB"],
+        "Size": 15,
+    },
+    {"InstanceId": "i-2", "LaunchTime": None, "Image.CreationDate": None, "Volumes": [], "Size": None},
+]
+
+
+def test_write_parquet():
+    sink = io.BytesIO()
+    columnar.write(list(rows[0]), projected(rows, list(rows[0])), "parquet", sink)
+
+    table = pq.read_table(io.BytesIO(sink.getvalue()))
+
+    assert table.schema.field("LaunchTime").type == pa.timestamp("us", tz="UTC")
+    assert table.schema.field("Image.CreationDate").type == pa.timestamp("us", tz="UTC")
+    assert table.schema.field("Size").type == pa.int64()
+    assert table.column("Image.CreationDate").to_pylist()[0] == datetime.datetime(
+        2019, 8, 1, 10, 58, 45, tzinfo=datetime.timezone.utc
+    )
+    assert table.column("Volumes").to_pylist() == [["Size=15 GiB"], []]
+
+
+def test_write_arrow_in_batches(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("aec.util.columnar.BATCH_ROWS", 1)
+    sink = io.BytesIO()
+    columnar.write(list(rows[0]), projected(rows, list(rows[0])), "arrow", sink)
+
+    reader = pa.ipc.open_stream(sink.getvalue())
+    batches = list(reader)
+
+    assert len(batches) == 2
+    assert pa.Table.from_batches(batches).column("InstanceId").to_pylist() == ["i-1", "i-2"]
+
+
+def test_types_widened_across_batches(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("aec.util.columnar.BATCH_ROWS", 1)
+    mixed = [
+        {"Size": 15, "Team": "1", "Volumes": None},
+        {"Size": 1.5, "Team": 2, "Volumes": None},
+        {"Size": None, "Team": None, "Volumes": ["Size=15 GiB"]},
+    ]
+    sink = io.BytesIO()
+    columnar.write(list(mixed[0]), projected(mixed, list(mixed[0])), "parquet", sink)
+
+    table = pq.read_table(io.BytesIO(sink.getvalue()))
+
+    assert table.schema.field("Size").type == pa.float64()
+    assert table.column("Size").to_pylist() == [15.0, 1.5, None]
+    assert table.column("Team").to_pylist() == ["1", "2", None]
+    assert table.column("Volumes").to_pylist() == [None, None, ["Size=15 GiB"]]
+
+
+@pytest.mark.parametrize("file_format", ["parquet", "arrow"])
+def test_no_rows_writes_schema(file_format: str):
+    sink = io.BytesIO()
+    columnar.write(["InstanceId", "LaunchTime"], [], file_format, sink)
+
+    if file_format == "parquet":
+        table = pq.read_table(io.BytesIO(sink.getvalue()))
+    else:
+        table = pa.ipc.open_stream(sink.getvalue()).read_all()
+
+    assert table.num_rows == 0
+    assert table.schema.names == ["InstanceId", "LaunchTime"]
+    assert table.schema.field("LaunchTime").type == pa.timestamp("us", tz="UTC")
+
+
+def test_no_results_writes_empty_table(capfdbinary: pytest.CaptureFixture[bytes]):
+    pretty_print([], OutputFormat.parquet)
+
+    table = pq.read_table(io.BytesIO(capfdbinary.readouterr().out))
+    assert table.num_rows == 0
@@ -0,0 +1,85 @@
+import shlex
+import shutil
+import subprocess
+from collections.abc import Callable
+from pathlib import Path
+
+import boto3
+import pytest
+from moto.ec2.models.amis import AMIS
+
+from aec.main import build_parser
+from aec.util.completion import cache_names, names_path, script
+
+pytestmark = pytest.mark.skipif(not shutil.which("bash"), reason="requires bash")
+
+# completes the command line, returning the completions
+Complete = Callable[[str], list[str]]
+
+
+@pytest.fixture
+def complete(tmp_path: Path) -> Complete:
+    script_file = tmp_path / "aec.bash"
+    script_file.write_text(script(build_parser(), "bash"))
+
+    def inner(line: str) -> list[str]:
+        words = line.split(" ")
+        comp_words = " ".join(shlex.quote(w) for w in words)
+        cmd = (
+            f"source {script_file}; COMP_WORDS=({comp_words}); COMP_CWORD={len(words) - 1}; "
+            '_aec; printf "%s\\n" "${COMPREPLY[@]}"'
+        )
+        # without aec on the path, so a background refresh does nothing
+        out = subprocess.run(
+            ["bash", "-c", cmd],
+            capture_output=True,
+            text=True,
+            check=True,
+            env={"PATH": "/usr/bin:/bin", "AEC_CACHE_DIR": str(names_path().parent)},
+        )
+        return [w for w in out.stdout.splitlines() if w]
+
+    return inner
+
+
+def test_complete_commands(complete: Complete):
+    assert complete("aec ec2 st") == ["start", "stop", "status"]
+    assert complete("aec ec2 describe --sta") == ["--state"]
+    assert complete("aec ec2 describe --state st") == ["stopping", "stopped"]
+    assert complete("aec ec2 launch alice --ami ubuntu22") == ["ubuntu2204"]
+
+
+def test_complete_names(complete: Complete):
+    names_path().write_text("alice\nalex\nsam\n")
+    names_path("us").write_text("alfred\n")
+
+    assert complete("aec ec2 start al") == ["alice", "alex"]
+    assert complete("aec ec2 start --config us al") == ["alfred"]
+    assert complete("aec ssm run al") == ["alice", "alex"]
+    # ami idents are image names
+    assert complete("aec ami describe al") == []
+
+
+def test_complete_names_refreshed_when_missing(complete: Complete):
+    assert complete("aec ec2 start al") == []
+    # touched so concurrent completions don't start another refresh
+    assert names_path().exists()
+
+
+@pytest.mark.usefixtures("_mock_ec2")
+def test_cache_names(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    (tmp_path / ".aec").mkdir()
+    shutil.copy("src/aec/config-example/ec2.toml", tmp_path / ".aec" / "ec2.toml")
+    monkeypatch.setenv("HOME", str(tmp_path))
+
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+    for name in ["sam", "alice"]:
+        ec2_client.run_instances(
+            ImageId=AMIS[0]["ami_id"],
+            MinCount=1,
+            MaxCount=1,
+            TagSpecifications=[{"ResourceType": "instance", "Tags": [{"Key": "Name", "Value": name}]}],
+        )
+
+    assert cache_names("us") == 2
+    assert names_path("us").read_text() == "alice\nsam\n"
@@ -0,0 +1,67 @@
+import os
+from pathlib import Path
+
+import pytest
+from pytest_mock import MockFixture
+
+import aec.util.config as config
+from aec.util.config import load_config
+
+example = "src/aec/config-example/ec2.toml"
+
+
+def test_load_default_profile():
+    c = load_config(example)
+
+    assert c["region"] == "ap-southeast-2"
+    assert c["ssm"] == {"s3bucket": "logs", "s3prefix": "ssm-command"}
+    # top level keys are available in the profile
+    assert c["additional_tags"] == {"Owner": "alice@little.co", "Project": "example project"}
+
+
+def test_load_profile_override():
+    c = load_config(example, "us")
+
+    assert c["region"] == "us-east-1"
+    assert c["vpc"]["security_group"] == ["sg-0123456", "sg-7123456789"]
+    assert c["additional_tags"]["Owner"] == "alice@little.co"
+
+
+def test_load_missing_profile():
+    with pytest.raises(Exception, match="Missing profile nope"):
+        load_config(example, "nope")
+
+
+def test_load_missing_file(tmp_path: Path):
+    with pytest.raises(Exception, match="No config file"):
+        load_config(str(tmp_path / "missing.toml"))
+
+
+def test_parses_once_and_returns_copies(mocker: MockFixture):
+    parse = mocker.spy(config, "load_user_config_file")
+    config.parsed_configs.clear()
+
+    syd = load_config(example)
+    us = load_config(example, "us")
+    syd["vpc"]["name"] = "changed"
+    syd["additional_tags"]["Owner"] = "bob"
+
+    assert parse.call_count == 1
+    assert us["region"] == "us-east-1"
+    # changes to a loaded config don't affect later loads
+    assert load_config(example)["vpc"]["name"] == "public A"
+    assert load_config(example, "us")["additional_tags"]["Owner"] == "alice@little.co"
+    assert parse.call_count == 1
+
+
+def test_reparses_when_changed(tmp_path: Path):
+    config_file = tmp_path / "ec2.toml"
+    config_file.write_text('default_profile = "a"\n[a]\nregion = "us-east-1"\n')
+    assert load_config(str(config_file))["region"] == "us-east-1"
+
+    config_file.write_text('default_profile = "a"\n[a]\nregion = "ap-southeast-2"\n')
+    # make sure the modification time changes, even on file systems with coarse timestamps
+    stat = config_file.stat()
+    os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    assert load_config(str(config_file))["region"] == "ap-southeast-2"
@@ -0,0 +1,198 @@
+import io
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+from collections.abc import Iterator
+from pathlib import Path
+
+import boto3
+import pytest
+from botocore.exceptions import NoRegionError
+from moto.ec2.models.amis import AMIS
+from pytest_mock import MockFixture
+
+import aec.util.daemon as daemon
+from aec.util.errors import HandledError
+
+
+@pytest.fixture
+def _home(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    (tmp_path / ".aec").mkdir()
+    shutil.copy("src/aec/config-example/ec2.toml", tmp_path / ".aec" / "ec2.toml")
+    monkeypatch.setenv("HOME", str(tmp_path))
+    return tmp_path
+
+
+@pytest.fixture
+def running(_home: Path) -> Iterator[threading.Thread]:
+    thread = threading.Thread(target=daemon.serve)
+    thread.start()
+
+    # wait until it's accepting connections
+    while not (conn := daemon.connect(daemon.socket_path())):
+        thread.join(0.01)
+    conn.close()
+
+    yield thread
+
+    assert daemon.stop()
+    thread.join()
+
+
+def forward(args: list[str]) -> tuple[int | None, str, str]:
+    stdout, stderr = io.BytesIO(), io.BytesIO()
+    code = daemon.forward(args, stdout, stderr)
+    return code, stdout.getvalue().decode(), stderr.getvalue().decode()
+
+
+def test_not_running():
+    assert daemon.forward(["--help"]) is None
+    assert not daemon.stop()
+
+
+@pytest.mark.usefixtures("running")
+def test_forward_help():
+    code, stdout, _ = forward(["--help"])
+
+    assert code == 0
+    assert stdout.startswith("usage: aec")
+
+
+@pytest.mark.usefixtures("running")
+def test_forward_exit_code():
+    code, _, stderr = forward(["ec2", "bogus"])
+
+    assert code == 2
+    assert "invalid choice: 'bogus'" in stderr
+
+
+@pytest.mark.usefixtures("running", "_mock_ec2")
+def test_forward_command():
+    ec2_client = boto3.client("ec2", region_name="ap-southeast-2")
+    ec2_client.run_instances(
+        ImageId=AMIS[0]["ami_id"],
+        MinCount=1,
+        MaxCount=1,
+        TagSpecifications=[{"ResourceType": "instance", "Tags": [{"Key": "Name", "Value": "alice"}]}],
+    )
+
+    code, stdout, _ = forward(["ec2", "describe", "-c", "Name,State", "-o", "csv"])
+
+    assert code == 0
+    assert stdout.splitlines() == ["Name,State", "alice,running"]
+
+
+@pytest.mark.usefixtures("running")
+def test_refused_when_environment_differs(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("AWS_PROFILE", "production")
+
+    assert forward(["--help"]) == (None, "", "")
+
+
+@pytest.mark.usefixtures("running")
+def test_stdin_commands_run_locally():
+    assert daemon.forward(["ssm", "run", "alice"]) is None
+    # prompts for confirmation
+    assert daemon.forward(["ec2", "terminate", "alice"]) is None
+
+
+def test_terminate_without_prompt_forwarded():
+    assert daemon.runs_locally(["ec2", "terminate", "alice"])
+    assert not daemon.runs_locally(["ec2", "terminate", "alice", "-y"])
+    assert not daemon.runs_locally(["ec2", "terminate", "--yes", "alice"])
+
+
+def test_long_running_commands_run_locally():
+    assert daemon.runs_locally(["ec2", "describe", "--watch"])
+    assert daemon.runs_locally(["ec2", "stop", "alice", "--wait"])
+    assert daemon.runs_locally(["ec2", "start", "alice", "-w"])
+    assert daemon.runs_locally(["ec2", "resize", "alice", "-t", "t3.large"])
+    assert not daemon.runs_locally(["ec2", "describe"])
+
+
+@pytest.mark.usefixtures("running")
+def test_interrupted_when_client_closes(monkeypatch: pytest.MonkeyPatch):
+    import aec.main
+
+    main = aec.main.main
+    interrupted = threading.Event()
+
+    def waiting_main(args: list[str]) -> None:
+        if args != ["wait"]:
+            return main(args)
+        try:
+            while True:
+                time.sleep(0.01)
+        except KeyboardInterrupt:
+            interrupted.set()
+            raise
+
+    monkeypatch.setattr(aec.main, "main", waiting_main)
+
+    conn = daemon.connect(daemon.socket_path())
+    assert conn
+    request = {"args": ["wait"], "cwd": os.getcwd(), "env": dict(os.environ), "stdout_isatty": False}
+    conn.sendall(json.dumps(request | {"stderr_isatty": False}).encode() + b"\n")
+    # as the client does on ctrl-c
+    conn.close()
+
+    assert interrupted.wait(5)
+    # and the daemon runs the next command
+    code, _, stderr = forward(["ec2", "bogus"])
+    assert code == 2
+    assert "invalid choice: 'bogus'" in stderr
+
+
+def test_client_interrupted(mocker: MockFixture):
+    conn, _ = socket.socketpair()
+    mocker.patch.object(daemon, "connect", return_value=conn)
+    # ctrl-c while waiting for output
+    mocker.patch.object(daemon, "receive", side_effect=KeyboardInterrupt)
+
+    assert daemon.forward(["ec2", "describe"]) == 130
+    # which interrupts the command in the daemon
+    assert conn.fileno() == -1
+
+
+@pytest.mark.usefixtures("running")
+def test_session_reloaded_when_credentials_change(_home: Path):
+    forward(["--help"])
+    session = boto3.DEFAULT_SESSION
+
+    forward(["--help"])
+    assert boto3.DEFAULT_SESSION is session
+
+    (_home / ".aws").mkdir()
+    (_home / ".aws" / "credentials").write_text("[default]\naws_access_key_id = testing\n")
+
+    forward(["--help"])
+    assert boto3.DEFAULT_SESSION is not session
+
+
+def test_warm_up_skips_profile_without_region(
+    _home: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+):
+    monkeypatch.delenv("AWS_DEFAULT_REGION", raising=False)
+    (_home / ".aec" / "ec2.toml").write_text('[none]\n\n[us]\nregion = "us-east-1"\n')
+    created: list[tuple[str, str | None]] = []
+
+    def client(service: str, region_name: str | None = None) -> None:
+        if not region_name:
+            raise NoRegionError
+        created.append((service, region_name))
+
+    monkeypatch.setattr(boto3, "client", client)
+
+    daemon.warm_up()
+
+    assert created == [("ec2", "us-east-1"), ("ssm", "us-east-1"), ("compute-optimizer", "us-east-1")]
+    assert "Warm up of region None incomplete: You must specify a region." in capsys.readouterr().err
+
+
+@pytest.mark.usefixtures("running")
+def test_already_running():
+    with pytest.raises(HandledError, match="aec daemon is already running"):
+        daemon.serve()
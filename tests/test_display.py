@@ -1,8 +1,10 @@
 import datetime
+import io
 
+import pytest
 from dateutil.tz import tzutc
 
-from aec.util.display import as_table
+from aec.util.display import OutputFormat, as_table, pretty_print, print_plain_table, projection
 
 
 def test_as_table():
@@ -47,3 +49,65 @@ def test_as_table_with_none():
 
 def test_as_table_empty_list():
     assert as_table([]) == []
+
+
+def test_print_plain_table():
+    out = io.StringIO()
+    print_plain_table(["Name", "State"], [["alice", "running"], ["sam", ""]], out)
+
+    assert out.getvalue() == "Name   State\n-----  -------\nalice  running\nsam\n"
+
+
+def test_print_plain_table_wider_than_sample(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("aec.util.display.PLAIN_TABLE_SAMPLE_ROWS", 1)
+    out = io.StringIO()
+    print_plain_table(["a", "b"], iter([["1", "2"], ["333", "4"]]), out)
+
+    assert out.getvalue() == "a  b\n-  -\n1  2\n333  4\n"
+
+
+def test_pretty_print_plain_when_not_a_terminal(capsys: pytest.CaptureFixture):
+    pretty_print([{"a": 1, "b": None}])
+    assert capsys.readouterr().out == "a  b\n-  -\n1\n"
+
+    pretty_print(iter([{"a": 1, "b": 2}]))
+    assert capsys.readouterr().out == "a  b\n-  -\n1  2\n"
+
+
+def test_pretty_print_jsonl(capsys: pytest.CaptureFixture):
+    launched = datetime.datetime(2019, 8, 19, 6, 3, 6, tzinfo=tzutc())
+
+    pretty_print([{"a": 1, "b": launched}, {"a": 2, "b": None}], OutputFormat.jsonl)
+    assert capsys.readouterr().out == '{"a":1,"b":"2019-08-19T06:03:06+00:00"}\n{"a":2,"b":null}\n'
+
+    pretty_print(iter([{"a": ["x", "y"]}]), OutputFormat.ndjson)
+    assert capsys.readouterr().out == '{"a":["x","y"]}\n'
+
+    pretty_print([], OutputFormat.jsonl)
+    assert capsys.readouterr().out == ""
+
+
+def test_pretty_print_jsonl_messages_to_stderr(capsys: pytest.CaptureFixture):
+    pretty_print(None, OutputFormat.jsonl)
+    pretty_print("Created key pair", OutputFormat.jsonl)
+
+    out, err = capsys.readouterr()
+    assert out == ""
+    assert err == "Done ✨\nCreated key pair\n"
+
+    pretty_print("Created key pair")
+    assert capsys.readouterr().out == "Created key pair\n"
+
+
+def test_projection():
+    assert projection(("b", "a"))({"a": 1, "b": 2}) == (2, 1)
+    assert projection(("a",))({"a": 1, "b": 2}) == (1,)
+    # missing keys are None
+    assert projection(("a", "c"))({"a": 1, "b": 2}) == (1, None)
+    # compiled once per set of keys
+    assert projection(("a", "c")) is projection(("a", "c"))
+
+
+def test_pretty_print_csv(capsys: pytest.CaptureFixture):
+    pretty_print([{"a": 1, "b": "x,y"}, {"b": 4, "a": None}], OutputFormat.csv)
+    assert capsys.readouterr().out == 'a,b\r\n1,"x,y"\r\n,4\r\n'
@@ -3,21 +3,28 @@ from pathlib import Path
 
 import boto3
 import pytest
+from botocore.exceptions import ClientError
 from dirty_equals import IsDatetime
 from moto.core.models import DEFAULT_ACCOUNT_ID
+from moto.ec2.exceptions import InvalidInstanceIdError
 from moto.ec2.models import ec2_backends
 from moto.ec2.models.amis import AMIS
+from mypy_boto3_ec2.client import EC2Client
 from mypy_boto3_ec2.type_defs import TagTypeDef
 from pytest_mock import MockFixture
 
 from aec.command.ec2 import (
+    Instance,
+    _wait_for_state,
     create_key_pair,
     describe,
     instance_tags,
     launch,
     logs,
     modify,
+    parse_filters,
     rename,
+    resize,
     restart,
     sec_groups,
     start,
@@ -30,6 +37,7 @@ from aec.command.ec2 import (
     volume_tags,
 )
 from aec.util.config import Config
+from aec.util.errors import HandledError
 
 
 @pytest.fixture
@@ -50,6 +58,11 @@ def mock_aws_config(_mock_ec2: None) -> Config:
 ami_id = AMIS[0]["ami_id"]
 
 
+@pytest.fixture(autouse=True)
+def _no_state_polling_delay(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr("aec.command.ec2.STATE_POLL_SECONDS", 0)
+
+
 def test_launch(mock_aws_config: Config):
     instances = launch(mock_aws_config, "alice", ami=ami_id)
     assert "amazonaws.com" in instances[0]["DnsName"]
@@ -265,8 +278,8 @@ def test_describe_columns(mock_aws_config: Config):
     assert instances[1]["Name"] == "sam"
     assert "subnet" in instances[0]["SubnetId"]
     assert "subnet" in instances[1]["SubnetId"]
-    assert instances[0]["Volumes"] == ["Size=15 GiB"]
-    assert instances[1]["Volumes"] == ["Size=15 GiB"]
+    assert instances[0]["Volumes"] == ["Size=15 GiB, Type=gp3, Iops=3000"]
+    assert instances[1]["Volumes"] == ["Size=15 GiB, Type=gp3, Iops=3000"]
     assert instances[0]["Image.CreationDate"] == IsDatetime(format_string="%Y-%m-%dT%H:%M:%S.%fZ")
     assert instances[1]["Image.CreationDate"] == IsDatetime(format_string="%Y-%m-%dT%H:%M:%S.%fZ")
 
@@ -302,6 +315,61 @@ def test_tag(mock_aws_config: Config):
     assert instances[0]["Tag: Project"] == "top secret"
 
 
+def test_tag_from_csv(mock_aws_config: Config, tmp_path: Path, mocker: MockFixture):
+    mocker.patch("aec.command.ec2.MAX_CREATE_TAGS_RESOURCES", 2)
+    ids = [launch(mock_aws_config, name, ami_id)[0]["InstanceId"] for name in ["alice", "alex", "sam"]]
+    volume_id = boto3.client("ec2", region_name=mock_aws_config["region"]).describe_volumes()["Volumes"][0]["VolumeId"]
+
+    csv_file = tmp_path / "tags.csv"
+    csv_file.write_text(
+        f"ResourceId,Owner,CostCentre\n{ids[0]},alice,42\n{ids[1]},alice,42\n{ids[2]},sam,\n{volume_id},alice,42\n"
+    )
+
+    results = tag(mock_aws_config, from_file=str(csv_file))
+
+    # a call per chunk of resources with the same tags
+    assert [(r["Tags"], r["Resources"], r["Status"]) for r in results] == [
+        ("CostCentre=42, Owner=alice", 2, "tagged"),
+        ("CostCentre=42, Owner=alice", 1, "tagged"),
+        ("Owner=sam", 1, "tagged"),
+    ]
+
+    instances = instance_tags(mock_aws_config, keys=["Owner", "CostCentre"])
+    assert [(i["Name"], i["Tag: Owner"], i["Tag: CostCentre"]) for i in instances] == [
+        ("alex", "alice", "42"),
+        ("alice", "alice", "42"),
+        ("sam", "sam", None),
+    ]
+    volumes = volume_tags(mock_aws_config, keys=["Owner"])
+    assert [v["Tag: Owner"] for v in volumes if v["VolumeId"] == volume_id] == ["alice"]
+
+
+def test_tag_from_json(mock_aws_config: Config, tmp_path: Path):
+    alice_id = launch(mock_aws_config, "alice", ami_id)[0]["InstanceId"]
+    sam_id = launch(mock_aws_config, "sam", ami_id)[0]["InstanceId"]
+
+    json_file = tmp_path / "tags.json"
+    json_file.write_text(f'{{"{alice_id}": {{"Owner": "alice"}}, "{sam_id}": {{"Owner": "sam", "Team": ""}}}}')
+
+    results = tag(mock_aws_config, from_file=str(json_file))
+
+    assert [(r["Tags"], r["Status"]) for r in results] == [("Owner=alice", "tagged"), ("Owner=sam", "tagged")]
+    assert [i["Tags"] for i in instance_tags(mock_aws_config)] == ["Name=alice, Owner=alice", "Name=sam, Owner=sam"]
+
+
+def test_tag_from_json_without_tag_objects(mock_aws_config: Config, tmp_path: Path):
+    json_file = tmp_path / "tags.json"
+    json_file.write_text('{"i-0123456789abcdef0": "Owner=alice"}')
+
+    with pytest.raises(HandledError, match="has tags for i-0123456789abcdef0 that aren't an object"):
+        tag(mock_aws_config, from_file=str(json_file))
+
+
+def test_tag_from_combined_with_tags(mock_aws_config: Config):
+    with pytest.raises(HandledError, match="--from can't be combined"):
+        tag(mock_aws_config, "alice", tags=["Owner=alice"], from_file="tags.csv")
+
+
 def test_tags(mock_aws_config: Config):
     mock_aws_config["additional_tags"] = {"Owner": "alice@testlab.io", "Project": "top secret"}
     launch(mock_aws_config, "alice", ami_id)
@@ -363,6 +431,137 @@ def test_stop_start(mock_aws_config: Config):
     assert instances[1]["Name"] == "bob"
 
 
+def test_stop_start_name_match(mock_aws_config: Config, capsys: pytest.CaptureFixture[str]):
+    launch(mock_aws_config, "alice", ami_id)
+    launch(mock_aws_config, "alex", ami_id)
+    launch(mock_aws_config, "sam", ami_id)
+    capsys.readouterr()
+
+    stopped = stop(mock_aws_config, name_match="al", wait=True)
+
+    assert [s["State"] for s in stopped] == ["stopped", "stopped"]
+    # progress of each instance
+    assert sorted(capsys.readouterr().out.splitlines()) == ["alex is stopped", "alice is stopped"]
+
+    start(mock_aws_config, filters=["tag:Name=alice"])
+
+    instances = describe(config=mock_aws_config)
+    assert [(i["Name"], i["State"]) for i in instances] == [
+        ("alice", "running"),
+        ("sam", "running"),
+        ("alex", "stopped"),
+    ]
+
+
+def test_stop_batches(mock_aws_config: Config, mocker: MockFixture):
+    mocker.patch("aec.command.ec2.MAX_STATE_CHANGE_IDS", 2)
+    mocker.patch("aec.command.ec2.MAX_FILTER_VALUES", 2)
+    for name in ["alice", "alex", "sam"]:
+        launch(mock_aws_config, name, ami_id)
+
+    stopped = stop(mock_aws_config, ["alice", "alex", "sam"], wait=True)
+
+    assert [s["State"] for s in stopped] == ["stopped", "stopped", "stopped"]
+
+
+def test_stop_reports_failed_batch(mock_aws_config: Config, mocker: MockFixture):
+    mocker.patch("aec.command.ec2.MAX_STATE_CHANGE_IDS", 1)
+    alice_id = launch(mock_aws_config, "alice", ami_id)[0]["InstanceId"]
+    sam_id = launch(mock_aws_config, "sam", ami_id)[0]["InstanceId"]
+
+    backend = ec2_backends[DEFAULT_ACCOUNT_ID]["us-east-1"]
+    stop_instances = backend.stop_instances
+
+    def fail_for_sam(instance_ids: list[str]) -> object:
+        if sam_id in instance_ids:
+            raise InvalidInstanceIdError(sam_id)
+        return stop_instances(instance_ids)
+
+    mocker.patch.object(backend, "stop_instances", side_effect=fail_for_sam)
+
+    stopped = stop(mock_aws_config, ["alice", "sam"], wait=True)
+
+    assert [(s["InstanceId"], s["State"], s["Status"]) for s in stopped] == [
+        (alice_id, "stopped", "ok"),
+        (sam_id, "running", f"InvalidInstanceID.NotFound: The instance ID '{sam_id}' does not exist"),
+    ]
+
+
+@pytest.mark.usefixtures("mock_aws_config")
+def test_wait_for_purged_instance(capsys: pytest.CaptureFixture[str]):
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+    purged_id = "i-00000000000000000"
+
+    states = _wait_for_state(ec2_client, {purged_id: "alice"}, {purged_id: "shutting-down"}, "terminated")
+
+    assert states == {purged_id: "terminated"}
+    assert capsys.readouterr().out == "alice is terminated\n"
+
+
+def test_stop_requires_identifier(mock_aws_config: Config):
+    with pytest.raises(HandledError, match="Specify instance names or ids"):
+        stop(mock_aws_config)
+
+
+def test_resize(mock_aws_config: Config, mocker: MockFixture):
+    wait_ssm = mocker.patch("aec.command.ec2._wait_ssm_agent_online")
+    launch(mock_aws_config, "web-1", ami_id)
+    launch(mock_aws_config, "web-2", ami_id)
+    launch(mock_aws_config, "web-3", ami_id, instance_type="c5.large")
+    launch(mock_aws_config, "db", ami_id)
+    stop(mock_aws_config, "web-2", wait=True)
+
+    results = resize(mock_aws_config, "c5.large", name_match="web-", max_parallel=2)
+
+    assert [(r["Name"], r["Type"], r["State"], r["Status"]) for r in results] == [
+        ("web-1", "c5.large", "running", "resized"),
+        ("web-3", "c5.large", "running", "unchanged"),
+        ("web-2", "c5.large", "stopped", "resized"),
+    ]
+    # only instances that were running are restarted and gated on ssm
+    wait_ssm.assert_called_once_with(mock_aws_config, [results[0]["InstanceId"]])
+
+    instances = describe(mock_aws_config, columns="Name,Type,EbsOptimized")
+    assert [(i["Name"], i["Type"], i["EbsOptimized"]) for i in instances] == [
+        ("db", "t3.small", True),
+        ("web-1", "c5.large", True),
+        ("web-2", "c5.large", True),
+        ("web-3", "c5.large", True),
+    ]
+
+
+def test_resize_stops_after_failure(mock_aws_config: Config, mocker: MockFixture):
+    mocker.patch("aec.command.ec2._wait_ssm_agent_online", side_effect=TimeoutError("SSM agent not online"))
+    launch(mock_aws_config, "web-1", ami_id)
+    launch(mock_aws_config, "web-2", ami_id)
+
+    results = resize(mock_aws_config, "c5.large", name_match="web-", max_parallel=1)
+
+    assert [(r["Name"], r["Type"], r["Status"]) for r in results] == [
+        # the type was applied before the agent failed to come online
+        ("web-1", "c5.large", "SSM agent not online"),
+        ("web-2", "t3.small", "skipped"),
+    ]
+
+
+def test_resize_restores_type_after_modify_fails(mock_aws_config: Config, mocker: MockFixture):
+    def fail_after_type(ec2_client: EC2Client, instance: Instance, type: str) -> None:
+        ec2_client.modify_instance_attribute(InstanceId=instance["InstanceId"], InstanceType={"Value": type})
+        raise ClientError({"Error": {"Code": "InvalidParameterCombination", "Message": "Not EBS optimizable"}}, "")
+
+    mocker.patch("aec.command.ec2._modify_type", side_effect=fail_after_type)
+    mocker.patch("aec.command.ec2._wait_ssm_agent_online")
+    launch(mock_aws_config, "web-1", ami_id)
+
+    results = resize(mock_aws_config, "c5.large", name_match="web-")
+
+    assert [(r["Name"], r["Type"], r["State"], r["Status"]) for r in results] == [
+        ("web-1", "t3.small", "running", "InvalidParameterCombination: Not EBS optimizable"),
+    ]
+    instances = describe(mock_aws_config, columns="Name,Type,State")
+    assert [(i["Name"], i["Type"], i["State"]) for i in instances] == [("web-1", "t3.small", "running")]
+
+
 def test_restart_new_type(mock_aws_config: Config):
     launch(mock_aws_config, "alice", ami_id)
 
@@ -547,3 +746,95 @@ def test_sec_groups_with_vpc_filter(mock_aws_config: Config):
         assert len(all_groups) > len(vpc_groups)
     finally:
         ec2_client.delete_vpc(VpcId=vpc_id)
+
+
+def test_status_match_requests_only_matching_instances(mock_aws_config: Config, mocker: MockFixture):
+    launch(mock_aws_config, "alice", ami_id)
+    launch(mock_aws_config, "sam", ami_id)
+
+    describe_instance_status = mocker.spy(ec2_backends[DEFAULT_ACCOUNT_ID]["us-east-1"], "describe_instance_status")
+
+    statuses = status(mock_aws_config, name_match="lic")
+
+    assert [s["Name"] for s in statuses] == ["alice"]
+    describe_instance_status.assert_called_once()
+    assert describe_instance_status.call_args.args[0] == [statuses[0]["InstanceId"]]
+
+
+def test_describe_only_fetches_what_columns_need(mock_aws_config: Config, mocker: MockFixture):
+    launch(mock_aws_config, "alice", ami_id)
+
+    backend = ec2_backends[DEFAULT_ACCOUNT_ID]["us-east-1"]
+    describe_images = mocker.spy(backend, "describe_images")
+    describe_volumes = mocker.spy(backend, "describe_volumes")
+
+    describe(config=mock_aws_config, columns="InstanceId,Name")
+    assert describe_images.call_count == 0
+    assert describe_volumes.call_count == 0
+
+    instances = describe(config=mock_aws_config, columns="Name,Image.Name")
+    assert describe_images.call_count == 1
+    assert describe_volumes.call_count == 0
+    assert instances[0]["Image.Name"]  # type: ignore
+
+    # images are cached
+    describe(config=mock_aws_config, columns="Name,Image.Name")
+    assert describe_images.call_count == 1
+
+
+def test_describe_sort_descending_with_limit(mock_aws_config: Config):
+    launch(mock_aws_config, "alice", ami_id)
+    launch(mock_aws_config, "bob", ami_id)
+    launch(mock_aws_config, "sam", ami_id)
+
+    instances = describe(config=mock_aws_config, sort_by="-Name", limit=2)
+
+    assert [i["Name"] for i in instances] == ["sam", "bob"]
+
+
+def test_describe_filters(mock_aws_config: Config):
+    launch(mock_aws_config, "alice", ami_id, instance_type="t3.small")
+    launch(mock_aws_config, "bob", ami_id, instance_type="t3.medium")
+    launch(mock_aws_config, "sam", ami_id, instance_type="t3.large")
+    tag(mock_aws_config, "alice", tags=["Team=infra"])
+
+    instances = describe(config=mock_aws_config, filters=["tag:Team=infra"])
+    assert [i["Name"] for i in instances] == ["alice"]
+
+    instances = describe(config=mock_aws_config, filters=["type=t3.small,t3.medium"])
+    assert [i["Name"] for i in instances] == ["alice", "bob"]
+
+    instances = describe(config=mock_aws_config, filters=["type=t3.small,t3.medium", "az=us-east-1a"])
+    assert [i["Name"] for i in instances] == ["alice", "bob"]
+
+    instances = describe(config=mock_aws_config, filters=["az=us-east-1b"])
+    assert instances == []
+
+
+def test_describe_states_filtered_by_api(mock_aws_config: Config, mocker: MockFixture):
+    launch(mock_aws_config, "alice", ami_id)
+    launch(mock_aws_config, "bob", ami_id)
+    stop(mock_aws_config, ["alice"])
+    terminate(mock_aws_config, ["bob"])
+
+    describe_instances = mocker.spy(ec2_backends[DEFAULT_ACCOUNT_ID]["us-east-1"], "describe_instances")
+
+    instances = describe(config=mock_aws_config)
+    assert [i["Name"] for i in instances] == ["alice"]
+
+    # terminated instances are excluded by the request, not after downloading them
+    _, kwargs = describe_instances.call_args
+    assert "terminated" not in kwargs["filters"]["instance-state-name"]
+
+    instances = describe(config=mock_aws_config, states=["terminated"])
+    assert [i["Name"] for i in instances] == ["bob"]
+
+
+def test_parse_filters():
+    assert parse_filters(["tag:Team=infra", "az=us-east-1a", "tag:Team=data,ml"]) == [
+        {"Name": "tag:Team", "Values": ["infra", "data", "ml"]},
+        {"Name": "availability-zone", "Values": ["us-east-1a"]},
+    ]
+
+    with pytest.raises(ValueError):
+        parse_filters(["tag:Team"])
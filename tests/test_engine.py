@@ -0,0 +1,90 @@
+import sys
+from collections.abc import Iterator
+
+import boto3
+import botocore.endpoint
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.model import OperationModel
+from moto.core.models import DEFAULT_ACCOUNT_ID
+from moto.ec2.models import ec2_backends
+from moto.ec2.models.amis import AMIS
+from pytest_mock import MockFixture
+
+import aec.util.engine as engine
+import aec.util.limiter as limiter
+import aec.util.memo as memo
+from aec.util.engine import Call
+from aec.util.errors import HandledError
+
+
+@pytest.fixture(params=["thread", "async"])
+def _engine(request: pytest.FixtureRequest, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("AEC_ENGINE", request.param)
+    if request.param == "async":
+        pytest.importorskip("aiobotocore")
+
+        # moto's responses are synchronous, so convert them synchronously too
+        async def convert_to_response_dict(http_response: AWSResponse, operation_model: OperationModel) -> object:
+            return botocore.endpoint.convert_to_response_dict(http_response, operation_model)
+
+        monkeypatch.setattr("aiobotocore.endpoint.convert_to_response_dict", convert_to_response_dict)
+
+
+@pytest.fixture
+def _memo(_mock_ec2: None) -> Iterator[None]:
+    memo.start()
+    yield
+    memo.finish()
+
+
+@pytest.mark.usefixtures("_mock_ec2", "_engine")
+def test_results_in_call_order():
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+    response = ec2_client.run_instances(ImageId=AMIS[0]["ami_id"], MinCount=3, MaxCount=3)
+    instance_ids = [i["InstanceId"] for i in response["Instances"]]
+
+    calls = [
+        Call(ec2_client, "describe_instances", {"PaginationConfig": {"PageSize": 5}}),
+        Call(ec2_client, "describe_instances", {"InstanceIds": instance_ids[2:]}, paginate=False),
+        Call(ec2_client, "describe_volumes", {}),
+    ]
+    all_pages, one_page, volume_pages = engine.results(calls)
+
+    def ids(pages: list[engine.Page]) -> list[str]:
+        return [i["InstanceId"] for page in pages for r in page["Reservations"] for i in r["Instances"]]
+
+    assert ids(all_pages) == instance_ids
+    assert ids(one_page) == instance_ids[2:]
+    assert sum(len(page["Volumes"]) for page in volume_pages) == 3
+
+
+def test_no_calls():
+    assert list(engine.results([])) == []
+
+
+@pytest.mark.usefixtures("_memo", "_engine")
+def test_calls_limited_and_memoised(mocker: MockFixture):
+    limiter.register()
+    describe_volumes = mocker.spy(ec2_backends[DEFAULT_ACCOUNT_ID]["us-east-1"], "describe_volumes")
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+    bucket = limiter.limiter.bucket("ec2", "us-east-1")
+    calls = bucket.calls
+
+    for _ in range(2):
+        [pages] = engine.results([Call(ec2_client, "describe_volumes", {}, paginate=False)])
+        assert pages[0]["Volumes"] == []
+
+    # the second call is answered from memory
+    assert describe_volumes.call_count == 1
+    assert bucket.calls == calls + 1
+
+
+def test_async_requires_aiobotocore(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setenv("AEC_ENGINE", "async")
+    # as if not installed
+    monkeypatch.setitem(sys.modules, "aiobotocore", None)
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+
+    with pytest.raises(HandledError, match=r"pip install aec-cli\[async\]"):
+        list(engine.results([Call(ec2_client, "describe_instances", {})]))
@@ -0,0 +1,63 @@
+import sqlite3
+import time
+
+import boto3
+import pytest
+from moto.core.models import DEFAULT_ACCOUNT_ID
+from moto.ec2.models import ec2_backends
+from moto.ec2.models.amis import AMIS
+from pytest_mock import MockFixture
+
+import aec.util.image_cache as image_cache
+
+ACCOUNT = "123456789012"
+
+
+@pytest.mark.usefixtures("_mock_ec2")
+def test_images_cached(mocker: MockFixture):
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+    describe_images = mocker.spy(ec2_backends[DEFAULT_ACCOUNT_ID]["us-east-1"], "describe_images")
+
+    images = image_cache.images(ec2_client, ACCOUNT, [AMIS[0]["ami_id"], AMIS[1]["ami_id"], AMIS[0]["ami_id"]])
+    assert sorted(images) == sorted([AMIS[0]["ami_id"], AMIS[1]["ami_id"]])
+    assert describe_images.call_count == 1
+
+    # only the image not already cached is described
+    images = image_cache.images(ec2_client, ACCOUNT, [AMIS[0]["ami_id"], AMIS[2]["ami_id"]])
+    assert images[AMIS[0]["ami_id"]]["Name"] == AMIS[0]["name"]
+    assert images[AMIS[2]["ami_id"]]["Name"] == AMIS[2]["name"]
+    assert describe_images.call_count == 2
+
+    # cached per region
+    describe_west_images = mocker.spy(ec2_backends[DEFAULT_ACCOUNT_ID]["us-west-2"], "describe_images")
+    image_cache.images(boto3.client("ec2", region_name="us-west-2"), ACCOUNT, [AMIS[0]["ami_id"]])
+    assert describe_west_images.call_count == 1
+
+    # and per account
+    image_cache.images(ec2_client, "111122223333", [AMIS[0]["ami_id"]])
+    assert describe_images.call_count == 3
+
+
+@pytest.mark.usefixtures("_mock_ec2")
+def test_missing_images_cached(mocker: MockFixture):
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+    describe_images = mocker.spy(ec2_backends[DEFAULT_ACCOUNT_ID]["us-east-1"], "describe_images")
+
+    assert image_cache.images(ec2_client, ACCOUNT, ["ami-deregistered"]) == {}
+    assert image_cache.images(ec2_client, ACCOUNT, ["ami-deregistered"]) == {}
+    assert describe_images.call_count == 1
+
+    # described again once expired
+    mocker.patch("aec.util.image_cache.time.time", return_value=time.time() + image_cache.MISSING_TTL + 1)
+    assert image_cache.images(ec2_client, ACCOUNT, ["ami-deregistered"]) == {}
+    assert describe_images.call_count == 2
+
+
+@pytest.mark.usefixtures("_mock_ec2")
+def test_locked_cache_described(mocker: MockFixture):
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+    mocker.patch("aec.util.image_cache.sqlite3.connect", side_effect=sqlite3.OperationalError("database is locked"))
+
+    images = image_cache.images(ec2_client, ACCOUNT, [AMIS[0]["ami_id"]])
+
+    assert images[AMIS[0]["ami_id"]]["Name"] == AMIS[0]["name"]
@@ -0,0 +1,107 @@
+from typing import Any
+
+import boto3
+import pytest
+from moto.ec2.models.amis import AMIS
+from pytest_mock import MockFixture
+
+import aec.command.ami as ami
+import aec.command.ec2 as ec2
+import aec.command.ssm as ssm
+from aec.command.inventory import sync
+from aec.util.config import Config
+from aec.util.errors import HandledError
+
+region = "us-east-1"
+ami_id = AMIS[0]["ami_id"]
+
+
+@pytest.fixture
+def mock_aws_config(_mock_ec2: None) -> Config:
+    return {"region": region}
+
+
+@pytest.fixture
+def synced(mock_aws_config: Config, mocker: MockFixture) -> Config:
+    ec2_client = boto3.client("ec2", region_name=region)
+    for name in ["alice", "sam"]:
+        ec2_client.run_instances(
+            ImageId=ami_id,
+            MinCount=1,
+            MaxCount=1,
+            TagSpecifications=[
+                {"ResourceType": "instance", "Tags": [{"Key": "Name", "Value": name}, {"Key": "Owner", "Value": name}]},
+                {"ResourceType": "volume", "Tags": [{"Key": "Name", "Value": name}]},
+            ],
+        )
+    alice_id = ec2.describe(mock_aws_config, idents="alice")[0]["InstanceId"]
+    ec2_client.create_image(InstanceId=alice_id, Name="alice-image")
+
+    # moto doesn't support describe_instance_information
+    agent: dict[str, Any] = {
+        "InstanceId": alice_id,
+        "PingStatus": "Online",
+        "PlatformName": "Ubuntu",
+        "PlatformVersion": "22.04",
+        "AgentVersion": "3.2.0",
+    }
+    mocker.patch("aec.command.inventory.fetch_ssm_agents", return_value=[agent])
+
+    [row] = sync(mock_aws_config)
+    assert row["Region"] == region
+    assert row["Instances"] == 2
+    assert row["SSM agents"] == 1
+
+    return mock_aws_config
+
+
+def test_describe_offline(synced: Config, mocker: MockFixture):
+    client = mocker.patch("boto3.client")
+
+    instances = ec2.describe(synced, columns="Name,State,Image.CreationDate", offline=True)
+
+    assert [i["Name"] for i in instances] == ["alice", "sam"]
+    assert all(i["State"] == "running" for i in instances)
+    # images referenced by instances are synced for Image.* columns
+    assert all(i["Image.CreationDate"] for i in instances)
+    client.assert_not_called()
+
+
+def test_describe_offline_matches_online(synced: Config):
+    columns = "InstanceId,State,Name,Type,DnsName,LaunchTime,ImageId,Volumes"
+
+    assert ec2.describe(synced, columns=columns, offline=True) == ec2.describe(synced, columns=columns)
+
+
+def test_describe_offline_filters(synced: Config):
+    assert [i["Name"] for i in ec2.describe(synced, name_match="am", offline=True)] == ["sam"]
+    assert [i["Name"] for i in ec2.describe(synced, filters=["tag:Owner=ali*"], offline=True)] == ["alice"]
+    assert ec2.describe(synced, states=["stopped"], offline=True) == []
+
+
+def test_describe_offline_unsupported_filter(synced: Config):
+    with pytest.raises(HandledError, match=r"network-interface\.addresses\.private-ip-address filter"):
+        ec2.describe(synced, filters=["network-interface.addresses.private-ip-address=10.0.0.1"], offline=True)
+
+
+@pytest.mark.usefixtures("mock_aws_config")
+def test_describe_offline_not_synced():
+    with pytest.raises(HandledError, match=r"No offline inventory for ap-southeast-2\. Run aec sync first\."):
+        ec2.describe({"region": "ap-southeast-2"}, offline=True)
+
+
+def test_tags_offline(synced: Config):
+    assert ec2.instance_tags(synced, ident="sam", offline=True) == ec2.instance_tags(synced, ident="sam")
+    assert ec2.volume_tags(synced, keys=["Name"], offline=True) == ec2.volume_tags(synced, keys=["Name"])
+
+
+def test_ami_describe_offline(synced: Config):
+    images = ami.describe(synced, offline=True)
+    assert [i["Name"] for i in images] == ["alice-image"]
+
+    assert ami.describe(synced, idents=ami_id, offline=True) == ami.describe(synced, idents=ami_id)
+
+
+def test_ssm_describe_offline(synced: Config):
+    assert [a["Name"] for a in ssm.describe(synced, offline=True)] == ["alice"]
+    assert list(ssm.describe(synced, name_match="sam", offline=True)) == []
@@ -0,0 +1,134 @@
+import boto3
+import pytest
+from botocore.awsrequest import AWSPreparedRequest, AWSResponse, HTTPHeaders
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import ClientError
+
+import aec.util.limiter as limiter
+from aec.util.limiter import BETA, Bucket, Limiter
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+        self.slept: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.slept.append(round(seconds, 3))
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    c = Clock()
+    monkeypatch.setattr(limiter.time, "monotonic", c.monotonic)
+    monkeypatch.setattr(limiter.time, "sleep", c.sleep)
+    return c
+
+
+def test_unlimited_until_throttled(clock: Clock):
+    b = Bucket()
+    for _ in range(10):
+        b.acquire()
+
+    assert b.rate is None
+    assert clock.slept == []
+
+    b.throttled()
+
+    # cut to a fraction of the 10 calls sent in the last second
+    assert b.rate == 10 * BETA
+    for _ in range(3):
+        b.acquire()
+    assert clock.slept == [round(1 / 7, 3), round(2 / 7, 3), round(3 / 7, 3)]
+
+
+def test_concurrent_throttles_cut_once(clock: Clock):
+    b = Bucket()
+    for _ in range(10):
+        b.acquire()
+
+    b.throttled()
+    b.throttled()
+    assert b.rate == 10 * BETA
+
+    clock.now += 2
+    b.throttled()
+    assert b.rate == 10 * BETA * BETA
+    assert b.throttles == 3
+
+
+def test_rate_increases_while_succeeding():
+    b = Bucket()
+    b.succeeded()
+    assert b.rate is None
+
+    b.rate = 5.0
+    for _ in range(5):
+        b.succeeded()
+    # about one call/s per second of successful calls
+    assert 5.9 < b.rate < 6.0
+
+
+def throttle(request: AWSPreparedRequest, **_: object) -> AWSResponse:
+    body = b"<Response><Errors><Error><Code>RequestLimitExceeded</Code></Error></Errors></Response>"
+
+    class Raw:
+        def stream(self) -> list[bytes]:
+            return [body]
+
+    return AWSResponse(request.url, 503, HTTPHeaders(), Raw())
+
+
+@pytest.mark.usefixtures("_mock_ec2")
+def test_limiter_shared_across_clients(capsys: pytest.CaptureFixture):
+    session = boto3.Session(region_name="us-east-1")
+    limit = Limiter()
+    limit.register(session)
+    # registering again is a no-op
+    limit.register(session)
+    no_retries = BotoConfig(retries={"total_max_attempts": 1})
+
+    # takes precedence over moto, which handles before-send for all operations
+    session.events.register("before-send.ec2.DescribeRegions", throttle)  # type: ignore
+    with pytest.raises(ClientError, match="RequestLimitExceeded"):
+        session.client("ec2", config=no_retries).describe_regions()
+    session.events.unregister("before-send.ec2.DescribeRegions", throttle)  # type: ignore
+
+    # a different client for the same service and region shares the same bucket
+    session.client("ec2", config=no_retries).describe_regions()
+
+    bucket = limit.buckets[("ec2", "us-east-1")]
+    assert bucket.rate is not None
+    assert bucket.calls == 2
+    assert bucket.throttles == 1
+
+    limit.report()
+
+    assert "ec2 in us-east-1 was throttled 1 times during 2 calls" in capsys.readouterr().err
+    assert bucket.throttles == 0
+
+
+@pytest.mark.usefixtures("_mock_ec2")
+def test_retries_acquire(monkeypatch: pytest.MonkeyPatch):
+    session = boto3.Session(region_name="us-east-1")
+    limit = Limiter()
+    limit.register(session)
+    # skip the backoff before retrying
+    monkeypatch.setattr("botocore.endpoint.time.sleep", lambda _: None)
+
+    attempts: list[AWSPreparedRequest] = []
+
+    def throttle_first(request: AWSPreparedRequest, **_: object) -> AWSResponse | None:
+        attempts.append(request)
+        return throttle(request) if len(attempts) == 1 else None
+
+    session.events.register("before-send.ec2.DescribeRegions", throttle_first)  # type: ignore
+    session.client("ec2", config=BotoConfig(retries={"total_max_attempts": 2})).describe_regions()
+
+    bucket = limit.buckets[("ec2", "us-east-1")]
+    assert len(attempts) == 2
+    assert bucket.calls == 2
+    assert bucket.throttles == 1
@@ -0,0 +1,170 @@
+import threading
+import time
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import boto3
+import pytest
+from botocore.awsrequest import AWSResponse
+from botocore.compat import HTTPHeaders
+from moto.core.models import DEFAULT_ACCOUNT_ID
+from moto.ec2.models import ec2_backends
+from moto.ec2.models.amis import AMIS
+from pytest_mock import MockFixture
+
+import aec.util.memo as memo
+from aec.util.threads import fanout
+
+
+@pytest.fixture
+def _memo(_mock_ec2: None) -> Iterator[None]:
+    memo.start()
+    yield
+    memo.finish()
+
+
+@pytest.mark.usefixtures("_memo")
+def test_repeated_calls_memoised(mocker: MockFixture):
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+    response = ec2_client.run_instances(ImageId=AMIS[0]["ami_id"], MinCount=2, MaxCount=2)
+    alice_id, sam_id = [i["InstanceId"] for i in response["Instances"]]
+    describe_instances = mocker.spy(ec2_backends[DEFAULT_ACCOUNT_ID]["us-east-1"], "describe_instances")
+
+    def describe(*ids: str) -> int:
+        filters: Any = [{"Name": "instance-id", "Values": list(ids)}] if ids else []
+        return len([i for r in ec2_client.describe_instances(Filters=filters)["Reservations"] for i in r["Instances"]])
+
+    for _ in range(2):
+        assert describe() == 2
+        assert describe(alice_id) == 1
+        assert describe(sam_id) == 1
+    assert describe_instances.call_count == 3
+
+    # invalidates calls for alice, and calls that could return any instance
+    ec2_client.create_tags(Resources=[alice_id], Tags=[{"Key": "Name", "Value": "alice"}])
+
+    assert describe() == 2
+    assert describe(alice_id) == 1
+    assert describe(sam_id) == 1
+    assert describe_instances.call_count == 3 + 2
+
+
+@pytest.mark.usefixtures("_memo")
+def test_id_like_values_not_limiting():
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+    response = ec2_client.run_instances(
+        ImageId=AMIS[0]["ami_id"],
+        MinCount=1,
+        MaxCount=1,
+        TagSpecifications=[{"ResourceType": "instance", "Tags": [{"Key": "Name", "Value": "web-0123abcd"}]}],
+    )
+    instance_id = response["Instances"][0]["InstanceId"]
+
+    def state() -> str:
+        filters: Any = [{"Name": "tag:Name", "Values": ["web-0123abcd"]}]
+        return ec2_client.describe_instances(Filters=filters)["Reservations"][0]["Instances"][0]["State"]["Name"]
+
+    assert state() == "running"
+
+    # the Name looks like an id, but the call could return any instance so is invalidated
+    ec2_client.stop_instances(InstanceIds=[instance_id])
+    assert state() == "stopped"
+
+
+def test_resource_ids():
+    vpc_filter = {"Name": "vpc-id", "Values": ["vpc-0123abcd"]}
+    assert memo.resource_ids({"InstanceIds": ["i-1"], "Filters": [vpc_filter]}) == {"i-1"}
+    assert memo.resource_ids({"Filters": [{"Name": "image-id", "Values": ["ami-1", "ami-2"]}]}) == {"ami-1", "ami-2"}
+    assert memo.resource_ids({"Filters": [{"Name": "tag:Name", "Values": ["web-0123abcd"]}]}) == set()
+
+
+@pytest.mark.usefixtures("_memo")
+def test_concurrent_calls_coalesced(mocker: MockFixture):
+    backend = ec2_backends[DEFAULT_ACCOUNT_ID]["us-east-1"]
+    describe_volumes = backend.describe_volumes
+
+    def slow_describe_volumes(*args: Any, **kwargs: Any) -> object:
+        time.sleep(0.2)
+        return describe_volumes(*args, **kwargs)
+
+    spy = mocker.patch.object(backend, "describe_volumes", side_effect=slow_describe_volumes)
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+
+    with ThreadPoolExecutor(5) as pool:
+        responses = list(pool.map(lambda _: ec2_client.describe_volumes(), range(5)))
+
+    assert spy.call_count == 1
+    assert all(r["Volumes"] == responses[0]["Volumes"] for r in responses)
+
+
+@pytest.mark.usefixtures("_memo")
+def test_bypassed_when_polling(mocker: MockFixture):
+    describe_volumes = mocker.spy(ec2_backends[DEFAULT_ACCOUNT_ID]["us-east-1"], "describe_volumes")
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+
+    with memo.bypassed():
+        ec2_client.describe_volumes()
+        ec2_client.describe_volumes()
+    assert describe_volumes.call_count == 2
+
+    # the response from the last poll is memoised
+    ec2_client.describe_volumes()
+    assert describe_volumes.call_count == 2
+
+
+@pytest.mark.usefixtures("_memo")
+def test_bypassed_only_within_block(mocker: MockFixture):
+    describe_volumes = mocker.spy(ec2_backends[DEFAULT_ACCOUNT_ID]["us-east-1"], "describe_volumes")
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+    ec2_client.describe_volumes()
+    polling = threading.Event()
+    stop = threading.Event()
+
+    def poll() -> None:
+        with memo.bypassed():
+            polling.set()
+            stop.wait()
+
+    with ThreadPoolExecutor(1) as pool:
+        pool.submit(poll)
+        polling.wait()
+        # a read on another thread while polling is still memoised
+        ec2_client.describe_volumes()
+        stop.set()
+    assert describe_volumes.call_count == 1
+
+    # but calls fanned out from within the block are bypassed too
+    with memo.bypassed():
+        fanout(lambda _: ec2_client.describe_volumes(), range(2))
+    assert describe_volumes.call_count == 3
+
+
+@pytest.mark.usefixtures("_memo")
+def test_streaming_output_not_memoised(mocker: MockFixture, tmp_path: Path):
+    s3_client = boto3.client("s3", region_name="us-east-1")
+    output = tmp_path / "stdout"
+    output.write_bytes(b"hello")
+    get_object = mocker.Mock(
+        # the body of a real response is a stream, which can't be copied
+        side_effect=lambda request, **_: AWSResponse(request.url, 200, HTTPHeaders(), output.open("rb"))
+    )
+    s3_client.meta.events.register("before-send.s3.GetObject", get_object)
+
+    for _ in range(2):
+        assert s3_client.get_object(Bucket="logs", Key="stdout")["Body"].read() == b"hello"
+    assert get_object.call_count == 2
+
+
+@pytest.mark.usefixtures("_mock_ec2")
+def test_not_memoised_after_finish(mocker: MockFixture):
+    memo.start()
+    memo.finish()
+    describe_volumes = mocker.spy(ec2_backends[DEFAULT_ACCOUNT_ID]["us-east-1"], "describe_volumes")
+    ec2_client = boto3.client("ec2", region_name="us-east-1")
+
+    ec2_client.describe_volumes()
+    ec2_client.describe_volumes()
+
+    assert describe_volumes.call_count == 2
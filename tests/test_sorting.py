@@ -0,0 +1,44 @@
+import datetime
+
+from aec.util.sorting import parse_fields, sort_rows
+
+
+def test_parse_fields():
+    assert parse_fields("State,-LaunchTime") == [("State", False), ("LaunchTime", True)]
+
+
+def test_sort_rows_typed():
+    rows = [{"n": 10}, {"n": 9}, {"n": None}, {"n": 100}]
+
+    # numbers sort numerically, not as strings, and None sorts last
+    assert sort_rows(rows, parse_fields("n")) == [{"n": 9}, {"n": 10}, {"n": 100}, {"n": None}]
+    assert sort_rows(rows, parse_fields("-n")) == [{"n": 100}, {"n": 10}, {"n": 9}, {"n": None}]
+
+
+def test_sort_rows_multiple_fields():
+    earlier = datetime.datetime(2019, 8, 19, 6, 3, 6)
+    later = datetime.datetime(2020, 1, 1)
+    rows = [
+        {"State": "stopped", "Name": "al", "LaunchTime": later},
+        {"State": "running", "Name": "alice", "LaunchTime": earlier},
+        {"State": "running", "Name": "bob", "LaunchTime": later},
+    ]
+
+    assert [r["Name"] for r in sort_rows(rows, parse_fields("State,-LaunchTime"))] == ["bob", "alice", "al"]
+    assert [r["Name"] for r in sort_rows(rows, parse_fields("Name"))] == ["al", "alice", "bob"]
+
+
+def test_sort_rows_limit():
+    rows = [{"n": n} for n in [5, 3, 8, 1]]
+
+    assert sort_rows(rows, parse_fields("-n"), limit=2) == [{"n": 8}, {"n": 5}]
+
+
+def test_sort_rows_dates_and_datetimes():
+    rows = [
+        {"n": datetime.datetime(2020, 1, 1, 12, tzinfo=datetime.timezone.utc)},
+        {"n": datetime.date(2020, 1, 1)},
+        {"n": datetime.datetime(2019, 12, 31)},
+    ]
+
+    assert sort_rows(rows, parse_fields("n")) == [rows[2], rows[1], rows[0]]
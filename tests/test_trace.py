@@ -0,0 +1,75 @@
+import argparse
+import json
+from pathlib import Path
+from typing import Any
+
+import boto3
+import pytest
+
+import aec.util.cli as cli
+import aec.util.config as config
+import aec.util.trace as trace
+from aec.util.cli import Arg, Cmd
+
+
+def describe_instances(config: dict[str, Any]) -> list[Any]:
+    ec2_client = boto3.client("ec2", region_name=config["region"])
+    return [i for r in ec2_client.describe_instances()["Reservations"] for i in r["Instances"]]
+
+
+def parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--profile", action="store_true")
+    parser.add_argument("--trace")
+    subparsers = parser.add_subparsers()
+    cmds = [Cmd(describe_instances, [Arg("--config")])]
+    cli.add_command_group(subparsers, "ec2", "ec2 help", cmds, config.inject_config("src/aec/config-example/ec2.toml"))
+    return parser
+
+
+def test_profile_prints_summary(_mock_ec2: None, capsys: pytest.CaptureFixture):
+    cli.dispatch(parser(), ["--profile", "ec2", "describe-instances"])
+    with trace.span("display"):
+        pass
+    trace.finish()
+
+    _, stderr = capsys.readouterr()
+    assert "ec2.DescribeInstances" in stderr
+    for phase in ["import aec", "parse args", "load config", "test_trace.describe_instances", "display", "total"]:
+        assert phase in stderr
+
+    # tracing stops once finished
+    assert trace.tracer is None
+
+
+def test_trace_writes_chrome_trace(_mock_ec2: None, tmp_path: Path, capsys: pytest.CaptureFixture):
+    trace_file = tmp_path / "trace.json"
+
+    cli.dispatch(parser(), ["--trace", str(trace_file), "ec2", "describe-instances"])
+    trace.finish()
+
+    # no summary unless --profile
+    assert capsys.readouterr().err == ""
+
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    call = next(e for e in events if e["name"] == "ec2.DescribeInstances")
+    assert call["ph"] == "X"
+    assert call["cat"] == "aws"
+    assert call["args"]["status"] == 200
+    assert call["args"]["retries"] == 0
+    assert call["args"]["bytes"] > 0
+
+
+def test_aec_trace_env(_mock_ec2: None, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture):
+    monkeypatch.setenv("AEC_TRACE", "1")
+
+    cli.dispatch(parser(), ["ec2", "describe-instances"])
+    trace.finish()
+
+    assert "ec2.DescribeInstances" in capsys.readouterr().err
+
+
+def test_not_tracing_by_default(_mock_ec2: None):
+    cli.dispatch(parser(), ["ec2", "describe-instances"])
+
+    assert trace.tracer is None
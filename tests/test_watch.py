@@ -0,0 +1,53 @@
+from collections.abc import Iterator
+from typing import Any
+
+from pytest_mock import MockFixture
+
+from aec.util.watch import WatchedRows, watch
+
+
+def test_watched_rows_keep_order_and_track_changes():
+    watched = WatchedRows(key="InstanceId")
+    assert watched.update([{"InstanceId": "i-2", "State": "running"}, {"InstanceId": "i-1", "State": "running"}])
+
+    # unchanged rows aren't re-rendered
+    assert not watched.update([{"InstanceId": "i-1", "State": "running"}, {"InstanceId": "i-2", "State": "running"}])
+    assert watched.changed == set()
+
+    assert watched.update([{"InstanceId": "i-1", "State": "stopping"}, {"InstanceId": "i-3", "State": "pending"}])
+    assert watched.changed == {"i-1", "i-3"}
+    # rows aren't re-sorted, new rows are added at the end
+    assert list(watched.cells.values()) == [["i-1", "stopping"], ["i-3", "pending"]]
+
+
+def test_watch_backs_off_until_interrupted(mocker: MockFixture):
+    sleep = mocker.patch("aec.util.watch.time.sleep")
+
+    def polls() -> Iterator[list[dict[str, Any]]]:
+        yield [{"InstanceId": "i-1", "State": "pending"}]
+        yield [{"InstanceId": "i-1", "State": "pending"}]
+        yield [{"InstanceId": "i-1", "State": "running"}]
+        raise KeyboardInterrupt
+
+    responses = polls()
+    rows = watch(lambda: next(responses), key="InstanceId", min_interval=2)
+
+    assert rows == [{"InstanceId": "i-1", "State": "running"}]
+    assert [c.args[0] for c in sleep.call_args_list] == [2, 3, 2]
+
+
+def test_watch_redraws_only_changes(mocker: MockFixture):
+    mocker.patch("aec.util.watch.time.sleep")
+    live = mocker.patch("aec.util.watch.Live").return_value.__enter__.return_value
+
+    def polls() -> Iterator[list[dict[str, Any]]]:
+        yield [{"InstanceId": "i-1", "State": "pending"}]
+        yield [{"InstanceId": "i-1", "State": "running"}]
+        raise KeyboardInterrupt
+
+    responses = polls()
+    rows = watch(lambda: [{"InstanceId": "i-1", "State": "pending"}], key="InstanceId", poll=lambda: next(responses))
+
+    assert rows == [{"InstanceId": "i-1", "State": "running"}]
+    # when first drawn, and when the state changed
+    assert live.update.call_count == 2